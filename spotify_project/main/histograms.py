@@ -0,0 +1,104 @@
+from django.db.models import Count, ExpressionWrapper, F, IntegerField, Value
+
+from .models import TrackRanking
+
+# main/histograms.py
+# 구간(버킷)별 분포를 GROUP BY 쿼리 한 번으로 계산하는 범용 히스토그램 엔진.
+
+# 필드별 기본 버킷 설정
+#   start: 첫 버킷의 시작 값 (값이 start 미만이면 제외, None이면 0 기준으로 width 단위 정렬)
+#   stop:  마지막 버킷의 끝 값 (값이 stop 초과면 제외, None이면 데이터의 최댓값까지)
+HISTOGRAM_FIELDS = {
+    'popularity': {'start': 1, 'stop': 100, 'width': 10},          # 1-10, 11-20, ..., 91-100
+    'release_year': {'start': None, 'stop': None, 'width': 10},    # 1990-1999, 2000-2009, ...
+    'duration_ms': {'start': 0, 'stop': None, 'width': 60 * 1000}, # 1분 단위
+    'ranking': {'start': 1, 'stop': None, 'width': 50},            # 1-50, 51-100, ...
+}
+
+
+def histogram(queryset, field, width=None, start=None, stop=None, lookup=None):
+    """
+    queryset의 field 값을 width 단위 버킷으로 나누어 버킷별 개수를 반환합니다.
+    버킷 번호는 DB에서 (field - start) / width 정수 나눗셈으로 계산하므로 쿼리는 한 번만 실행됩니다.
+    lookup: 관계를 거쳐 값을 읽을 때의 경로 (예: 'track__release_year', 기본값은 field)
+    반환값: [{'bucket': '1-10', 'count': 3}, ...] (비어 있는 버킷은 count 0으로 채움)
+    """
+    defaults = HISTOGRAM_FIELDS[field]
+    width = width or defaults['width']
+    start = defaults['start'] if start is None else start
+    stop = defaults['stop'] if stop is None else stop
+    offset = start or 0
+    lookup = lookup or field
+
+    filters = {f'{lookup}__isnull': False}
+    if start is not None:
+        filters[f'{lookup}__gte'] = start
+    if stop is not None:
+        filters[f'{lookup}__lte'] = stop
+
+    bucket_expression = ExpressionWrapper(
+        (F(lookup) - Value(offset)) / Value(width),
+        output_field=IntegerField(),
+    )
+    rows = (
+        queryset.filter(**filters)
+        .annotate(bucket_index=bucket_expression)
+        .values('bucket_index')
+        .annotate(count=Count('pk'))
+        .order_by()  # Meta.ordering 필드가 GROUP BY에 섞이지 않도록 정렬 제거
+    )
+    counts = {row['bucket_index']: row['count'] for row in rows}
+
+    if stop is not None:
+        first_index, last_index = 0, (stop - offset) // width
+    elif counts:
+        first_index, last_index = min(counts), max(counts)
+    else:
+        return []
+
+    return [
+        {
+            'bucket': f'{offset + index * width}-{offset + (index + 1) * width - 1}',
+            'count': counts.get(index, 0),
+        }
+        for index in range(first_index, last_index + 1)
+    ]
+
+
+def bucket_labels(field, width=None):
+    """start/stop이 정해진 필드(예: popularity)의 전체 버킷 라벨 목록."""
+    defaults = HISTOGRAM_FIELDS[field]
+    width = width or defaults['width']
+    start, stop = defaults['start'], defaults['stop']
+    return [f'{low}-{low + width - 1}' for low in range(start, stop + 1, width)]
+
+
+def bucket_index(field, value, width=None):
+    """값이 들어갈 버킷 번호 (histogram()과 같은 규칙, 범위를 벗어나면 None)."""
+    defaults = HISTOGRAM_FIELDS[field]
+    width = width or defaults['width']
+    start, stop = defaults['start'], defaults['stop']
+
+    if value is None or (start is not None and value < start) or (stop is not None and value > stop):
+        return None
+    return (value - (start or 0)) // width
+
+
+def track_histogram(django_user, field, time_range='long_term', ranking_limit=None,
+                    genre=None, artist_id=None, width=None):
+    """
+    사용자의 Top Track(time_range 기간) 분포를 계산합니다.
+    ranking_limit(상위 N개), genre, artist_id 로 대상 트랙을 좁힐 수 있습니다.
+    """
+    queryset = TrackRanking.objects.filter(user=django_user, time_range=time_range)
+
+    if ranking_limit is not None:
+        queryset = queryset.filter(ranking__lte=ranking_limit)
+    if genre:
+        queryset = queryset.filter(track__genre=genre)
+    if artist_id:
+        queryset = queryset.filter(track__artist_id=artist_id)
+
+    # 순위 / 동기화 시점 인기도는 TrackRanking, 나머지 값은 카탈로그(Track)에서 읽습니다.
+    lookup = field if field in ('ranking', 'popularity') else f'track__{field}'
+    return histogram(queryset, field, width=width, lookup=lookup)
@@ -0,0 +1,268 @@
+from collections import defaultdict
+from datetime import timedelta
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import RankingSnapshot, Track
+
+# main/history.py
+# 동기화마다 기간별 Top Track 순위를 스냅샷으로 남기고, 순위 변화(트랙별 순위 추이 / 새로 들어온 트랙 /
+# 가장 많이 움직인 트랙)를 조회하는 로직.
+#
+# 저장 형태:
+#   키프레임: 순위 순서대로의 트랙 ID 목록 (index = 순위 - 1, 비어 있는 순위는 None)
+#   delta:    직전 스냅샷 목록에서 바뀐 구간만 [[i1, i2, [트랙 ID...]], ...] (직전 목록[i1:i2]를 교체)
+# 키프레임은 RANKING_HISTORY_KEYFRAME_INTERVAL개마다 한 번 저장하므로, 어느 시점이든 키프레임 하나 +
+# 그 뒤의 delta 몇 개만 읽으면 복원할 수 있습니다.
+#
+# 보관 정책 (매일 동기화해도 사용자 / 기간당 스냅샷 수가 일정 수준을 넘지 않도록):
+#   최근 RANKING_HISTORY_DAILY_DAYS일: 모두 보관
+#   RANKING_HISTORY_WEEKLY_DAYS일까지: 주마다 마지막 스냅샷 하나
+#   그 이전:                            월마다 마지막 스냅샷 하나
+#   전체 개수는 RANKING_HISTORY_MAX_SNAPSHOTS개까지 (오래된 것부터 삭제)
+# 스냅샷이 삭제되면 바로 뒤 스냅샷의 delta만 다시 계산해 저장합니다.
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _apply_delta(previous_ids, ops):
+    """직전 트랙 ID 목록에 delta를 적용한 목록."""
+    track_ids = []
+    position = 0
+    for i1, i2, replacement in ops:
+        track_ids.extend(previous_ids[position:i1])
+        track_ids.extend(replacement)
+        position = i2
+    track_ids.extend(previous_ids[position:])
+    return track_ids
+
+
+def _encode(previous_ids, track_ids, deltas_since_keyframe):
+    """
+    (is_keyframe, data) 를 반환합니다.
+    직전 스냅샷이 없거나, 키프레임 간격이 찼거나, delta가 전체 목록보다 크면 키프레임으로 저장합니다.
+    """
+    interval = _setting('RANKING_HISTORY_KEYFRAME_INTERVAL', 20)
+    if previous_ids is None or deltas_since_keyframe + 1 >= interval:
+        return True, list(track_ids)
+
+    matcher = SequenceMatcher(None, previous_ids, track_ids, autojunk=False)
+    ops = [
+        [i1, i2, track_ids[j1:j2]]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != 'equal'
+    ]
+    if sum(2 + len(replacement) for _, _, replacement in ops) >= len(track_ids):
+        return True, list(track_ids)
+    return False, ops
+
+
+def _decode_chain(snapshots):
+    """taken_at 순서의 스냅샷 목록 → [(스냅샷, 트랙 ID 목록), ...] (첫 키프레임 이전의 delta는 건너뜀)"""
+    chain = []
+    track_ids = None
+    for snapshot in snapshots:
+        if snapshot.is_keyframe:
+            track_ids = list(snapshot.data)
+        elif track_ids is None:
+            continue
+        else:
+            track_ids = _apply_delta(track_ids, snapshot.data)
+        chain.append((snapshot, track_ids))
+    return chain
+
+
+def _retained(chain, now):
+    """보관 정책에 따라 남길 (스냅샷, 트랙 ID 목록) 목록 (taken_at 순서 유지)."""
+    daily_since = now - timedelta(days=_setting('RANKING_HISTORY_DAILY_DAYS', 30))
+    weekly_since = now - timedelta(days=_setting('RANKING_HISTORY_WEEKLY_DAYS', 365))
+
+    kept = []
+    seen_periods = set()
+    # 최신 스냅샷부터 훑으며 주 / 월마다 처음 만나는(= 가장 늦은) 스냅샷만 남깁니다.
+    for snapshot, track_ids in reversed(chain):
+        taken_at = snapshot.taken_at
+        if taken_at < weekly_since:
+            period = ('month', taken_at.year, taken_at.month)
+        elif taken_at < daily_since:
+            period = ('week', *taken_at.isocalendar()[:2])
+        else:
+            period = None
+
+        if period is not None:
+            if period in seen_periods:
+                continue
+            seen_periods.add(period)
+        kept.append((snapshot, track_ids))
+
+    kept = kept[:_setting('RANKING_HISTORY_MAX_SNAPSHOTS', 150)]
+    kept.reverse()
+    return kept
+
+
+def ranked_track_ids(rankings):
+    """순위 목록 → 순위 순서대로의 트랙 ID 목록 (index = 순위 - 1, 비어 있는 순위는 None)."""
+    track_ids = [None] * max((ranking.ranking for ranking in rankings), default=0)
+    for ranking in rankings:
+        track_ids[ranking.ranking - 1] = ranking.track_id
+    return track_ids
+
+
+def record_snapshots(django_user, time_ranges, rankings, taken_at=None):
+    """
+    방금 저장한 순위 목록(TrackRanking)으로 기간별 스냅샷을 추가하고 보관 정책을 적용합니다.
+    직전 스냅샷과 순위가 같은 기간(처음이면 순위가 비어 있는 기간)은 새로 저장하지 않습니다.
+    반환값: 추가 / 수정 / 삭제한 스냅샷 행 수
+    """
+    taken_at = taken_at or timezone.now()
+
+    rankings_by_range = defaultdict(list)
+    for ranking in rankings:
+        rankings_by_range[ranking.time_range].append(ranking)
+
+    snapshots_by_range = defaultdict(list)
+    for snapshot in RankingSnapshot.objects.filter(user=django_user, time_range__in=time_ranges).order_by('taken_at'):
+        snapshots_by_range[snapshot.time_range].append(snapshot)
+
+    snapshots_to_create = []
+    snapshots_to_update = []
+    pks_to_delete = []
+    for time_range in time_ranges:
+        chain = _decode_chain(snapshots_by_range[time_range])
+        track_ids = ranked_track_ids(rankings_by_range[time_range])
+        previous_ids = chain[-1][1] if chain else []
+        if previous_ids == track_ids:
+            continue
+
+        snapshot = RankingSnapshot(user=django_user, time_range=time_range, taken_at=taken_at)
+        chain.append((snapshot, track_ids))
+        snapshots_to_create.append(snapshot)
+
+        kept = _retained(chain, taken_at)
+        kept_ids = {id(kept_snapshot) for kept_snapshot, _ in kept}
+        pks_to_delete.extend(
+            old_snapshot.pk for old_snapshot, _ in chain
+            if old_snapshot.pk is not None and id(old_snapshot) not in kept_ids
+        )
+
+        # 새 스냅샷과, 바로 앞 스냅샷이 삭제된 스냅샷만 다시 인코딩합니다.
+        # (나머지 delta는 기준이 그대로이고, 삭제로 키프레임 사이 간격은 줄어들기만 합니다.)
+        chain_previous = {id(snapshot): previous for (previous, _), (snapshot, _) in zip(chain, chain[1:])}
+        previous_snapshot = previous_ids = None
+        deltas_since_keyframe = 0
+        for kept_snapshot, kept_track_ids in kept:
+            if kept_snapshot.pk is None or chain_previous.get(id(kept_snapshot)) is not previous_snapshot:
+                is_keyframe, data = _encode(previous_ids, kept_track_ids, deltas_since_keyframe)
+                if kept_snapshot.pk is not None:
+                    snapshots_to_update.append(kept_snapshot)
+                kept_snapshot.is_keyframe = is_keyframe
+                kept_snapshot.data = data
+
+            deltas_since_keyframe = 0 if kept_snapshot.is_keyframe else deltas_since_keyframe + 1
+            previous_snapshot, previous_ids = kept_snapshot, kept_track_ids
+
+    if pks_to_delete:
+        RankingSnapshot.objects.filter(pk__in=pks_to_delete).delete()
+    if snapshots_to_update:
+        RankingSnapshot.objects.bulk_update(snapshots_to_update, ['is_keyframe', 'data'], batch_size=100)
+    RankingSnapshot.objects.bulk_create(snapshots_to_create)
+    return len(snapshots_to_create) + len(snapshots_to_update) + len(pks_to_delete)
+
+
+def _load_chain(django_user, time_range, start=None, end=None):
+    """
+    [start, end] 구간의 스냅샷을 복원합니다. start 시점의 순위도 알 수 있도록
+    start 이전의 가장 가까운 키프레임부터 읽습니다. (쿼리 2번)
+    """
+    queryset = RankingSnapshot.objects.filter(user=django_user, time_range=time_range)
+    if end is not None:
+        queryset = queryset.filter(taken_at__lte=end)
+    if start is not None:
+        keyframe_at = (
+            queryset.filter(is_keyframe=True, taken_at__lte=start)
+            .order_by('-taken_at')
+            .values_list('taken_at', flat=True)
+            .first()
+        )
+        if keyframe_at is not None:
+            queryset = queryset.filter(taken_at__gte=keyframe_at)
+    return _decode_chain(queryset.order_by('taken_at'))
+
+
+def _rank_map(track_ids):
+    return {track_id: index + 1 for index, track_id in enumerate(track_ids) if track_id is not None}
+
+
+def _track_names(track_ids):
+    return dict(Track.objects.filter(spotify_id__in=track_ids).values_list('spotify_id', 'name'))
+
+
+def track_rank_history(django_user, track_id, time_range='long_term', start=None, end=None):
+    """
+    트랙의 스냅샷별 순위 추이 (start ~ end).
+    반환값: [{'taken_at': ..., 'ranking': 3}, ...] (순위에 없던 시점은 ranking None)
+    """
+    return [
+        {
+            'taken_at': snapshot.taken_at.isoformat(),
+            'ranking': _rank_map(track_ids).get(track_id),
+        }
+        for snapshot, track_ids in _load_chain(django_user, time_range, start, end)
+        if start is None or snapshot.taken_at >= start
+    ]
+
+
+def rank_changes(django_user, time_range='long_term', start=None, end=None, limit=10):
+    """
+    start 시점과 end 시점(각각 그 시각 이전의 마지막 스냅샷)의 순위를 비교합니다.
+      new_entries:    start에는 없고 end에 새로 들어온 트랙 (end 순위 순)
+      biggest_movers: 두 시점 모두에 있는 트랙 중 순위 변화가 큰 트랙 (change > 0 이면 상승)
+    start 이전 스냅샷이 없으면 end의 모든 트랙이 새로 들어온 트랙입니다.
+    """
+    chain = _load_chain(django_user, time_range, start, end)
+    if not chain:
+        return {'start': None, 'end': None, 'new_entries': [], 'biggest_movers': []}
+
+    before = [(snapshot, track_ids) for snapshot, track_ids in chain if start is None or snapshot.taken_at <= start]
+    before_snapshot, before_ids = before[-1] if before and start is not None else (None, [])
+    after_snapshot, after_ids = chain[-1]
+
+    before_ranks = _rank_map(before_ids)
+    after_ranks = _rank_map(after_ids)
+
+    new_entries = [
+        (track_id, ranking) for track_id, ranking in sorted(after_ranks.items(), key=lambda item: item[1])
+        if track_id not in before_ranks
+    ][:limit]
+    movers = sorted(
+        (
+            (track_id, before_ranks[track_id], ranking)
+            for track_id, ranking in after_ranks.items()
+            if track_id in before_ranks and before_ranks[track_id] != ranking
+        ),
+        key=lambda item: (-abs(item[1] - item[2]), item[2]),
+    )[:limit]
+
+    names = _track_names([track_id for track_id, _ in new_entries] + [track_id for track_id, _, _ in movers])
+    return {
+        'start': before_snapshot.taken_at.isoformat() if before_snapshot else None,
+        'end': after_snapshot.taken_at.isoformat(),
+        'new_entries': [
+            {'track_id': track_id, 'name': names.get(track_id), 'ranking': ranking}
+            for track_id, ranking in new_entries
+        ],
+        'biggest_movers': [
+            {
+                'track_id': track_id,
+                'name': names.get(track_id),
+                'previous_ranking': previous_ranking,
+                'ranking': ranking,
+                'change': previous_ranking - ranking,
+            }
+            for track_id, previous_ranking, ranking in movers
+        ],
+    }
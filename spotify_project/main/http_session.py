@@ -0,0 +1,63 @@
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+# main/http_session.py
+# 프로세스 전체에서 공유하는 Spotify API용 HTTP Session (Keep-Alive 연결 풀).
+# 사용자마다 달라지는 것은 요청 헤더의 Bearer Token뿐이므로, 모든 Spotify 클라이언트 / OAuth 객체가
+# 같은 연결 풀을 사용해 요청마다 TCP / TLS 연결을 새로 맺지 않습니다.
+# (spotipy는 요청마다 Authorization 헤더를 직접 넘기므로 Session에 사용자 정보가 남지 않습니다.)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class SharedSession(requests.Session):
+    """
+    여러 클라이언트가 함께 쓰는 Session.
+    spotipy 클라이언트는 소멸될 때(__del__) Session을 닫으므로, close()는 무시하고 shutdown()으로만 닫습니다.
+    """
+
+    def close(self):
+        pass
+
+    def shutdown(self):
+        super().close()
+
+
+def get_timeout():
+    """(연결, 응답) 타임아웃(초)."""
+    return (
+        getattr(settings, 'SPOTIFY_HTTP_CONNECT_TIMEOUT', 3.05),
+        getattr(settings, 'SPOTIFY_HTTP_READ_TIMEOUT', 10.0),
+    )
+
+
+def get_http_session():
+    """프로세스 공용 Session (처음 호출할 때 생성)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = SharedSession()
+                # 재시도는 scheduler.py가 담당하므로 urllib3 재시도는 사용하지 않습니다.
+                adapter = HTTPAdapter(
+                    pool_connections=getattr(settings, 'SPOTIFY_HTTP_POOL_CONNECTIONS', 4),
+                    pool_maxsize=getattr(settings, 'SPOTIFY_HTTP_POOL_SIZE', 16),
+                    max_retries=0,
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def close_http_session():
+    """공용 Session의 연결을 모두 닫습니다. (다음 get_http_session() 호출 때 새로 생성)"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.shutdown()
+            _session = None
@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import SyncRun
+from .scheduler import get_scheduler
+
+# main/instrumentation.py
+# Top Track 동기화의 단계별 계측 (소요 시간, API 호출 / 오류 수, DB 쿼리 수, 기록한 행 수).
+# 결과는 로그 레코드와 SyncRun 테이블에 남깁니다.
+# 동기화 동안 늘어난 요청 스케줄러 카운터(calls / retries / rate_limited / dropped)도 stats['scheduler']에 함께 기록합니다.
+# (스케줄러는 프로세스 공용이므로 같은 시간에 진행된 다른 동기화의 요청도 포함될 수 있습니다.)
+
+logger = logging.getLogger(__name__)
+
+
+class PhaseMetrics:
+    """한 단계(phase)의 계측 값."""
+
+    def __init__(self, name):
+        self.name = name
+        self.wall_ms = 0.0
+        self.api_calls = 0
+        self.api_errors = 0
+        self.db_queries = 0
+        self.rows_written = 0
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'wall_ms': round(self.wall_ms, 1),
+            'api_calls': self.api_calls,
+            'api_errors': self.api_errors,
+            'db_queries': self.db_queries,
+            'rows_written': self.rows_written,
+        }
+
+
+class IngestRecorder:
+    """
+    동기화 한 번의 단계별 계측기.
+    with recorder.phase('page_fetch') as metrics: ... 안에서 발생한 API 호출과 DB 쿼리를 해당 단계에 집계합니다.
+    API 호출은 recorder.instrument(sp)로 감싼 클라이언트를 통해서만 집계됩니다. (스레드 풀에서 호출해도 안전)
+    """
+
+    def __init__(self):
+        self.phases = []
+        self.current = None
+        self.started_at = timezone.now()
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+        self.scheduler_before = get_scheduler().snapshot()
+
+    def scheduler_stats(self):
+        """동기화를 시작한 뒤 늘어난 요청 스케줄러 카운터."""
+        before = self.scheduler_before
+        return {
+            key: count - before.get(key, 0)
+            for key, count in get_scheduler().snapshot().items()
+            if count != before.get(key, 0)
+        }
+
+    def instrument(self, sp):
+        return InstrumentedSpotify(sp, self)
+
+    def count_api_call(self, failed=False):
+        with self.lock:
+            if self.current is not None:
+                self.current.api_calls += 1
+                if failed:
+                    self.current.api_errors += 1
+
+    @contextmanager
+    def phase(self, name):
+        metrics = PhaseMetrics(name)
+        self.phases.append(metrics)
+        self.current = metrics
+
+        def count_queries(execute, sql, params, many, context):
+            metrics.db_queries += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(count_queries):
+                yield metrics
+        finally:
+            metrics.wall_ms = (time.perf_counter() - start) * 1000
+            self.current = None
+            logger.info("Ingest phase %s: %s", name, metrics.as_dict(), extra={'ingest_phase': metrics.as_dict()})
+
+    def finish(self, django_user, status, stats=None, error=''):
+        """계측 결과를 로그로 남기고 SyncRun 행으로 저장합니다."""
+        total_ms = (time.perf_counter() - self.started) * 1000
+        phases = [metrics.as_dict() for metrics in self.phases]
+        stats = {**(stats or {}), 'scheduler': self.scheduler_stats()}
+
+        logger.info(
+            "Ingest run for user %s %s in %.1fms (scheduler: %s)", django_user.pk, status, total_ms, stats['scheduler'],
+            extra={'ingest_run': {'status': status, 'total_ms': total_ms, 'phases': phases, 'stats': stats}},
+        )
+
+        return SyncRun.objects.create(
+            user=django_user,
+            status=status,
+            started_at=self.started_at,
+            finished_at=timezone.now(),
+            total_ms=round(total_ms, 1),
+            phases=phases,
+            stats=stats,
+            error=error,
+        )
+
+
+class InstrumentedSpotify:
+    """Spotify 클라이언트의 public 메서드 호출 수 / 오류 수를 IngestRecorder에 집계하는 래퍼."""
+
+    def __init__(self, client, recorder):
+        self._client = client
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if name.startswith('_') or not callable(attribute):
+            return attribute
+
+        def instrumented_call(*args, **kwargs):
+            try:
+                result = attribute(*args, **kwargs)
+            except Exception:
+                self._recorder.count_api_call(failed=True)
+                raise
+            self._recorder.count_api_call()
+            return result
+
+        instrumented_call.__name__ = name
+        return instrumented_call
@@ -0,0 +1,162 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import playlists, profiles, spotify
+from .models import IngestJob, SyncState
+
+# main/jobs.py
+# DB 테이블(IngestJob)을 작업 큐로 사용하는 백그라운드 수집 로직.
+# 웹 요청은 enqueue_ingest()로 작업만 등록하고, 실제 수집은 manage.py ingest_worker가 수행합니다.
+# 작업 종류(kind): top_tracks (Top Track 수집) / profile (헤더용 프로필 갱신) / playlists (재생 목록 라이브러리 수집)
+
+logger = logging.getLogger(__name__)
+
+
+def get_active_job(django_user, kind=IngestJob.KIND_TOP_TRACKS):
+    """사용자의 대기/실행 중인 작업을 반환합니다. (없으면 None)"""
+    return IngestJob.objects.filter(user=django_user, kind=kind, status__in=IngestJob.ACTIVE_STATUSES).first()
+
+
+def enqueue_ingest(django_user, kind=IngestJob.KIND_TOP_TRACKS):
+    """
+    사용자의 수집 작업을 등록합니다.
+    이미 같은 종류의 대기/실행 중인 작업이 있으면 새로 만들지 않고 그 작업을 반환합니다. (중복 작업 병합)
+    반환값: (job, created)
+    """
+    job = get_active_job(django_user, kind)
+    if job:
+        return job, False
+
+    try:
+        with transaction.atomic():
+            return IngestJob.objects.create(user=django_user, kind=kind), True
+    except IntegrityError:
+        # 동시에 들어온 다른 요청이 먼저 등록한 경우 (unique_active_ingest_job_per_user_kind)
+        return get_active_job(django_user, kind), False
+
+
+def enqueue_if_stale(django_user, max_age_seconds):
+    """
+    마지막 동기화가 max_age_seconds보다 오래되었거나 아직 없으면 수집 작업을 등록합니다.
+    (화면은 저장된 데이터로 바로 보여 주고, 갱신은 백그라운드에서 진행하는 용도)
+    반환값: (synced_at, 등록 / 병합된 작업 또는 None)
+    """
+    synced_at = SyncState.objects.filter(user=django_user).values_list('synced_at', flat=True).first()
+    if synced_at is not None and synced_at >= timezone.now() - timedelta(seconds=max_age_seconds):
+        return synced_at, None
+
+    job, _ = enqueue_ingest(django_user)
+    return synced_at, job
+
+
+def get_latest_job(django_user, kind=IngestJob.KIND_TOP_TRACKS):
+    """사용자의 가장 최근 작업 (진행 상황 조회용)."""
+    return IngestJob.objects.filter(user=django_user, kind=kind).order_by('-created_at').first()
+
+
+def job_status(job):
+    """진행 상황 조회 API(JSON)용 Dictionary."""
+    if job is None:
+        return {'status': None}
+
+    return {
+        'status': job.status,
+        'phase': job.phase,
+        'progress': job.progress,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def claim_next_job():
+    """
+    실행할 작업 하나를 가져와 running 상태로 바꿉니다.
+    조건부 UPDATE로 선점하므로 여러 Worker 프로세스가 같은 작업을 동시에 가져가지 않습니다.
+    Heartbeat가 끊긴 running 작업(Worker 비정상 종료)도 다시 가져갑니다.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=getattr(settings, 'INGEST_JOB_STALE_SECONDS', 300))
+    claimable = Q(status=IngestJob.STATUS_QUEUED) | Q(status=IngestJob.STATUS_RUNNING, heartbeat_at__lt=stale_before)
+
+    candidate_ids = IngestJob.objects.filter(claimable).order_by('created_at').values_list('pk', flat=True)[:10]
+
+    for job_id in candidate_ids:
+        claimed = IngestJob.objects.filter(claimable, pk=job_id).update(
+            status=IngestJob.STATUS_RUNNING,
+            started_at=now,
+            heartbeat_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return IngestJob.objects.select_related('user').get(pk=job_id)
+
+    return None
+
+
+def _job_progress_reporter(job):
+    """save_top_tracks_data / sync_playlists의 progress 콜백: 단계별 진행 상황과 heartbeat를 작업 행에 기록합니다."""
+    def report(phase, done, total):
+        job.phase = phase
+        job.progress[phase] = {'done': done, 'total': total}
+        IngestJob.objects.filter(pk=job.pk).update(
+            phase=phase,
+            progress=job.progress,
+            heartbeat_at=timezone.now(),
+        )
+    return report
+
+
+def run_job(job):
+    """작업 하나를 실행하고 결과(done / failed)를 기록합니다."""
+    try:
+        if job.kind == IngestJob.KIND_PROFILE:
+            profiles.refresh_profile(job.user)
+        elif job.kind == IngestJob.KIND_PLAYLISTS:
+            token_obj = job.user.spotifytoken
+            sp = spotify.get_user_spotify_client(token_obj.spotify_id, token_obj)
+            playlists.sync_playlists(sp, job.user, progress=_job_progress_reporter(job))
+        else:
+            token_obj = job.user.spotifytoken
+            sp = spotify.get_user_spotify_client(token_obj.spotify_id, token_obj)
+            spotify.save_top_tracks_data(sp, job.user, progress=_job_progress_reporter(job))
+    except Exception as e:
+        logger.exception("Ingest job %s failed", job.pk)
+        IngestJob.objects.filter(pk=job.pk).update(
+            status=IngestJob.STATUS_FAILED,
+            error=str(e),
+            finished_at=timezone.now(),
+        )
+        return False
+
+    IngestJob.objects.filter(pk=job.pk).update(
+        status=IngestJob.STATUS_DONE,
+        finished_at=timezone.now(),
+    )
+    return True
+
+
+def run_worker(poll_interval=1.0, once=False):
+    """
+    작업 큐를 계속 확인하며 작업을 실행합니다.
+    once=True 이면 대기 중인 작업을 모두 처리한 뒤 종료합니다.
+    """
+    processed = 0
+    while True:
+        job = claim_next_job()
+
+        if job is None:
+            if once:
+                return processed
+            time.sleep(poll_interval)
+            continue
+
+        logger.info("Ingest job %s started (user=%s, kind=%s)", job.pk, job.user_id, job.kind)
+        run_job(job)
+        processed += 1
@@ -0,0 +1,238 @@
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_databases, teardown_databases
+from django.utils import timezone
+
+from main import history, rollups
+from main.models import SpotifyProfile, SpotifyToken, SyncState, Track, TrackRanking
+from main.spotify import DB_BATCH_SIZE, rebuild_popularity_prefix_histograms, upsert_artists
+
+
+@contextmanager
+def benchmark_database():
+    """
+    벤치마크 전용 테스트 DB를 생성하고, 종료 시 삭제합니다.
+    (개발용 db.sqlite3 데이터는 건드리지 않습니다.)
+    """
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+def measure(func, *args, **kwargs):
+    """func 실행 결과와 함께 실행된 SQL 쿼리 수, 소요 시간(ms)을 반환합니다."""
+    query_count = 0
+
+    def count_queries(execute, sql, params, many, context):
+        nonlocal query_count
+        query_count += 1
+        return execute(sql, params, many, context)
+
+    # CaptureQueriesContext와 달리 SQL 문자열을 보관하지 않으므로 수천 개 쿼리도 정확히 셉니다.
+    with connection.execute_wrapper(count_queries):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    return result, query_count, elapsed_ms
+
+
+def fake_artist_details(count, seed=0):
+    """sp.artists() 응답과 같은 형태의 가짜 아티스트 상세 정보를 생성합니다."""
+    return [
+        {
+            'id': f'bench_artist_{i:06d}',
+            'name': f'Bench Artist {i}',
+            'popularity': (i * 7 + seed) % 101,
+            'followers': {'total': 1000 + i + seed},
+            'genres': [f'genre {i % 13}', f'genre {(i + seed) % 29}'],
+        }
+        for i in range(count)
+    ]
+
+
+class FakeSpotifyClient:
+    """
+    네트워크 없이 동기화 / 뷰를 실행하기 위한 가짜 Spotify 클라이언트.
+    spotipy.Spotify 중 이 프로젝트가 사용하는 메서드만 같은 응답 형태로 흉내 냅니다.
+    """
+
+    def __init__(self, track_count=500, artist_count=120, album_count=200, seed=0, playlist_count=0):
+        self.tracks = [
+            {
+                'id': f'bench_track_{(i + seed) % track_count:06d}',
+                'name': f'Bench Track {i}',
+                'popularity': (i * 7 + seed) % 101,
+                'duration_ms': 150000 + i * 97 % 120000,
+                'artists': [{'id': f'bench_artist_{i % artist_count:06d}', 'name': f'Bench Artist {i % artist_count}'}],
+                'album': {
+                    'id': f'bench_album_{i % album_count:06d}',
+                    'name': f'Bench Album {i % album_count}',
+                    'release_date': f'{1980 + i % 45}-01-01',
+                    'images': [],
+                },
+            }
+            for i in range(track_count)
+        ]
+
+        # 재생 목록 i: 트랙 목록의 일부 구간 (재생 목록끼리 일부 겹침) + 중복 트랙 1개, 5개마다 로컬 파일(ID 없음) 1개
+        self.playlists = []
+        self.playlist_items_by_id = {}
+        for i in range(playlist_count):
+            start = i * 37 % max(track_count, 1)
+            tracks = (self.tracks + self.tracks)[start:start + 10 + i * 13 % 120]
+            items = ([{'track': track} for track in tracks] + [{'track': tracks[0]}]) if tracks else []
+            if i % 5 == 0:
+                items.append({'track': {'id': None, 'type': 'track', 'name': 'Local File'}})
+
+            playlist_id = f'bench_playlist_{i:06d}'
+            self.playlist_items_by_id[playlist_id] = items
+            self.playlists.append({
+                'id': playlist_id,
+                'name': f'Bench Playlist {i}',
+                'owner': {'id': 'bench_user', 'display_name': 'Bench User'},
+                'images': [],
+                'public': i % 2 == 0,
+                'snapshot_id': f'bench_snapshot_{i}_{seed}',
+                'tracks': {'total': len(items)},
+            })
+
+    def me(self):
+        return {'id': 'bench_user', 'display_name': 'Bench User', 'images': [], 'country': 'KR', 'product': 'premium'}
+
+    def current_user_top_tracks(self, limit=20, offset=0, time_range='medium_term'):
+        return {'items': self.tracks[offset:offset + limit], 'total': len(self.tracks)}
+
+    def artists(self, artist_ids):
+        return {'artists': [
+            {
+                'id': artist_id,
+                'name': f'Bench Artist {artist_id}',
+                'popularity': int(artist_id[-6:]) % 101,
+                'followers': {'total': 1000 + int(artist_id[-6:])},
+                'genres': [f'genre {int(artist_id[-6:]) % 13}', f'genre {int(artist_id[-6:]) % 29}'],
+            }
+            for artist_id in artist_ids
+        ]}
+
+    def albums(self, album_ids):
+        return {'albums': [{'id': album_id, 'release_date': '2000-01-01'} for album_id in album_ids]}
+
+    def current_user_playlists(self, limit=50, offset=0):
+        return {'items': self.playlists[offset:offset + limit], 'total': len(self.playlists)}
+
+    def playlist_items(self, playlist_id, fields=None, limit=50, offset=0, market=None, additional_types=('track', 'episode')):
+        items = self.playlist_items_by_id[playlist_id]
+        return {'items': items[offset:offset + limit], 'total': len(items)}
+
+
+def seed_synthetic_user(username, track_count, artist_count=300, seed=0):
+    """
+    동기화를 거치지 않고 track_count개의 Top Track을 가진 사용자를 DB에 직접 만듭니다.
+    트랙은 세 기간(short / medium / long)에 번갈아 배정하며, 누적 분포 테이블 / 전체 통계 / 순위 스냅샷 / SyncState도 함께 채웁니다.
+    """
+    django_user = User.objects.create(username=username)
+    SpotifyToken.objects.create(
+        user=django_user,
+        spotify_id=f'{username}_spotify',
+        access_token='bench-access-token',
+        refresh_token='bench-refresh-token',
+        token_type='Bearer',
+        expires_at=timezone.now() + timedelta(hours=1),
+    )
+    SpotifyProfile.objects.create(
+        user=django_user,
+        spotify_id=f'{username}_spotify',
+        display_name=username,
+        fetched_at=timezone.now(),
+    )
+
+    artist_details = fake_artist_details(artist_count)
+    upsert_artists(artist_details)
+
+    # 카탈로그 트랙은 사용자끼리 공유합니다. (seed만큼 밀린 구간을 사용하므로 사용자마다 일부가 겹침)
+    rankings = []
+    for i in range(track_count):
+        k = i + seed
+        track = Track(
+            spotify_id=f'bench_track_{k:06d}',
+            name=f'Bench Track {k}',
+            popularity=k * 7 % 101,
+            duration_ms=150000 + k * 97 % 120000,
+            release_year=1980 + k % 45,
+            genre=artist_details[k % artist_count]['genres'][0],
+            artist_id=artist_details[k % artist_count]['id'],
+        )
+        rankings.append(TrackRanking(
+            user=django_user,
+            track=track,
+            time_range=TrackRanking.TIME_RANGES[i % len(TrackRanking.TIME_RANGES)],
+            ranking=i // len(TrackRanking.TIME_RANGES) + 1,
+            popularity=track.popularity,
+        ))
+    Track.objects.bulk_create([ranking.track for ranking in rankings], batch_size=DB_BATCH_SIZE, ignore_conflicts=True)
+    TrackRanking.objects.bulk_create(rankings, batch_size=DB_BATCH_SIZE)
+    rebuild_popularity_prefix_histograms(django_user, TrackRanking.TIME_RANGES, rankings)
+    history.record_snapshots(django_user, TrackRanking.TIME_RANGES, rankings)
+
+    contribution = rollups.build_contribution(rankings, TrackRanking.TIME_RANGES)
+    rollups.apply_contribution({}, contribution)
+
+    SyncState.objects.create(
+        user=django_user,
+        payload_hash='synthetic',
+        synced_at=timezone.now(),
+        data_version=1,
+        rollup_contribution=contribution,
+    )
+    return django_user
+
+
+# 분석 쿼리가 반드시 인덱스로 찾아야 하는 (사용자 수 / 트랙 수에 비례해 커지는) 테이블
+HOT_PATH_TABLES = (
+    'main_track',
+    'main_trackranking',
+    'main_artistgenre',
+    'main_popularityprefixhistogram',
+    'main_syncstate',
+    'main_spotifytoken',
+    'main_ingestjob',
+    'main_genrerollup',
+    'main_artistrollup',
+    'main_rankingsnapshot',
+)
+
+
+def explain_select_queries(func, *args, **kwargs):
+    """
+    func 실행 중 발생한 SELECT 쿼리마다 EXPLAIN QUERY PLAN 결과를 수집합니다. (SQLite 전용)
+    반환값: (func 결과, [{'sql': ..., 'plan': ['SEARCH main_trackranking USING INDEX ...', ...]}, ...])
+    """
+    with CaptureQueriesContext(connection) as captured:
+        result = func(*args, **kwargs)
+
+    plans = []
+    with connection.cursor() as cursor:
+        for query in captured.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plans.append({'sql': sql, 'plan': [row[-1] for row in cursor.fetchall()]})
+    return result, plans
+
+
+def full_table_scans(plans, tables=HOT_PATH_TABLES):
+    """실행 계획 중 HOT_PATH_TABLES를 인덱스 없이 처음부터 끝까지 읽는 단계 목록."""
+    scans = []
+    for entry in plans:
+        for step in entry['plan']:
+            words = step.split()
+            if len(words) >= 2 and words[0] == 'SCAN' and words[1] in tables:
+                scans.append((step, entry['sql']))
+    return scans
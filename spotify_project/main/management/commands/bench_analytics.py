@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from main import histograms, spotify, visual_cache
+
+from ._bench import benchmark_database, explain_select_queries, full_table_scans, measure, seed_synthetic_user
+
+
+def analytics_queries(django_user):
+    """분석 화면이 사용하는 조회 함수들 (이름 → 호출)."""
+    return {
+        'visual_data': lambda: spotify.get_all_visual_data(django_user, 'long_term'),
+        'genre_counts': lambda: spotify.calculate_genre_counts(django_user, 'long_term'),
+        'popularity_distribution': lambda: spotify.calculate_popularity_distribution(django_user, 50),
+        'popularity_fallback': lambda: histograms.track_histogram(django_user, 'popularity', ranking_limit=50),
+        'popularity_prefixes': lambda: spotify.popularity_prefix_payload(django_user, 'long_term'),
+        'histogram_release_year': lambda: histograms.track_histogram(django_user, 'release_year'),
+        'histogram_genre': lambda: histograms.track_histogram(django_user, 'popularity', genre='genre 3'),
+        'data_version': lambda: visual_cache.get_data_version(django_user),
+    }
+
+
+class Command(BaseCommand):
+    help = "합성 사용자(트랙 수별)로 분석 쿼리의 쿼리 수 / 실행 시간과 EXPLAIN QUERY PLAN을 기록합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000, 10000])
+        parser.add_argument('--explain', action='store_true', help="쿼리별 실행 계획을 함께 출력합니다.")
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.stdout.write(f"{'tracks':>8} {'query':>24} {'queries':>8} {'time(ms)':>10} {'full scans':>11}")
+
+            for size in options['sizes']:
+                django_user = seed_synthetic_user(f'bench_{size}', size, seed=size)
+
+                for name, query in analytics_queries(django_user).items():
+                    _, queries, elapsed_ms = measure(query)
+                    _, plans = explain_select_queries(query)
+                    scans = full_table_scans(plans)
+                    self.stdout.write(f"{size:>8} {name:>24} {queries:>8} {elapsed_ms:>10.1f} {len(scans):>11}")
+
+                    if options['explain']:
+                        for entry in plans:
+                            self.stdout.write(f"    {entry['sql']}")
+                            for step in entry['plan']:
+                                self.stdout.write(f"        {step}")
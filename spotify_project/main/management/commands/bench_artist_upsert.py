@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.models import Artist, Genre
+from main.spotify import upsert_artists
+
+from ._bench import benchmark_database, fake_artist_details, measure
+
+
+def legacy_upsert_artists(artist_details):
+    """기존 방식: 아티스트마다 update_or_create (SELECT + INSERT/UPDATE), 장르도 하나씩 연결."""
+    for detail in artist_details:
+        artist, _ = Artist.objects.update_or_create(
+            spotify_id=detail['id'],
+            defaults={
+                'name': detail['name'],
+                'popularity': detail['popularity'],
+                'followers_total': detail['followers']['total'],
+            }
+        )
+        artist.genres.clear()
+        for position, name in enumerate(detail['genres']):
+            genre, _ = Genre.objects.get_or_create(name=name)
+            artist.genres.add(genre, through_defaults={'position': position})
+    return len(artist_details)
+
+
+class Command(BaseCommand):
+    help = "Artist 저장 방식(update_or_create 반복 vs Bulk Upsert)의 쿼리 수와 실행 시간을 비교합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[50, 500, 5000])
+
+    def handle(self, *args, **options):
+        strategies = [
+            ('update_or_create', legacy_upsert_artists),
+            ('bulk_upsert', upsert_artists),
+        ]
+
+        with benchmark_database():
+            self.stdout.write(f"{'artists':>8} {'strategy':>17} {'phase':>7} {'queries':>8} {'time(ms)':>10}")
+
+            for size in options['sizes']:
+                for name, upsert in strategies:
+                    Artist.objects.all().delete()
+
+                    # 1회차: 모두 신규 INSERT, 2회차: 모두 기존 행 UPDATE
+                    for phase, seed in (('insert', 0), ('update', 1)):
+                        details = fake_artist_details(size, seed=seed)
+                        _, queries, elapsed_ms = measure(transaction.atomic()(upsert), details)
+                        self.stdout.write(f"{size:>8} {name:>17} {phase:>7} {queries:>8} {elapsed_ms:>10.1f}")
@@ -0,0 +1,101 @@
+import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+import spotipy
+from django.core.management.base import BaseCommand
+
+from main import http_session
+
+
+class StubSpotifyHandler(BaseHTTPRequestHandler):
+    """모든 GET 요청에 작은 JSON(/v1/me 형태)으로 응답하는 Keep-Alive(HTTP/1.1) 스텁 서버."""
+    protocol_version = 'HTTP/1.1'
+    body = json.dumps({'id': 'stub_user', 'display_name': 'Stub User', 'images': []}).encode('utf-8')
+
+    def setup(self):
+        super().setup()
+        # 헤더 / 본문을 따로 보내므로 Nagle 알고리즘으로 인한 지연을 끕니다.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # 새 TCP 연결이 맺어질 때마다 한 번 호출됩니다.
+        with self.server.lock:
+            self.server.connections += 1
+        # 실제 API 서버와의 TCP / TLS Handshake 왕복 시간을 흉내 냅니다. (--handshake-ms)
+        time.sleep(self.server.handshake_seconds)
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(handshake_seconds=0):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubSpotifyHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.handshake_seconds = handshake_seconds
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_client(prefix, session):
+    client = spotipy.Spotify(auth='bench-token', requests_session=session, requests_timeout=http_session.get_timeout())
+    client.prefix = prefix
+    return client
+
+
+class Command(BaseCommand):
+    help = "로컬 스텁 서버로 Spotify 클라이언트의 초당 요청 수를 비교합니다. (클라이언트마다 새 Session vs 공용 연결 풀)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=300, help="생성할 클라이언트 수 (= 화면 요청 수)")
+        parser.add_argument('--calls-per-client', type=int, default=3, help="클라이언트 하나가 보내는 요청 수")
+        parser.add_argument('--threads', nargs='+', type=int, default=[1, 8], help="동시에 요청하는 스레드 수")
+        parser.add_argument('--handshake-ms', type=float, default=0,
+                            help="새 연결마다 스텁 서버가 추가로 지연할 시간(ms), TCP / TLS Handshake 비용 흉내")
+
+    def handle(self, *args, **options):
+        server = start_stub_server(options['handshake_ms'] / 1000)
+        prefix = f'http://127.0.0.1:{server.server_address[1]}/v1/'
+
+        strategies = [
+            # 기존 방식: 클라이언트(화면 요청)마다 새 Session → 매번 새 연결
+            ('session_per_client', lambda: requests.Session()),
+            ('shared_pool', http_session.get_http_session),
+        ]
+
+        try:
+            self.stdout.write(f"{'threads':>8} {'strategy':>20} {'requests':>9} {'req/s':>9} {'connections':>12}")
+            for threads in options['threads']:
+                for name, session_factory in strategies:
+                    http_session.close_http_session()
+                    server.connections = 0
+
+                    def view_request():
+                        client = make_client(prefix, session_factory())
+                        for _ in range(options['calls_per_client']):
+                            client.me()
+
+                    started_at = time.perf_counter()
+                    with ThreadPoolExecutor(max_workers=threads) as executor:
+                        for future in [executor.submit(view_request) for _ in range(options['clients'])]:
+                            future.result()
+                    elapsed = time.perf_counter() - started_at
+
+                    total = options['clients'] * options['calls_per_client']
+                    self.stdout.write(
+                        f"{threads:>8} {name:>20} {total:>9} {total / elapsed:>9.0f} {server.connections:>12}")
+        finally:
+            http_session.close_http_session()
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,91 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from main import playlists
+
+from ._bench import FakeSpotifyClient, benchmark_database, measure
+
+
+def pairwise_set_overlaps(track_ids_by_playlist):
+    """기존 방식: 모든 재생 목록 쌍을 Python set 교집합으로 비교."""
+    items = [(playlist_id, set(track_ids)) for playlist_id, track_ids in track_ids_by_playlist.items()]
+    pairs = []
+    for a in range(len(items)):
+        for b in range(a + 1, len(items)):
+            shared_count = len(items[a][1] & items[b][1])
+            if shared_count:
+                pairs.append((items[a][0], items[b][0], shared_count, len(items[a][1] | items[b][1])))
+    return pairs
+
+
+def synthetic_library(playlist_count, catalog_size=50000, seed=0):
+    """
+    재생 목록마다 20~300곡, 인기 트랙일수록 여러 재생 목록에 들어가도록 뽑은 가짜 라이브러리.
+    """
+    rng = random.Random(seed)
+    return {
+        f'playlist_{i}': {f'track_{int(catalog_size * rng.random() ** 3)}' for _ in range(rng.randint(20, 300))}
+        for i in range(playlist_count)
+    }
+
+
+class SlowFakeSpotifyClient(FakeSpotifyClient):
+    """API 응답 지연(latency_seconds)을 흉내 내는 가짜 클라이언트."""
+
+    def __init__(self, latency_seconds, **kwargs):
+        super().__init__(**kwargs)
+        self.latency_seconds = latency_seconds
+
+    def current_user_playlists(self, *args, **kwargs):
+        time.sleep(self.latency_seconds)
+        return super().current_user_playlists(*args, **kwargs)
+
+    def playlist_items(self, *args, **kwargs):
+        time.sleep(self.latency_seconds)
+        return super().playlist_items(*args, **kwargs)
+
+
+class Command(BaseCommand):
+    help = "재생 목록 겹침 계산(set 교집합 vs 정수 Bitset)과 재생 목록 수집(순차 vs 병렬 페이지 요청)을 비교합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000, 2000], help="겹침 계산 재생 목록 수")
+        parser.add_argument('--sync-playlists', type=int, default=200, help="수집 벤치마크 재생 목록 수")
+        parser.add_argument('--latency-ms', type=float, default=20, help="가짜 API 응답 지연(ms)")
+        parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 8])
+
+    def handle(self, *args, **options):
+        strategies = [
+            ('pairwise_sets', pairwise_set_overlaps),
+            ('int_bitsets', lambda library: list(playlists.overlap_pairs(library))),
+        ]
+
+        self.stdout.write(f"{'playlists':>10} {'strategy':>14} {'pairs':>9} {'time(ms)':>10}")
+        for size in options['sizes']:
+            library = synthetic_library(size)
+            for name, compute in strategies:
+                start = time.perf_counter()
+                pairs = compute(library)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self.stdout.write(f"{size:>10} {name:>14} {len(pairs):>9} {elapsed_ms:>10.1f}")
+
+        with benchmark_database():
+            self.stdout.write('')
+            self.stdout.write(f"{'playlists':>10} {'concurrency':>12} {'phase':>8} {'queries':>8} {'time(ms)':>10}")
+            for concurrency in options['concurrency']:
+                django_user = User.objects.create(username=f'bench_playlists_{concurrency}')
+                # 재생 목록 행은 사용자끼리 공유되므로 실행마다 다른 snapshot_id(seed)를 사용합니다.
+                client = SlowFakeSpotifyClient(
+                    options['latency_ms'] / 1000, track_count=2000, playlist_count=options['sync_playlists'],
+                    seed=concurrency)
+
+                # 1회차: 모든 재생 목록 수집, 2회차: snapshot_id가 같아 재생 목록 페이지만 요청
+                with override_settings(SPOTIFY_FETCH_CONCURRENCY=concurrency):
+                    for phase in ('initial', 'resync'):
+                        _, queries, elapsed_ms = measure(playlists.sync_playlists, client, django_user)
+                        self.stdout.write(
+                            f"{options['sync_playlists']:>10} {concurrency:>12} {phase:>8} {queries:>8} {elapsed_ms:>10.1f}")
@@ -0,0 +1,85 @@
+import gc
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from main.models import TrackRanking
+from main.spotify import calculate_genre_counts, calculate_popularity_distribution, get_all_visual_data
+
+from ._bench import benchmark_database, measure, seed_synthetic_user
+
+
+def legacy_get_all_visual_data(django_user, time_range='long_term'):
+    """기존 방식: 모델 인스턴스 전체 로드(select_related) + 장르 / 인기도 / 아티스트 집계 쿼리 각각."""
+    all_rankings_qs = TrackRanking.objects.filter(user=django_user, time_range=time_range) \
+        .select_related('track__artist').order_by('ranking')
+
+    all_tracks_list = []
+    for ranking in all_rankings_qs:
+        track = ranking.track
+        all_tracks_list.append({
+            'ranking': ranking.ranking,
+            'name': track.name,
+            'genre': track.genre,
+            'popularity': ranking.popularity,
+            'release_year': track.release_year,
+            'artist_name': track.artist.name,
+        })
+
+    top_artists_analysis = TrackRanking.objects.filter(user=django_user, time_range=time_range) \
+        .values('track__artist__name') \
+        .annotate(count=Count('track__artist__name')) \
+        .order_by('-count')[:10]
+
+    return {
+        'all_tracks': all_tracks_list,
+        'top_genres': calculate_genre_counts(django_user, time_range, limit=10),
+        'initial_popularity_data': calculate_popularity_distribution(django_user, 50, time_range),
+        'max_ranking': len(all_tracks_list),
+        'top_artists_focus': [
+            {'artist_name': item['track__artist__name'], 'count': item['count']} for item in top_artists_analysis
+        ],
+    }
+
+
+def measure_memory(func, *args):
+    """func 실행 중 Python 메모리 할당 최댓값(KB)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+class Command(BaseCommand):
+    help = "get_all_visual_data의 기존 방식(모델 인스턴스) vs 컬럼 projection 방식의 쿼리 수 / 시간 / 메모리를 비교합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[500, 10000])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        strategies = [
+            ('model_instances', legacy_get_all_visual_data),
+            ('projection', get_all_visual_data),
+        ]
+
+        with benchmark_database():
+            self.stdout.write(f"{'tracks':>8} {'strategy':>16} {'queries':>8} {'time(ms)':>10} {'peak(KB)':>10}")
+
+            for size in options['sizes']:
+                # 한 기간에 size개가 들어가도록 세 기간 분량을 만듭니다.
+                django_user = seed_synthetic_user(f'bench_{size}', size * len(TrackRanking.TIME_RANGES), seed=size)
+
+                for name, load in strategies:
+                    timings = []
+                    for _ in range(options['repeat']):
+                        _, queries, elapsed_ms = measure(load, django_user)
+                        timings.append(elapsed_ms)
+                    peak_kb = measure_memory(load, django_user)
+                    self.stdout.write(
+                        f"{size:>8} {name:>16} {queries:>8} {min(timings):>10.1f} {peak_kb:>10.1f}")
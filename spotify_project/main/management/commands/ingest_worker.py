@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand
+
+from main.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = "IngestJob 테이블의 대기 작업을 가져와 Spotify Top Track 수집 / 프로필 갱신을 실행하는 백그라운드 Worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1,
+                            help="실행할 Worker 프로세스 수 (기본 1)")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="대기 작업이 없을 때 다시 확인하기까지의 시간(초)")
+        parser.add_argument('--once', action='store_true',
+                            help="대기 중인 작업을 모두 처리하면 종료")
+
+    def handle(self, *args, **options):
+        processes = max(1, options['processes'])
+
+        if processes == 1:
+            self.stdout.write("Ingest worker started.")
+            processed = run_worker(poll_interval=options['poll_interval'], once=options['once'])
+            self.stdout.write(f"Ingest worker finished ({processed} jobs).")
+            return
+
+        # 여러 Worker는 각각 독립된 프로세스(= 독립된 DB 연결)로 실행합니다.
+        command = [sys.executable, sys.argv[0], 'ingest_worker',
+                   '--processes', '1', '--poll-interval', str(options['poll_interval'])]
+        if options['once']:
+            command.append('--once')
+
+        children = [subprocess.Popen(command) for _ in range(processes)]
+        self.stdout.write(f"Started {processes} ingest worker processes.")
+
+        try:
+            for child in children:
+                child.wait()
+        except KeyboardInterrupt:
+            for child in children:
+                child.terminate()
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from main import rollups
+from main.models import ArtistRollup, GenreRollup
+
+
+class Command(BaseCommand):
+    help = "저장된 모든 Top Track으로 전체 사용자 통계(GenreRollup / ArtistRollup)를 처음부터 다시 계산합니다."
+
+    def handle(self, *args, **options):
+        rollups.rebuild_all()
+        self.stdout.write(
+            f"GenreRollup {GenreRollup.objects.count()}행, ArtistRollup {ArtistRollup.objects.count()}행을 다시 만들었습니다.")
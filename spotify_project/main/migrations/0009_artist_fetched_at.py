@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_syncstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artist',
+            name='fetched_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
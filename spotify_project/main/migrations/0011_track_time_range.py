@@ -0,0 +1,91 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_legacy_tracks(apps, schema_editor):
+    """기존 Track 행(기간 구분 없음)을 long_term 순위로 옮깁니다."""
+    LegacyTrack = apps.get_model('main', 'LegacyTrack')
+    Track = apps.get_model('main', 'Track')
+
+    Track.objects.bulk_create(
+        [
+            Track(
+                spotify_id=legacy.spotify_id,
+                name=legacy.name,
+                popularity=legacy.popularity,
+                release_year=legacy.release_year,
+                duration_ms=legacy.duration_ms,
+                genre=legacy.genre,
+                artist_id=legacy.artist_id,
+                user_id=legacy.user_id,
+                ranking=legacy.ranking,
+                time_range='long_term',
+            )
+            for legacy in LegacyTrack.objects.all()
+        ],
+        batch_size=500,
+    )
+
+
+def copy_tracks_back(apps, schema_editor):
+    """되돌릴 때는 long_term 순위만 기존 테이블로 옮깁니다."""
+    LegacyTrack = apps.get_model('main', 'LegacyTrack')
+    Track = apps.get_model('main', 'Track')
+
+    LegacyTrack.objects.bulk_create(
+        [
+            LegacyTrack(
+                spotify_id=track.spotify_id,
+                name=track.name,
+                popularity=track.popularity,
+                release_year=track.release_year,
+                duration_ms=track.duration_ms,
+                genre=track.genre,
+                artist_id=track.artist_id,
+                user_id=track.user_id,
+                ranking=track.ranking,
+            )
+            for track in Track.objects.filter(time_range='long_term')
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+    """
+    Track의 기본 키를 spotify_id에서 자동 증가 id로 바꾸고 time_range를 추가합니다.
+    (같은 트랙이 여러 기간의 순위에 동시에 포함될 수 있도록)
+    """
+
+    dependencies = [
+        ('main', '0010_ingestjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RenameModel(old_name='Track', new_name='LegacyTrack'),
+        migrations.CreateModel(
+            name='Track',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('spotify_id', models.CharField(max_length=50)),
+                ('name', models.CharField(max_length=255)),
+                ('popularity', models.IntegerField(blank=True, null=True)),
+                ('release_year', models.IntegerField(blank=True, help_text='트랙이 발매된 연도', null=True)),
+                ('duration_ms', models.IntegerField(blank=True, null=True)),
+                ('genre', models.CharField(blank=True, help_text='Track의 대표 장르 (Artist의 첫 번째 장르)', max_length=100)),
+                ('ranking', models.IntegerField(help_text='사용자 Top Tracks 목록에서의 순위 (1, 2, 3...)')),
+                ('time_range', models.CharField(choices=[('short_term', 'Short term'), ('medium_term', 'Medium term'), ('long_term', 'Long term')], default='long_term', max_length=20)),
+                ('artist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tracks', to='main.artist')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='top_tracks', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['user', 'time_range', 'ranking'],
+                'unique_together': {('user', 'time_range', 'ranking'), ('user', 'time_range', 'spotify_id')},
+            },
+        ),
+        migrations.RunPython(copy_legacy_tracks, copy_tracks_back),
+        migrations.DeleteModel(name='LegacyTrack'),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_popularityprefixhistogram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncstate',
+            name='data_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,83 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def split_legacy_genres(apps, schema_editor):
+    """콤마로 이어 붙인 Artist.genres 문자열을 Genre / ArtistGenre 행으로 옮깁니다."""
+    Artist = apps.get_model('main', 'Artist')
+    Genre = apps.get_model('main', 'Genre')
+    ArtistGenre = apps.get_model('main', 'ArtistGenre')
+
+    artist_genres = {
+        spotify_id: [genre for genre in legacy_genres.split(", ") if genre]
+        for spotify_id, legacy_genres in Artist.objects.values_list('spotify_id', 'legacy_genres')
+    }
+    names = {name for genres in artist_genres.values() for name in genres}
+
+    Genre.objects.bulk_create([Genre(name=name) for name in names], batch_size=500, ignore_conflicts=True)
+    genre_ids = dict(Genre.objects.values_list('name', 'id'))
+
+    ArtistGenre.objects.bulk_create(
+        [
+            ArtistGenre(artist_id=spotify_id, genre_id=genre_ids[name], position=position)
+            for spotify_id, genres in artist_genres.items()
+            for position, name in enumerate(dict.fromkeys(genres))
+        ],
+        batch_size=500,
+    )
+
+
+def join_genres_back(apps, schema_editor):
+    """되돌릴 때는 position 순서대로 다시 콤마로 이어 붙입니다."""
+    Artist = apps.get_model('main', 'Artist')
+    ArtistGenre = apps.get_model('main', 'ArtistGenre')
+
+    artist_genres = {}
+    for artist_id, name in ArtistGenre.objects.order_by('artist_id', 'position').values_list('artist_id', 'genre__name'):
+        artist_genres.setdefault(artist_id, []).append(name)
+
+    artists = list(Artist.objects.filter(spotify_id__in=artist_genres))
+    for artist in artists:
+        artist.legacy_genres = ", ".join(artist_genres[artist.spotify_id])
+    Artist.objects.bulk_update(artists, ['legacy_genres'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    """
+    Artist.genres(콤마로 구분된 TextField)를 Genre 테이블 + ArtistGenre N:M 연결로 정규화합니다.
+    """
+
+    dependencies = [
+        ('main', '0014_syncstate_data_version'),
+    ]
+
+    operations = [
+        migrations.RenameField(model_name='artist', old_name='genres', new_name='legacy_genres'),
+        migrations.CreateModel(
+            name='Genre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArtistGenre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('artist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='artist_genres', to='main.artist')),
+                ('genre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='artist_genres', to='main.genre')),
+            ],
+            options={
+                'ordering': ['artist', 'position'],
+                'unique_together': {('artist', 'genre')},
+            },
+        ),
+        migrations.AddField(
+            model_name='artist',
+            name='genres',
+            field=models.ManyToManyField(blank=True, related_name='artists', through='main.ArtistGenre', to='main.genre'),
+        ),
+        migrations.RunPython(split_legacy_genres, join_genres_back),
+        migrations.RemoveField(model_name='artist', name='legacy_genres'),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_genre_artistgenre'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='track',
+            index=models.Index(fields=['user', 'time_range', 'genre'], name='track_user_range_genre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='track',
+            index=models.Index(fields=['user', 'time_range', 'popularity'], name='track_user_range_pop_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='track',
+            index=models.Index(fields=['user', 'time_range', 'artist'], name='track_user_range_artist_idx'),
+        ),
+    ]
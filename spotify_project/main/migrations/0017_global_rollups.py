@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_track_analytics_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncstate',
+            name='rollup_contribution',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.CreateModel(
+            name='ArtistRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time_range', models.CharField(choices=[('short_term', 'Short term'), ('medium_term', 'Medium term'), ('long_term', 'Long term')], max_length=20)),
+                ('track_count', models.PositiveIntegerField(default=0)),
+                ('user_count', models.PositiveIntegerField(default=0)),
+                ('artist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='main.artist')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['time_range', '-track_count'], name='artist_rollup_top_idx')],
+                'unique_together': {('time_range', 'artist')},
+            },
+        ),
+        migrations.CreateModel(
+            name='GenreRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time_range', models.CharField(choices=[('short_term', 'Short term'), ('medium_term', 'Medium term'), ('long_term', 'Long term')], max_length=20)),
+                ('track_count', models.PositiveIntegerField(default=0)),
+                ('user_count', models.PositiveIntegerField(default=0)),
+                ('popularity_sum', models.PositiveBigIntegerField(default=0)),
+                ('popularity_count', models.PositiveIntegerField(default=0)),
+                ('genre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='main.genre')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['time_range', '-track_count'], name='genre_rollup_top_idx')],
+                'unique_together': {('time_range', 'genre')},
+            },
+        ),
+    ]
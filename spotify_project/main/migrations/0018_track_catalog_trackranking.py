@@ -0,0 +1,107 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def split_legacy_tracks(apps, schema_editor):
+    """사용자별 Track 행을 공용 카탈로그(Track) + 사용자 순위(TrackRanking)로 나눕니다."""
+    LegacyTrack = apps.get_model('main', 'LegacyTrack')
+    Track = apps.get_model('main', 'Track')
+    TrackRanking = apps.get_model('main', 'TrackRanking')
+
+    # 같은 트랙이 여러 행에 있으면 가장 최근에 기록된 행(id가 가장 큰 행)의 정보를 사용합니다.
+    catalog = {}
+    for legacy in LegacyTrack.objects.order_by('id'):
+        catalog[legacy.spotify_id] = Track(
+            spotify_id=legacy.spotify_id,
+            name=legacy.name,
+            popularity=legacy.popularity,
+            release_year=legacy.release_year,
+            duration_ms=legacy.duration_ms,
+            genre=legacy.genre,
+            artist_id=legacy.artist_id,
+        )
+    Track.objects.bulk_create(catalog.values(), batch_size=500)
+
+    TrackRanking.objects.bulk_create(
+        [
+            TrackRanking(
+                user_id=user_id,
+                track_id=spotify_id,
+                time_range=time_range,
+                ranking=ranking,
+            )
+            for user_id, spotify_id, time_range, ranking in
+            LegacyTrack.objects.values_list('user_id', 'spotify_id', 'time_range', 'ranking')
+        ],
+        batch_size=500,
+    )
+
+
+def merge_tracks_back(apps, schema_editor):
+    """되돌릴 때는 순위마다 카탈로그 정보를 복사해 사용자별 Track 행으로 합칩니다."""
+    LegacyTrack = apps.get_model('main', 'LegacyTrack')
+    TrackRanking = apps.get_model('main', 'TrackRanking')
+
+    LegacyTrack.objects.bulk_create(
+        [
+            LegacyTrack(
+                spotify_id=ranking.track.spotify_id,
+                name=ranking.track.name,
+                popularity=ranking.track.popularity,
+                release_year=ranking.track.release_year,
+                duration_ms=ranking.track.duration_ms,
+                genre=ranking.track.genre,
+                artist_id=ranking.track.artist_id,
+                user_id=ranking.user_id,
+                time_range=ranking.time_range,
+                ranking=ranking.ranking,
+            )
+            for ranking in TrackRanking.objects.select_related('track')
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+    """
+    사용자 / 기간마다 트랙 정보를 중복 저장하던 Track을
+    공용 카탈로그(Track, spotify_id 기본 키)와 사용자 순위(TrackRanking)로 분리합니다.
+    """
+
+    dependencies = [
+        ('main', '0017_global_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RenameModel(old_name='Track', new_name='LegacyTrack'),
+        migrations.CreateModel(
+            name='Track',
+            fields=[
+                ('spotify_id', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('popularity', models.IntegerField(blank=True, null=True)),
+                ('release_year', models.IntegerField(blank=True, help_text='트랙이 발매된 연도', null=True)),
+                ('duration_ms', models.IntegerField(blank=True, null=True)),
+                ('genre', models.CharField(blank=True, help_text='Track의 대표 장르 (Artist의 첫 번째 장르)', max_length=100)),
+                ('artist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tracks', to='main.artist')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrackRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time_range', models.CharField(choices=[('short_term', 'Short term'), ('medium_term', 'Medium term'), ('long_term', 'Long term')], default='long_term', max_length=20)),
+                ('ranking', models.IntegerField(help_text='사용자 Top Tracks 목록에서의 순위 (1, 2, 3...)')),
+                ('track', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='main.track')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='track_rankings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['user', 'time_range', 'ranking'],
+                'unique_together': {('user', 'time_range', 'ranking'), ('user', 'time_range', 'track')},
+            },
+        ),
+        migrations.RunPython(split_legacy_tracks, merge_tracks_back),
+        migrations.DeleteModel(name='LegacyTrack'),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0019_ranking_snapshots'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpotifyProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('spotify_id', models.CharField(max_length=50)),
+                ('display_name', models.CharField(blank=True, default='', max_length=255)),
+                ('country', models.CharField(blank=True, default='', max_length=10)),
+                ('product', models.CharField(blank=True, default='', max_length=30)),
+                ('image_urls', models.JSONField(blank=True, default=list)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.RemoveConstraint(
+            model_name='ingestjob',
+            name='unique_active_ingest_job_per_user',
+        ),
+        migrations.AddField(
+            model_name='ingestjob',
+            name='kind',
+            field=models.CharField(choices=[('top_tracks', 'Top tracks'), ('profile', 'Profile')], default='top_tracks', max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='ingestjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('user', 'kind'), name='unique_active_ingest_job_per_user_kind'),
+        ),
+        migrations.AddField(
+            model_name='spotifyprofile',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='spotify_profile', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
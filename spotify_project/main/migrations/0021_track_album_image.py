@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0020_spotify_profile_job_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='track',
+            name='album_image_url',
+            field=models.URLField(blank=True, default='', max_length=500),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0021_track_album_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Playlist',
+            fields=[
+                ('spotify_id', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('name', models.CharField(blank=True, default='', max_length=255)),
+                ('owner_id', models.CharField(blank=True, default='', max_length=100)),
+                ('owner_name', models.CharField(blank=True, default='', max_length=255)),
+                ('image_url', models.URLField(blank=True, default='', max_length=500)),
+                ('public', models.BooleanField(blank=True, null=True)),
+                ('track_total', models.PositiveIntegerField(default=0)),
+                ('snapshot_id', models.CharField(blank=True, default='', max_length=100)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='ingestjob',
+            name='kind',
+            field=models.CharField(choices=[('top_tracks', 'Top tracks'), ('profile', 'Profile'), ('playlists', 'Playlists')], default='top_tracks', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='PlaylistLibrary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('synced_at', models.DateTimeField()),
+                ('playlist_count', models.PositiveIntegerField(default=0)),
+                ('unique_track_count', models.PositiveIntegerField(default=0)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='playlist_library', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PlaylistItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('track_id', models.CharField(max_length=50)),
+                ('position', models.PositiveIntegerField()),
+                ('playlist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='main.playlist')),
+            ],
+            options={
+                'ordering': ['playlist', 'position'],
+                'unique_together': {('playlist', 'track_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PlaylistOverlap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shared_count', models.PositiveIntegerField()),
+                ('jaccard', models.FloatField()),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.playlist')),
+                ('playlist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='overlaps', to='main.playlist')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='playlist_overlaps', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'playlist', '-shared_count'], name='playlist_overlap_top_idx')],
+                'unique_together': {('user', 'playlist', 'other')},
+            },
+        ),
+        migrations.CreateModel(
+            name='UserPlaylist',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('playlist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_links', to='main.playlist')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_playlists', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['user', 'position'],
+                'indexes': [models.Index(fields=['user', 'position'], name='user_playlist_position_idx')],
+                'unique_together': {('user', 'playlist')},
+            },
+        ),
+    ]
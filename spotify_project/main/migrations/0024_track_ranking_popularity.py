@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:57
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_catalog_popularity(apps, schema_editor):
+    """기존 순위 행은 현재 카탈로그(Track)의 인기도로 채웁니다."""
+    Track = apps.get_model('main', 'Track')
+    TrackRanking = apps.get_model('main', 'TrackRanking')
+
+    TrackRanking.objects.update(
+        popularity=Subquery(Track.objects.filter(spotify_id=OuterRef('track_id')).values('popularity')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0022_playlists'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trackranking',
+            name='popularity',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(copy_catalog_popularity, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='trackranking',
+            index=models.Index(fields=['user', 'time_range', 'popularity'], name='ranking_user_range_pop_idx'),
+        ),
+    ]
@@ -3,6 +3,16 @@ from django.contrib.auth.models import User
 
 
 
+class Genre(models.Model):
+    """
+    장르 이름 테이블. 여러 아티스트가 같은 Genre 행을 공유합니다.
+    """
+    name = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
 class Artist(models.Model):
     """
     Spotify 아티스트 정보를 저장하는 모델.
@@ -27,7 +37,11 @@ class Artist(models.Model):
     followers_total = models.IntegerField(null=True, blank=True)
     
     # ⭐ 장르 정보: 국적 추론 및 장르 시각화의 핵심 필드.
-    genres = models.TextField(default='', blank=True, help_text="콤마로 구분된 장르 리스트") 
+    # Genre 테이블과 N:M 관계 (ArtistGenre에 Spotify 응답의 장르 순서를 함께 저장)
+    genres = models.ManyToManyField('Genre', through='ArtistGenre', related_name='artists', blank=True)
+
+    # 메타데이터를 Spotify API에서 마지막으로 받아온 시각 (TTL 캐시 판단용)
+    fetched_at = models.DateTimeField(null=True, blank=True, db_index=True)
     
     # ----------------------------------------------------
     # (외부 URL 필드는 요구에 따라 제거됨)
@@ -40,14 +54,32 @@ class Artist(models.Model):
     def __str__(self):
         return self.name
     
+class ArtistGenre(models.Model):
+    """
+    Artist - Genre N:M 연결 테이블.
+    position은 Spotify 응답에서의 장르 순서입니다. (0번이 Track.genre에 쓰이는 대표 장르)
+    """
+    artist = models.ForeignKey(Artist, on_delete=models.CASCADE, related_name='artist_genres')
+    genre = models.ForeignKey(Genre, on_delete=models.CASCADE, related_name='artist_genres')
+    position = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        unique_together = [('artist', 'genre')]
+        ordering = ['artist', 'position']
+
+    def __str__(self):
+        return f"{self.artist_id} - {self.genre_id} ({self.position})"
+
+
 class Track(models.Model):
     """
-    사용자의 Top Track 데이터와 커스텀 순위를 저장하는 핵심 모델.
+    Spotify 트랙 정보를 저장하는 공용 카탈로그 모델.
+    여러 사용자 / 기간의 순위(TrackRanking)가 같은 Track 행을 공유하므로, 트랙 정보는 한 번만 저장됩니다.
     """
     # ----------------------------------------------------
     # 1. Spotify 기본 정보 (사용자 요청 필드 포함)
     # ----------------------------------------------------
-    # trackid
+    # ⭐ Primary Key: 트랙의 Spotify ID
     spotify_id = models.CharField(max_length=50, primary_key=True) 
     # track name
     name = models.CharField(max_length=255)
@@ -60,6 +92,9 @@ class Track(models.Model):
 
     # track duration (길이 정보)
     duration_ms = models.IntegerField(null=True, blank=True)
+
+    # 앨범 이미지 URL (대시보드 표시용)
+    album_image_url = models.URLField(max_length=500, blank=True, default='')
     
     # 단일 장르 또는 콤마로 구분된 여러 장르를 저장하기 위해 TextField 사용
     genre = models.CharField(
@@ -78,33 +113,379 @@ class Track(models.Model):
         on_delete=models.CASCADE, 
         related_name='tracks'
     )
-    
-    # 사용자 연결: 이 Top Track이 어떤 User의 목록인지 식별 (N:1 관계)
+
+    def __str__(self):
+        return f"{self.name} ({self.genre})"
+
+
+class TrackRanking(models.Model):
+    """
+    사용자의 기간별 Top Track 순위 (과제 핵심: 커스텀 순위).
+    트랙 정보는 Track 카탈로그를 참조하고, 사용자 / 기간 / 순위만 저장하는 가벼운 테이블입니다.
+    """
+    # Spotify Top Track 집계 기간
+    TIME_RANGE_SHORT = 'short_term'    # 최근 약 4주
+    TIME_RANGE_MEDIUM = 'medium_term'  # 최근 약 6개월
+    TIME_RANGE_LONG = 'long_term'      # 약 1년 이상
+    TIME_RANGE_CHOICES = [
+        (TIME_RANGE_SHORT, 'Short term'),
+        (TIME_RANGE_MEDIUM, 'Medium term'),
+        (TIME_RANGE_LONG, 'Long term'),
+    ]
+    TIME_RANGES = (TIME_RANGE_SHORT, TIME_RANGE_MEDIUM, TIME_RANGE_LONG)
+
+    # 사용자 연결: 이 순위가 어떤 User의 목록인지 식별 (N:1 관계)
     user = models.ForeignKey(
         User, 
         on_delete=models.CASCADE, 
-        related_name='top_tracks'
+        related_name='track_rankings'
     )
-    
-    # ----------------------------------------------------
-    # 3. 과제 목표: 커스텀 순위
-    # ----------------------------------------------------
-    
+
+    # 순위에 오른 트랙 (N:1 관계)
+    track = models.ForeignKey(
+        Track,
+        on_delete=models.CASCADE,
+        related_name='rankings'
+    )
+
+    # 순위의 집계 기간 (short_term / medium_term / long_term)
+    time_range = models.CharField(max_length=20, choices=TIME_RANGE_CHOICES, default=TIME_RANGE_LONG)
+
     # ⭐ track ranking (과제 핵심) ⭐
     ranking = models.IntegerField(help_text="사용자 Top Tracks 목록에서의 순위 (1, 2, 3...)") 
 
-    # ----------------------------------------------------
-    # 4. 메타데이터 (순위 중복 방지)
-    # ----------------------------------------------------
+    # 이 사용자가 동기화한 시점의 트랙 인기도 (0-100)
+    # 카탈로그(Track.popularity)는 다른 사용자의 동기화로 바뀔 수 있으므로, 인기도 분포 / 캐시 / 전체 통계는 이 값을 사용합니다.
+    # (그래야 사용자의 data_version이 바뀌지 않는 한 분포 결과도 바뀌지 않습니다.)
+    popularity = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        # 한 사용자는 같은 기간 안에서 동일한 순위/트랙을 두 번 가질 수 없도록 제약 조건 설정
+        unique_together = [('user', 'time_range', 'ranking'), ('user', 'time_range', 'track')]
+        ordering = ['user', 'time_range', 'ranking'] 
+        indexes = [models.Index(fields=['user', 'time_range', 'popularity'], name='ranking_user_range_pop_idx')]
+
+    def __str__(self):
+        return f"[{self.ranking}] {self.track_id} ({self.user_id}, {self.time_range})"
+
+
+class PopularityPrefixHistogram(models.Model):
+    """
+    사용자의 순위 구간(상위 N개)별 누적 인기도 분포를 미리 계산해 둔 테이블.
+    동기화가 끝날 때마다 다시 만들며, 인기도 슬라이더 요청은 (user, time_range, ranking) 인덱스 조회 한 번으로 응답합니다.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='popularity_prefix_histograms')
+    time_range = models.CharField(max_length=20, choices=TrackRanking.TIME_RANGE_CHOICES)
+
+    # 이 행이 나타내는 순위 구간의 끝 (ranking 이하인 트랙들의 분포)
+    ranking = models.IntegerField()
+
+    # 인기도 버킷(1-10, 11-20, ..., 91-100)별 누적 트랙 수
+    counts = models.JSONField(default=list)
+
+    class Meta:
+        unique_together = ('user', 'time_range', 'ranking')
+
+    def __str__(self):
+        return f"PopularityPrefixHistogram({self.user_id}, {self.time_range}, {self.ranking})"
+
+
+class RankingSnapshot(models.Model):
+    """
+    동기화 시점의 기간별 Top Track 순위 기록 (순위 변화 추적용).
+    일정 간격의 키프레임만 전체 순서를 저장하고, 나머지는 직전 스냅샷과의 차이(delta)만 저장합니다.
+    (인코딩 / 디코딩 / 보관 정책은 main/history.py 참고)
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ranking_snapshots')
+    time_range = models.CharField(max_length=20, choices=TrackRanking.TIME_RANGE_CHOICES)
+    taken_at = models.DateTimeField()
+
+    # True: data = 순위 순서대로의 트랙 ID 목록 / False: data = 직전 스냅샷 대비 변경 [[i1, i2, [트랙 ID...]], ...]
+    is_keyframe = models.BooleanField(default=False)
+    data = models.JSONField(default=list)
+
+    class Meta:
+        ordering = ['user', 'time_range', 'taken_at']
+        unique_together = ('user', 'time_range', 'taken_at')
+
+    def __str__(self):
+        return f"RankingSnapshot({self.user_id}, {self.time_range}, {self.taken_at:%Y-%m-%d})"
+
+
+class GenreRollup(models.Model):
+    """
+    전체 사용자의 기간별 장르 통계.
+    동기화마다 해당 사용자의 이전 기여분을 빼고 새 기여분을 더하는 방식으로 갱신하므로, 조회 시 Track 테이블을 집계하지 않습니다.
+    """
+    time_range = models.CharField(max_length=20, choices=TrackRanking.TIME_RANGE_CHOICES)
+    genre = models.ForeignKey(Genre, on_delete=models.CASCADE, related_name='rollups')
+
+    # 이 장르에 해당하는 트랙 수 (트랙마다 아티스트의 모든 장르를 셈) / 이 장르 트랙을 가진 사용자 수
+    track_count = models.PositiveIntegerField(default=0)
+    user_count = models.PositiveIntegerField(default=0)
+
+    # 평균 인기도 계산용 (인기도가 있는 트랙만)
+    popularity_sum = models.PositiveBigIntegerField(default=0)
+    popularity_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('time_range', 'genre')
+        indexes = [models.Index(fields=['time_range', '-track_count'], name='genre_rollup_top_idx')]
+
+    @property
+    def average_popularity(self):
+        return self.popularity_sum / self.popularity_count if self.popularity_count else None
+
+    def __str__(self):
+        return f"GenreRollup({self.time_range}, {self.genre_id}, {self.track_count})"
+
+
+class ArtistRollup(models.Model):
+    """전체 사용자의 기간별 아티스트 통계. (GenreRollup과 같은 방식으로 증분 갱신)"""
+    time_range = models.CharField(max_length=20, choices=TrackRanking.TIME_RANGE_CHOICES)
+    artist = models.ForeignKey(Artist, on_delete=models.CASCADE, related_name='rollups')
+
+    track_count = models.PositiveIntegerField(default=0)
+    user_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('time_range', 'artist')
+        indexes = [models.Index(fields=['time_range', '-track_count'], name='artist_rollup_top_idx')]
+
+    def __str__(self):
+        return f"ArtistRollup({self.time_range}, {self.artist_id}, {self.track_count})"
+
+
+class SyncState(models.Model):
+    """
+    사용자별 Top Track 동기화 상태.
+    마지막으로 저장한 데이터의 해시를 보관하여, 변경이 없는 재동기화는 DB 쓰기를 건너뜁니다.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='sync_state')
+
+    # 마지막으로 DB에 반영한 아티스트/트랙 데이터의 SHA-256 해시
+    payload_hash = models.CharField(max_length=64, blank=True, default='')
+
+    # 마지막 동기화(변경 없음 포함) 완료 시각
+    synced_at = models.DateTimeField(null=True, blank=True)
+
+    # 데이터가 실제로 바뀐 동기화마다 1씩 증가하는 버전 (시각화 캐시 키에 사용)
+    data_version = models.PositiveIntegerField(default=0)
+
+    # 이 사용자가 전체 통계(GenreRollup / ArtistRollup)에 마지막으로 더한 값 (다음 동기화 때 빼고 새 값을 더함)
+    rollup_contribution = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return f"SyncState({self.user_id}, {self.synced_at})"
+
+
+class SyncRun(models.Model):
+    """
+    Top Track 동기화 1회의 실행 기록.
+    단계별(page_fetch / artist_fetch / album_fetch / artist_upsert / track_write) 소요 시간,
+    API 호출·오류 수, DB 쿼리 수, 기록한 행 수를 남겨 병목 단계와 성능 저하를 추적합니다.
+    """
+    STATUS_OK = 'ok'
+    STATUS_SKIPPED = 'skipped'  # 수집 결과가 지난 동기화와 같아 쓰기를 생략한 경우
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_OK, 'OK'),
+        (STATUS_SKIPPED, 'Skipped (unchanged)'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sync_runs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField()
+    total_ms = models.FloatField()
+
+    # [{"name": "page_fetch", "wall_ms": 812.3, "api_calls": 30, "api_errors": 0, "db_queries": 0, "rows_written": 0}, ...]
+    phases = models.JSONField(default=list)
+
+    # 캐시 사용 / 생략한 상세 조회 호출 수 등 save_top_tracks_data의 수집 통계
+    # + 'scheduler': 동기화 동안 늘어난 요청 스케줄러 카운터 (calls / retries / rate_limited / dropped)
+    stats = models.JSONField(default=dict, blank=True)
+
+    error = models.TextField(blank=True, default='')
+
     class Meta:
-        # 한 사용자는 동일한 순위를 두 번 가질 수 없도록 제약 조건 설정
-        unique_together = ('user', 'ranking')
-        ordering = ['user', 'ranking'] 
+        ordering = ['-started_at']
+        indexes = [models.Index(fields=['user', '-started_at'])]
 
     def __str__(self):
-        return f"[{self.ranking}] {self.name} ({self.genre})"
+        return f"SyncRun({self.user_id}, {self.status}, {self.total_ms}ms)"
+
+
+class IngestJob(models.Model):
+    """
+    백그라운드 Top Track 수집 / 프로필 갱신 / 재생 목록 수집 작업 (외부 브로커 없이 DB 테이블을 작업 큐로 사용).
+    manage.py ingest_worker 프로세스가 queued 작업을 가져가 실행합니다.
+    """
+    KIND_TOP_TRACKS = 'top_tracks'
+    KIND_PROFILE = 'profile'
+    KIND_PLAYLISTS = 'playlists'
+    KIND_CHOICES = [
+        (KIND_TOP_TRACKS, 'Top tracks'),
+        (KIND_PROFILE, 'Profile'),
+        (KIND_PLAYLISTS, 'Playlists'),
+    ]
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    # 대기 중이거나 실행 중인 작업 (사용자당 최대 1개)
+    ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ingest_jobs')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=KIND_TOP_TRACKS)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+
+    # 현재 진행 중인 단계 (pages / artists / albums / tracks)
+    phase = models.CharField(max_length=20, blank=True, default='')
+
+    # 단계별 진행 상황: {"pages": {"done": 3, "total": 10}, ...}
+    progress = models.JSONField(default=dict, blank=True)
+
+    error = models.TextField(blank=True, default='')
+    attempts = models.IntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # Worker가 살아 있음을 알리는 마지막 시각 (오래 갱신되지 않은 running 작업은 다시 가져감)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        constraints = [
+            # 같은 사용자의 같은 종류 작업이 중복으로 쌓이지 않도록 활성 작업은 하나만 허용
+            models.UniqueConstraint(
+                fields=['user', 'kind'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='unique_active_ingest_job_per_user_kind',
+            ),
+        ]
+
+    def __str__(self):
+        return f"IngestJob({self.user_id}, {self.kind}, {self.status}, {self.phase})"
+
+
+class SpotifyProfile(models.Model):
+    """
+    페이지 헤더에 표시할 Spotify 프로필 (sp.me() 결과 중 필요한 값만 저장).
+    로그인할 때 저장하고, SPOTIFY_PROFILE_TTL_SECONDS가 지나면 백그라운드 작업으로 다시 가져옵니다.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='spotify_profile')
+    spotify_id = models.CharField(max_length=50)
+    display_name = models.CharField(max_length=255, blank=True, default='')
+    country = models.CharField(max_length=10, blank=True, default='')
+    product = models.CharField(max_length=30, blank=True, default='')  # premium / free ...
 
+    # 프로필 이미지 URL 목록 (Spotify 응답 순서 그대로)
+    image_urls = models.JSONField(default=list, blank=True)
 
+    fetched_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"SpotifyProfile({self.user_id}, {self.display_name})"
+
+
+class Playlist(models.Model):
+    """
+    Spotify 재생 목록 (여러 사용자가 같은 재생 목록을 팔로우하면 한 행을 공유합니다).
+    snapshot_id는 PlaylistItem을 저장한 시점의 재생 목록 버전이며, 바뀌지 않았으면 트랙 목록을 다시 받지 않습니다.
+    """
+    spotify_id = models.CharField(max_length=50, primary_key=True)
+    name = models.CharField(max_length=255, blank=True, default='')
+    owner_id = models.CharField(max_length=100, blank=True, default='')
+    owner_name = models.CharField(max_length=255, blank=True, default='')
+    image_url = models.URLField(max_length=500, blank=True, default='')
+    public = models.BooleanField(null=True, blank=True)
+
+    # Spotify가 알려 준 트랙 수 (중복 / 로컬 파일 포함) / 저장한 PlaylistItem의 재생 목록 버전
+    track_total = models.PositiveIntegerField(default=0)
+    snapshot_id = models.CharField(max_length=100, blank=True, default='')
+
+    fetched_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} ({self.spotify_id})"
+
+
+class UserPlaylist(models.Model):
+    """사용자 라이브러리의 재생 목록 (position: Spotify 라이브러리 순서)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='user_playlists')
+    playlist = models.ForeignKey(Playlist, on_delete=models.CASCADE, related_name='user_links')
+    position = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('user', 'playlist')
+        ordering = ['user', 'position']
+        indexes = [models.Index(fields=['user', 'position'], name='user_playlist_position_idx')]
+
+    def __str__(self):
+        return f"[{self.position}] {self.playlist_id} ({self.user_id})"
+
+
+class PlaylistItem(models.Model):
+    """
+    재생 목록에 들어 있는 트랙 (트랙 ID만 참조하며, 같은 트랙은 재생 목록마다 한 번만 저장).
+    position은 재생 목록에서 그 트랙이 처음 나오는 위치입니다.
+    """
+    playlist = models.ForeignKey(Playlist, on_delete=models.CASCADE, related_name='items')
+    track_id = models.CharField(max_length=50)
+    position = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('playlist', 'track_id')
+        ordering = ['playlist', 'position']
+
+    def __str__(self):
+        return f"[{self.position}] {self.track_id} ({self.playlist_id})"
+
+
+class PlaylistOverlap(models.Model):
+    """
+    사용자 라이브러리 안에서 재생 목록마다 트랙이 가장 많이 겹치는 재생 목록 (상위 PLAYLIST_OVERLAP_TOP_N개).
+    재생 목록 수집이 끝날 때마다 다시 계산합니다. (main/playlists.py)
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='playlist_overlaps')
+    playlist = models.ForeignKey(Playlist, on_delete=models.CASCADE, related_name='overlaps')
+    other = models.ForeignKey(Playlist, on_delete=models.CASCADE, related_name='+')
+
+    # 두 재생 목록에 모두 있는 트랙 수 / 자카드 유사도 (공통 트랙 수 / 합집합 트랙 수)
+    shared_count = models.PositiveIntegerField()
+    jaccard = models.FloatField()
+
+    class Meta:
+        unique_together = ('user', 'playlist', 'other')
+        indexes = [models.Index(fields=['user', 'playlist', '-shared_count'], name='playlist_overlap_top_idx')]
+
+    def __str__(self):
+        return f"PlaylistOverlap({self.playlist_id}, {self.other_id}, {self.shared_count})"
+
+
+class PlaylistLibrary(models.Model):
+    """사용자별 재생 목록 수집 상태 (마지막 수집 시각과 라이브러리 요약)."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='playlist_library')
+    synced_at = models.DateTimeField()
+    playlist_count = models.PositiveIntegerField(default=0)
+
+    # 라이브러리 전체에서 중복을 제외한 트랙 수
+    unique_track_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"PlaylistLibrary({self.user_id}, {self.playlist_count}, {self.synced_at})"
 
 
 class SpotifyToken(models.Model):
@@ -0,0 +1,398 @@
+import heapq
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.utils import timezone
+
+from . import spotify
+from .models import Playlist, PlaylistItem, PlaylistLibrary, PlaylistOverlap, UserPlaylist
+
+# main/playlists.py
+# 사용자의 재생 목록 라이브러리 전체를 수집(IngestJob.KIND_PLAYLISTS)하고, 재생 목록 화면 / 겹침 분석을 DB에서 제공하는 로직.
+#
+# 수집:
+#   1. 재생 목록 페이지(50개 단위): 첫 페이지로 total을 확인한 뒤 나머지 페이지를 병렬로 요청
+#   2. snapshot_id가 바뀐(또는 처음 보는) 재생 목록만 트랙 페이지(100개 단위)를 모두 병렬로 요청
+#      (동시 요청 수는 SPOTIFY_FETCH_CONCURRENCY, 초당 요청 수는 scheduler.py의 스케줄러가 제한)
+#   3. 재생 목록 / 라이브러리 순서 / 트랙 ID(재생 목록마다 중복 제거)를 저장
+#   4. 트랜잭션 커밋 후 겹침 상위 목록을 다시 계산 (CPU 계산 동안 SQLite 쓰기 잠금을 잡지 않도록)
+#
+# 겹침 계산:
+#   트랙 ID마다 번호를 매겨 재생 목록을 정수 Bitset으로 만들면, 두 재생 목록의 공통 트랙 수는
+#   (a & b).bit_count() 한 번으로 구할 수 있습니다. (트랙을 하나씩 비교하지 않고 64비트 단위로 한 번에 비교)
+#   트랙별 재생 목록 Bitset도 만들어, 공통 트랙이 하나도 없는 쌍은 아예 비교하지 않습니다.
+#   쌍은 하나씩 흘려보내고 재생 목록마다 크기 top_n의 Heap만 유지하므로, 전체 쌍 목록을 메모리에 만들지 않습니다.
+
+logger = logging.getLogger(__name__)
+
+PLAYLISTS_PAGE_LIMIT = 50        # current_user_playlists 한 페이지 크기 (API 최대 50)
+PLAYLIST_ITEMS_PAGE_LIMIT = 100  # playlist_items 한 페이지 크기 (API 최대 100)
+PLAYLIST_ITEM_FIELDS = 'items(track(id,type)),total'  # 트랙 ID만 받아 응답 크기를 줄임
+
+
+# ----------------------------------------------------
+# 수집 (Spotify API)
+# ----------------------------------------------------
+
+def fetch_library(sp, on_progress=None):
+    """
+    라이브러리의 모든 재생 목록을 Spotify 라이브러리 순서대로 반환합니다. (같은 재생 목록은 한 번만)
+    첫 페이지로 total을 확인한 뒤 나머지 페이지는 병렬로 요청합니다.
+    """
+    first_page = sp.current_user_playlists(limit=PLAYLISTS_PAGE_LIMIT, offset=0) or {}
+    offsets = list(range(PLAYLISTS_PAGE_LIMIT, first_page.get('total') or 0, PLAYLISTS_PAGE_LIMIT))
+
+    def fetch_page(offset):
+        return sp.current_user_playlists(limit=PLAYLISTS_PAGE_LIMIT, offset=offset)
+
+    playlists = {}
+    for page in [first_page, *spotify._fetch_concurrently(fetch_page, offsets, on_progress)]:
+        for playlist_data in (page or {}).get('items', []):
+            if playlist_data and playlist_data.get('id'):
+                playlists.setdefault(playlist_data['id'], playlist_data)
+    return list(playlists.values())
+
+
+def _track_total(playlist_data):
+    return ((playlist_data.get('tracks') or {}).get('total')) or 0
+
+
+def fetch_playlist_track_ids(sp, playlists, on_progress=None):
+    """
+    재생 목록들의 트랙 페이지를 모두 한 번에 병렬로 요청하여 {재생 목록 ID: [트랙 ID, ...]} 로 반환합니다.
+    트랙 ID는 재생 목록 순서대로이며, 로컬 파일 / 팟캐스트 에피소드처럼 ID가 없는 항목은 제외합니다.
+    페이지 요청이 (재시도 후에도) 실패한 재생 목록은 결과에서 빠집니다. (다음 수집 때 다시 요청)
+    """
+    pages = [
+        (playlist_data['id'], offset)
+        for playlist_data in playlists
+        for offset in range(0, _track_total(playlist_data), PLAYLIST_ITEMS_PAGE_LIMIT)
+    ]
+
+    def fetch_page(page):
+        playlist_id, offset = page
+        try:
+            return sp.playlist_items(
+                playlist_id,
+                fields=PLAYLIST_ITEM_FIELDS,
+                limit=PLAYLIST_ITEMS_PAGE_LIMIT,
+                offset=offset,
+                additional_types=('track',),
+            )
+        except Exception as e:
+            logger.warning("재생 목록 %s 트랙 페이지(offset=%d) 호출 중 오류 발생: %s", playlist_id, offset, e)
+            return None
+
+    track_ids_by_playlist = {playlist_data['id']: [] for playlist_data in playlists}
+    failed_playlist_ids = set()
+    # 결과는 (재생 목록, offset) 순서대로 돌아오므로 이어 붙이기만 하면 재생 목록 순서가 유지됩니다.
+    for (playlist_id, _), results in zip(pages, spotify._fetch_concurrently(fetch_page, pages, on_progress)):
+        if results is None:
+            failed_playlist_ids.add(playlist_id)
+            continue
+        track_ids_by_playlist[playlist_id].extend(
+            item['track']['id'] for item in results.get('items', [])
+            if item and item.get('track') and item['track'].get('id') and item['track'].get('type', 'track') == 'track'
+        )
+
+    for playlist_id in failed_playlist_ids:
+        del track_ids_by_playlist[playlist_id]
+    return track_ids_by_playlist
+
+
+def _playlist_row(playlist_data, snapshot_id, fetched_at):
+    images = playlist_data.get('images') or []
+    owner = playlist_data.get('owner') or {}
+    return Playlist(
+        spotify_id=playlist_data['id'],
+        name=playlist_data.get('name') or '',
+        owner_id=owner.get('id') or '',
+        owner_name=owner.get('display_name') or owner.get('id') or '',
+        image_url=images[0]['url'] if images else '',
+        public=playlist_data.get('public'),
+        track_total=_track_total(playlist_data),
+        snapshot_id=snapshot_id,
+        fetched_at=fetched_at,
+    )
+
+
+def _in_batches(values, size=spotify.DB_BATCH_SIZE):
+    values = list(values)
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+def sync_playlists(sp, django_user, progress=None):
+    """
+    사용자의 재생 목록 라이브러리 전체를 수집하여 DB에 반영합니다.
+    snapshot_id가 지난 수집과 같은 재생 목록은 트랙 목록을 다시 요청하지 않습니다.
+    progress(phase, done, total)가 주어지면 단계(playlists / playlist_tracks)별 진행 상황을 알립니다.
+    반환값: 재생 목록 수 / 트랙을 다시 받은 재생 목록 수 등의 수집 통계 Dictionary
+    """
+    def phase_progress(phase):
+        if progress is None:
+            return None
+        return lambda done, total: progress(phase, done, total)
+
+    # 1. 재생 목록 페이지 병렬 수집 (API 호출은 트랜잭션 밖에서 수행)
+    library = fetch_library(sp, on_progress=phase_progress('playlists'))
+    library_ids = [playlist_data['id'] for playlist_data in library]
+
+    # 2. 버전(snapshot_id)이 바뀐 재생 목록만 트랙 페이지 병렬 수집
+    stored_snapshots = {}
+    for batch in _in_batches(library_ids):
+        stored_snapshots.update(Playlist.objects.filter(spotify_id__in=batch).values_list('spotify_id', 'snapshot_id'))
+    changed = [
+        playlist_data for playlist_data in library
+        if not playlist_data.get('snapshot_id') or stored_snapshots.get(playlist_data['id']) != playlist_data['snapshot_id']
+    ]
+    track_ids_by_playlist = fetch_playlist_track_ids(sp, changed, on_progress=phase_progress('playlist_tracks'))
+
+    now = timezone.now()
+    playlist_rows = [
+        # 트랙 수집에 실패한 재생 목록은 이전 버전을 유지해 다음 수집 때 다시 요청합니다.
+        _playlist_row(
+            playlist_data,
+            (playlist_data.get('snapshot_id') or '') if playlist_data['id'] in track_ids_by_playlist
+            else stored_snapshots.get(playlist_data['id'], ''),
+            now,
+        )
+        for playlist_data in library
+    ]
+    item_rows = []
+    for playlist_id, track_ids in track_ids_by_playlist.items():
+        # 같은 트랙이 여러 번 들어 있으면 처음 위치만 저장
+        first_positions = {}
+        for position, track_id in enumerate(track_ids):
+            first_positions.setdefault(track_id, position)
+        item_rows.extend(
+            PlaylistItem(playlist_id=playlist_id, track_id=track_id, position=position)
+            for track_id, position in first_positions.items()
+        )
+
+    with transaction.atomic():
+        # 3. 재생 목록 Upsert (여러 사용자가 공유하는 행)
+        Playlist.objects.bulk_create(
+            playlist_rows,
+            batch_size=spotify.DB_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['spotify_id'],
+            update_fields=['name', 'owner_id', 'owner_name', 'image_url', 'public', 'track_total', 'snapshot_id', 'fetched_at'],
+        )
+
+        # 4. 다시 받은 재생 목록의 트랙 목록 교체
+        for batch in _in_batches(track_ids_by_playlist):
+            PlaylistItem.objects.filter(playlist_id__in=batch).delete()
+        PlaylistItem.objects.bulk_create(item_rows, batch_size=spotify.DB_BATCH_SIZE)
+
+        # 5. 라이브러리 순서: 빠진 재생 목록은 삭제하고, 위치가 바뀌었거나 새로 들어온 재생 목록만 기록
+        stored_positions = dict(UserPlaylist.objects.filter(user=django_user).values_list('playlist_id', 'position'))
+        positions = {playlist_id: position for position, playlist_id in enumerate(library_ids)}
+        dropped_ids = [playlist_id for playlist_id in stored_positions if playlist_id not in positions]
+        for batch in _in_batches(dropped_ids):
+            UserPlaylist.objects.filter(user=django_user, playlist_id__in=batch).delete()
+            # 더 이상 아무도 팔로우하지 않는 재생 목록은 트랙 목록과 함께 삭제
+            Playlist.objects.filter(spotify_id__in=batch, user_links__isnull=True).delete()
+        UserPlaylist.objects.bulk_create(
+            [
+                UserPlaylist(user=django_user, playlist_id=playlist_id, position=position)
+                for playlist_id, position in positions.items()
+                if stored_positions.get(playlist_id) != position
+            ],
+            batch_size=spotify.DB_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['user', 'playlist'],
+            update_fields=['position'],
+        )
+
+    # 6. 재생 목록별 겹침 상위 목록 다시 계산 (커밋 후, 쓰기 잠금 없이)
+    #    다시 받은 재생 목록은 메모리의 트랙 ID를 그대로 쓰고, 나머지 재생 목록만 DB에서 읽습니다.
+    library_tracks = {playlist_id: set(track_ids) for playlist_id, track_ids in track_ids_by_playlist.items()}
+    for batch in _in_batches(playlist_id for playlist_id in library_ids if playlist_id not in library_tracks):
+        library_tracks.update(load_library_track_ids(django_user, batch))
+    overlaps = top_overlaps(overlap_pairs(library_tracks), getattr(settings, 'PLAYLIST_OVERLAP_TOP_N', 5))
+    unique_track_count = len(set().union(*library_tracks.values()))
+
+    with transaction.atomic():
+        PlaylistOverlap.objects.filter(user=django_user).delete()
+        PlaylistOverlap.objects.bulk_create(
+            [
+                PlaylistOverlap(user=django_user, playlist_id=playlist_id, other_id=other_id,
+                                shared_count=shared_count, jaccard=jaccard)
+                for playlist_id, rows in overlaps.items()
+                for other_id, shared_count, jaccard in rows
+            ],
+            batch_size=spotify.DB_BATCH_SIZE,
+        )
+
+        PlaylistLibrary.objects.update_or_create(
+            user=django_user,
+            defaults={'synced_at': now, 'playlist_count': len(library_ids), 'unique_track_count': unique_track_count},
+        )
+
+    stats = {
+        'playlists': len(library_ids),
+        'playlists_refetched': len(track_ids_by_playlist),
+        'playlists_failed': len(changed) - len(track_ids_by_playlist),
+        'playlists_unchanged': len(library_ids) - len(changed),
+        'items_written': len(item_rows),
+        'unique_tracks': unique_track_count,
+    }
+    logger.info("Playlist sync for user %s: %s", django_user.pk, stats)
+    return stats
+
+
+# ----------------------------------------------------
+# 겹침 분석 (정수 Bitset)
+# ----------------------------------------------------
+
+def _bitset(indices, size):
+    """번호 목록 → 해당 비트가 켜진 정수 (bytearray에 비트를 켠 뒤 한 번에 정수로 변환)."""
+    bits = bytearray((size + 7) // 8)
+    for index in indices:
+        bits[index >> 3] |= 1 << (index & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def overlap_pairs(track_ids_by_playlist):
+    """
+    재생 목록 × 재생 목록 겹침 행렬에서 공통 트랙이 있는 칸만 (a, b 순서쌍마다 한 번) 계산합니다.
+    track_ids_by_playlist: {재생 목록 ID: 트랙 ID 목록 또는 집합}
+    반환값: (재생 목록 a, 재생 목록 b, 공통 트랙 수, 합집합 트랙 수)를 하나씩 내보내는 Generator
+    """
+    playlist_ids = list(track_ids_by_playlist)
+    track_index = {}
+    members = [
+        {track_index.setdefault(track_id, len(track_index)) for track_id in track_ids}
+        for track_ids in track_ids_by_playlist.values()
+    ]
+
+    playlists_by_track = [[] for _ in range(len(track_index))]
+    for playlist_index, track_indices in enumerate(members):
+        for track_index_ in track_indices:
+            playlists_by_track[track_index_].append(playlist_index)
+
+    playlist_masks = [_bitset(track_indices, len(track_index)) for track_indices in members]
+    track_masks = [_bitset(playlist_indices, len(playlist_ids)) for playlist_indices in playlists_by_track]
+
+    for a, track_indices in enumerate(members):
+        # a와 트랙을 하나라도 공유하는 재생 목록 중 a 뒤의 것만 비교합니다.
+        candidates = 0
+        for track_index_ in track_indices:
+            candidates |= track_masks[track_index_]
+        candidates >>= a + 1
+
+        while candidates:
+            lowest = candidates & -candidates
+            b = a + lowest.bit_length()
+            candidates ^= lowest
+
+            shared_count = (playlist_masks[a] & playlist_masks[b]).bit_count()
+            yield (playlist_ids[a], playlist_ids[b], shared_count,
+                   len(track_indices) + len(members[b]) - shared_count)
+
+
+def top_overlaps(pairs, top_n):
+    """
+    겹침 쌍(overlap_pairs의 Generator 등) → 재생 목록마다 공통 트랙이 가장 많은 상위 top_n개.
+    재생 목록마다 크기 top_n의 최소 Heap만 유지하므로 메모리는 쌍의 수와 관계없이 (재생 목록 수 × top_n) 입니다.
+    반환값: {재생 목록 ID: [(다른 재생 목록 ID, 공통 트랙 수, 자카드 유사도), ...]}
+    """
+    heaps = defaultdict(list)
+
+    def push(playlist_id, row):
+        heap = heaps[playlist_id]
+        if len(heap) < top_n:
+            heapq.heappush(heap, row)
+        elif heap and row > heap[0]:
+            heapq.heapreplace(heap, row)
+
+    for a, b, shared_count, union_count in pairs:
+        jaccard = shared_count / union_count
+        push(a, (shared_count, jaccard, b))
+        push(b, (shared_count, jaccard, a))
+
+    return {
+        playlist_id: [
+            (other_id, shared_count, round(jaccard, 4))
+            for shared_count, jaccard, other_id in sorted(heap, reverse=True)
+        ]
+        for playlist_id, heap in heaps.items()
+    }
+
+
+def load_library_track_ids(django_user, playlist_ids=None):
+    """
+    저장된 재생 목록별 트랙 ID 집합 {재생 목록 ID: {트랙 ID, ...}} (쿼리 1번).
+    playlist_ids를 주면 해당 재생 목록만 읽고 트랙이 없는 재생 목록도 빈 집합으로 포함합니다.
+    """
+    if playlist_ids is None:
+        track_ids_by_playlist = defaultdict(set)
+        items = PlaylistItem.objects.filter(playlist__user_links__user=django_user)
+    else:
+        track_ids_by_playlist = {playlist_id: set() for playlist_id in playlist_ids}
+        items = PlaylistItem.objects.filter(playlist_id__in=playlist_ids)
+
+    for playlist_id, track_id in items.values_list('playlist_id', 'track_id'):
+        track_ids_by_playlist[playlist_id].add(track_id)
+    return dict(track_ids_by_playlist)
+
+
+def overlap_matrix(playlist_ids, track_ids_by_playlist):
+    """
+    재생 목록 목록의 겹침 행렬 (matrix[i][j] = i, j 번째 재생 목록의 공통 트랙 수, 대각선은 트랙 수).
+    화면 한 페이지처럼 작은 범위에 사용합니다.
+    """
+    index = {playlist_id: i for i, playlist_id in enumerate(playlist_ids)}
+    matrix = [[0] * len(playlist_ids) for _ in playlist_ids]
+    for playlist_id, i in index.items():
+        matrix[i][i] = len(track_ids_by_playlist.get(playlist_id, ()))
+    for a, b, shared_count, _ in overlap_pairs(track_ids_by_playlist):
+        matrix[index[a]][index[b]] = matrix[index[b]][index[a]] = shared_count
+    return matrix
+
+
+# ----------------------------------------------------
+# 화면 (DB 조회만)
+# ----------------------------------------------------
+
+def get_library(django_user):
+    """마지막 수집 상태 (아직 수집하지 않았으면 None)."""
+    return PlaylistLibrary.objects.filter(user=django_user).first()
+
+
+def is_stale(library):
+    """아직 수집하지 않았거나 PLAYLISTS_MAX_AGE_SECONDS가 지난 라이브러리인지 여부."""
+    max_age_seconds = getattr(settings, 'PLAYLISTS_MAX_AGE_SECONDS', 6 * 60 * 60)
+    return library is None or library.synced_at < timezone.now() - timedelta(seconds=max_age_seconds)
+
+
+def library_page(django_user, library, page_number):
+    """
+    재생 목록 한 페이지 (PLAYLISTS_PAGE_SIZE개)와 페이지 재생 목록별 겹침 상위 목록.
+    라이브러리 순서(position)는 0부터 빈틈없이 저장되므로, COUNT / OFFSET 없이 (user, position) 인덱스 구간으로 읽습니다.
+    반환값: (page, [{'playlist': Playlist, 'overlaps': [PlaylistOverlap, ...]}, ...])
+    """
+    paginator = Paginator(range(library.playlist_count if library else 0), getattr(settings, 'PLAYLISTS_PAGE_SIZE', 50))
+    page = paginator.get_page(page_number)
+    if not paginator.count:
+        return page, []
+
+    links = list(
+        UserPlaylist.objects.filter(user=django_user, position__gte=page.start_index() - 1, position__lt=page.end_index())
+        .select_related('playlist')
+        .order_by('position')
+    )
+
+    overlaps = defaultdict(list)
+    for overlap in (
+        PlaylistOverlap.objects.filter(user=django_user, playlist_id__in=[link.playlist_id for link in links])
+        .select_related('other')
+        .order_by('playlist_id', '-shared_count', '-jaccard')
+    ):
+        overlaps[overlap.playlist_id].append(overlap)
+
+    return page, [{'playlist': link.playlist, 'overlaps': overlaps[link.playlist_id]} for link in links]
@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import spotify
+from .models import SpotifyProfile, SpotifyToken
+
+# main/profiles.py
+# 페이지 헤더용 Spotify 프로필(sp.me())을 DB에 저장해 두고 읽는 로직.
+# 페이지를 열 때마다 sp.me()를 호출하지 않고 저장된 프로필을 사용하며,
+# TTL이 지난 프로필은 화면은 그대로 보여 주고 백그라운드 작업(IngestJob.KIND_PROFILE)으로 다시 가져옵니다.
+
+
+def save_profile(django_user, user_data):
+    """sp.me() 응답에서 헤더에 필요한 값만 저장(Upsert)합니다."""
+    profile, _ = SpotifyProfile.objects.update_or_create(
+        user=django_user,
+        defaults={
+            'spotify_id': user_data['id'],
+            'display_name': user_data.get('display_name') or '',
+            'country': user_data.get('country') or '',
+            'product': user_data.get('product') or '',
+            'image_urls': [image['url'] for image in user_data.get('images') or []],
+            'fetched_at': timezone.now(),
+        },
+    )
+    return profile
+
+
+def refresh_profile(django_user):
+    """Spotify API로 프로필을 다시 가져와 저장합니다. (Worker 또는 저장된 프로필이 없을 때 사용)"""
+    token_obj = SpotifyToken.objects.get(user=django_user)
+    sp = spotify.get_user_spotify_client(token_obj.spotify_id, token_obj)
+    return save_profile(django_user, sp.me())
+
+
+def get_profile(django_user):
+    """
+    저장된 프로필을 반환합니다. 프로필 기능 도입 이전에 로그인한 사용자처럼
+    저장된 프로필이 없으면 이번 한 번만 Spotify API로 가져옵니다.
+    """
+    profile = SpotifyProfile.objects.filter(user=django_user).first()
+    if profile is None:
+        profile = refresh_profile(django_user)
+    return profile
+
+
+def is_stale(profile):
+    """저장한 지 SPOTIFY_PROFILE_TTL_SECONDS가 지난 프로필인지 여부."""
+    ttl_seconds = getattr(settings, 'SPOTIFY_PROFILE_TTL_SECONDS', 24 * 60 * 60)
+    return profile.fetched_at < timezone.now() - timedelta(seconds=ttl_seconds)
+
+
+def as_context(profile):
+    """템플릿의 user_profile 형태 (sp.me() 응답과 같은 키: display_name, images.0.url ...)."""
+    return {
+        'id': profile.spotify_id,
+        'display_name': profile.display_name,
+        'country': profile.country,
+        'product': profile.product,
+        'images': [{'url': url} for url in profile.image_urls],
+    }
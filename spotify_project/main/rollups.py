@@ -0,0 +1,193 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, FloatField
+
+from .models import ArtistGenre, ArtistRollup, GenreRollup, SyncState, TrackRanking
+
+# main/rollups.py
+# 전체 사용자 대상 통계(장르 / 아티스트별 트랙 수, 장르별 평균 인기도)를 증분 갱신하는 로직.
+# 사용자마다 "전체 통계에 더한 값(기여분)"을 SyncState.rollup_contribution에 보관하고,
+# 동기화할 때마다 이전 기여분과 새 기여분의 차이만 GenreRollup / ArtistRollup에 반영합니다.
+# 인기도 합은 각 사용자가 동기화한 시점의 인기도(TrackRanking.popularity) 기준입니다.
+#
+# 기여분 형태 (JSON):
+#   {time_range: {'genres': {genre_id: [트랙 수, 인기도 합, 인기도 있는 트랙 수]},
+#                 'artists': {artist_id: [트랙 수]}}}
+
+BATCH_SIZE = 500
+
+# (기여분 키, 모델, 키 필드, 갱신 필드) - 갱신 필드의 user_count는 기여분에 값이 있으면 1로 계산
+ROLLUPS = (
+    ('genres', GenreRollup, 'genre', ('track_count', 'user_count', 'popularity_sum', 'popularity_count')),
+    ('artists', ArtistRollup, 'artist', ('track_count', 'user_count')),
+)
+
+
+def build_contribution(rankings, time_ranges):
+    """
+    저장한 순위(TrackRanking, .track에 카탈로그 정보) 목록으로 사용자의 기여분을 계산합니다.
+    (아티스트 장르는 쿼리 한 번으로 조회)
+    트랙이 없는 기간도 빈 값으로 포함해야 이전 기여분이 빠집니다.
+    """
+    genre_ids_by_artist = defaultdict(list)
+    artist_genres = ArtistGenre.objects.filter(
+        artist_id__in={ranking.track.artist_id for ranking in rankings}
+    ).values_list('artist_id', 'genre_id')
+    for artist_id, genre_id in artist_genres:
+        genre_ids_by_artist[artist_id].append(genre_id)
+
+    contribution = {time_range: {'genres': {}, 'artists': {}} for time_range in time_ranges}
+    for ranking in rankings:
+        entry = contribution[ranking.time_range]
+        track = ranking.track
+
+        entry['artists'].setdefault(track.artist_id, [0])[0] += 1
+
+        for genre_id in genre_ids_by_artist[track.artist_id]:
+            values = entry['genres'].setdefault(str(genre_id), [0, 0, 0])
+            values[0] += 1
+            if ranking.popularity is not None:
+                values[1] += ranking.popularity
+                values[2] += 1
+
+    return contribution
+
+
+def _expand(values, field_count):
+    """기여분 값 [트랙 수, ...] → 갱신 필드 순서 [track_count, user_count, ...]."""
+    if not values:
+        return [0] * field_count
+    return [values[0], 1, *values[1:]]
+
+
+def _apply_deltas(model, key_field, fields, deltas):
+    """(time_range, key) → 필드별 변화량을 대상 행에 반영합니다. 트랙 수가 0이 된 행은 삭제합니다."""
+    if not deltas:
+        return 0
+
+    # 갱신할 행을 잠근 뒤(select_for_update) 현재 값 + 변화량으로 한 번에 Upsert
+    locked_rows = model.objects.select_for_update().filter(
+        time_range__in={time_range for time_range, _ in deltas},
+        **{f'{key_field}_id__in': {key for _, key in deltas}},
+    )
+    existing = {(row.time_range, str(getattr(row, f'{key_field}_id'))): row for row in locked_rows}
+
+    rows_to_upsert = []
+    pks_to_delete = []
+    for (time_range, key), delta in deltas.items():
+        row = existing.get((time_range, key))
+        current = [getattr(row, field) for field in fields] if row else [0] * len(fields)
+        values = [max(0, value + change) for value, change in zip(current, delta)]
+
+        if values[0] == 0:
+            if row:
+                pks_to_delete.append(row.pk)
+            continue
+
+        rows_to_upsert.append(model(time_range=time_range, **{f'{key_field}_id': key}, **dict(zip(fields, values))))
+
+    if pks_to_delete:
+        model.objects.filter(pk__in=pks_to_delete).delete()
+    model.objects.bulk_create(
+        rows_to_upsert,
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['time_range', key_field],
+        update_fields=list(fields),
+    )
+    return len(rows_to_upsert) + len(pks_to_delete)
+
+
+def apply_contribution(old_contribution, new_contribution):
+    """
+    new_contribution에 포함된 기간에 대해 (새 기여분 - 이전 기여분)을 전체 통계에 반영합니다.
+    반환값: 갱신 / 삭제한 통계 행 수
+    """
+    rows_written = 0
+    for kind, model, key_field, fields in ROLLUPS:
+        deltas = {}
+        for time_range, entry in new_contribution.items():
+            old_entries = old_contribution.get(time_range, {}).get(kind, {})
+            new_entries = entry[kind]
+
+            for key in old_entries.keys() | new_entries.keys():
+                old_values = _expand(old_entries.get(key), len(fields))
+                new_values = _expand(new_entries.get(key), len(fields))
+                delta = [new - old for old, new in zip(old_values, new_values)]
+                if any(delta):
+                    deltas[(time_range, key)] = delta
+
+        rows_written += _apply_deltas(model, key_field, fields, deltas)
+    return rows_written
+
+
+def rebuild_all():
+    """
+    모든 사용자의 저장된 트랙으로 전체 통계와 기여분을 처음부터 다시 만듭니다.
+    (기능 도입 이전 데이터 반영, 사용자 삭제 등으로 통계가 어긋났을 때 사용)
+    """
+    with transaction.atomic():
+        GenreRollup.objects.all().delete()
+        ArtistRollup.objects.all().delete()
+
+        user_ids = TrackRanking.objects.order_by().values_list('user_id', flat=True).distinct()
+        for user_id in user_ids:
+            rankings = list(
+                TrackRanking.objects.filter(user_id=user_id)
+                .select_related('track')
+                .only('time_range', 'popularity', 'track__artist_id')
+            )
+            contribution = build_contribution(rankings, TrackRanking.TIME_RANGES)
+            apply_contribution({}, contribution)
+            SyncState.objects.update_or_create(user_id=user_id, defaults={'rollup_contribution': contribution})
+
+        SyncState.objects.exclude(user_id__in=user_ids).update(rollup_contribution={})
+
+
+def global_insights(time_range='long_term', limit=10, min_tracks=5):
+    """
+    전체 사용자 통계 (Rollup 테이블만 조회).
+      top_genres:       트랙 수가 많은 장르
+      top_artists:      트랙 수가 많은 아티스트
+      genre_popularity: 트랙이 min_tracks개 이상인 장르 중 평균 인기도가 높은 장르
+    """
+    top_genres = (
+        GenreRollup.objects.filter(time_range=time_range)
+        .select_related('genre')
+        .order_by('-track_count', 'genre__name')[:limit]
+    )
+    top_artists = (
+        ArtistRollup.objects.filter(time_range=time_range)
+        .select_related('artist')
+        .order_by('-track_count', 'artist__name')[:limit]
+    )
+    genre_popularity = (
+        GenreRollup.objects.filter(time_range=time_range, track_count__gte=min_tracks, popularity_count__gt=0)
+        .select_related('genre')
+        .annotate(average=ExpressionWrapper(F('popularity_sum') * 1.0 / F('popularity_count'), output_field=FloatField()))
+        .order_by('-average', 'genre__name')[:limit]
+    )
+
+    def genre_entry(rollup):
+        average = rollup.average_popularity
+        return {
+            'genre': rollup.genre.name,
+            'track_count': rollup.track_count,
+            'user_count': rollup.user_count,
+            'average_popularity': round(average, 1) if average is not None else None,
+        }
+
+    return {
+        'time_range': time_range,
+        'top_genres': [genre_entry(rollup) for rollup in top_genres],
+        'top_artists': [
+            {
+                'artist_name': rollup.artist.name,
+                'track_count': rollup.track_count,
+                'user_count': rollup.user_count,
+            }
+            for rollup in top_artists
+        ],
+        'genre_popularity': [genre_entry(rollup) for rollup in genre_popularity],
+    }
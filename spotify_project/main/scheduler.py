@@ -0,0 +1,176 @@
+import logging
+import threading
+import time
+from collections import Counter
+
+import requests
+from django.conf import settings
+from spotipy.exceptions import SpotifyException
+
+# main/scheduler.py
+# 프로세스 전체에서 공유하는 Spotify API 요청 스케줄러.
+# 모든 사용자의 요청이 같은 Token Bucket / 동시 요청 제한을 거치므로,
+# 여러 동기화가 겹쳐도 요청이 버려지지 않고 대기열에서 순서를 기다립니다.
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """초당 rate개씩 채워지고 최대 capacity개까지 쌓이는 Token Bucket."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Token 하나를 얻을 때까지 대기합니다."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait_seconds = (1 - self.tokens) / self.rate
+
+            time.sleep(wait_seconds)
+
+
+class SpotifyRequestScheduler:
+    """
+    Spotify API 호출을 감싸는 스케줄러.
+    - Token Bucket으로 초당 요청 수를 제한
+    - 동시에 진행 중인 요청 수(in-flight)를 제한 (초과 요청은 대기)
+    - 429 응답은 Retry-After 만큼 모든 요청을 멈춘 뒤 재시도, 5xx / 네트워크 오류는 지수 백오프로 재시도
+    - 호출 / 재시도 / 429 / 최종 실패(drop) 횟수를 기록
+    """
+
+    def __init__(self, rate_per_second, burst, max_in_flight, max_retries, backoff_seconds, max_backoff_seconds=30):
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+
+        # 429 응답을 받으면 이 시각(monotonic)까지 모든 요청을 멈춥니다.
+        self.paused_until = 0.0
+
+    def _count(self, key, amount=1):
+        with self.stats_lock:
+            self.stats[key] += amount
+
+    def snapshot(self):
+        """현재까지의 호출 통계 (calls / retries / rate_limited / dropped)."""
+        with self.stats_lock:
+            return dict(self.stats)
+
+    def _wait_if_paused(self):
+        pause_seconds = self.paused_until - time.monotonic()
+        if pause_seconds > 0:
+            time.sleep(pause_seconds)
+
+    def _retry_delay(self, error, attempt):
+        """재시도 전 대기 시간(초). 재시도할 수 없는 오류면 None."""
+        backoff = min(self.max_backoff_seconds, self.backoff_seconds * (2 ** attempt))
+
+        if isinstance(error, SpotifyException):
+            if error.http_status not in RETRYABLE_STATUS_CODES:
+                return None
+
+            if error.http_status == 429:
+                self._count('rate_limited')
+                retry_after = (error.headers or {}).get('Retry-After')
+                try:
+                    delay = max(float(retry_after), backoff)
+                except (TypeError, ValueError):
+                    delay = backoff
+
+                # Spotify 요청 한도는 앱 단위이므로 다른 스레드의 요청도 함께 멈춥니다.
+                self.paused_until = max(self.paused_until, time.monotonic() + delay)
+                return delay
+
+            return backoff
+
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return backoff
+
+        return None
+
+    def call(self, func, *args, **kwargs):
+        """func(*args, **kwargs)를 요청 한도 안에서 실행하고, 재시도 가능한 오류는 다시 시도합니다."""
+        attempt = 0
+        while True:
+            with self.in_flight:
+                self._wait_if_paused()
+                self.bucket.acquire()
+                self._count('calls')
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    error = e
+
+            delay = self._retry_delay(error, attempt)
+            if delay is None or attempt >= self.max_retries:
+                self._count('dropped')
+                logger.warning("Spotify request %s dropped after %d retries: %s",
+                               getattr(func, '__name__', func), attempt, error)
+                raise error
+
+            attempt += 1
+            self._count('retries')
+            logger.info("Spotify request %s retry %d in %.1fs: %s",
+                        getattr(func, '__name__', func), attempt, delay, error)
+            time.sleep(delay)
+
+
+class ScheduledSpotify:
+    """
+    spotipy.Spotify 객체를 감싸서 모든 public 메서드 호출이 스케줄러를 거치도록 합니다.
+    (sp.artists(...), sp.current_user_top_tracks(...) 등 기존 코드는 그대로 사용)
+    """
+
+    def __init__(self, client, scheduler):
+        self._client = client
+        self._scheduler = scheduler
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if name.startswith('_') or not callable(attribute):
+            return attribute
+
+        def scheduled_call(*args, **kwargs):
+            return self._scheduler.call(attribute, *args, **kwargs)
+
+        scheduled_call.__name__ = name
+        return scheduled_call
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """프로세스 전체에서 공유하는 스케줄러 (settings 값으로 최초 1회 생성)."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = SpotifyRequestScheduler(
+                    rate_per_second=getattr(settings, 'SPOTIFY_RATE_LIMIT_PER_SECOND', 10),
+                    burst=getattr(settings, 'SPOTIFY_RATE_LIMIT_BURST', 20),
+                    max_in_flight=getattr(settings, 'SPOTIFY_MAX_IN_FLIGHT', 8),
+                    max_retries=getattr(settings, 'SPOTIFY_MAX_RETRIES', 5),
+                    backoff_seconds=getattr(settings, 'SPOTIFY_RETRY_BACKOFF_SECONDS', 0.5),
+                )
+    return _scheduler
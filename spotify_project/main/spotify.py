@@ -1,275 +1,944 @@
 from django.db import transaction
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.utils import timezone
+from datetime import timedelta
+import logging
+import threading
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
 import spotipy
-from django.db.models import Count, Q
+from spotipy.oauth2 import SpotifyOAuth
+from django.db.models import Count, F, Q
 
-from .models import Artist, Track # Artist, Track 모델 임포트
+from . import histograms
+from . import history
+from . import http_session
+from . import rollups
+from .instrumentation import IngestRecorder
+from .models import Artist, ArtistGenre, Genre, PopularityPrefixHistogram, SpotifyToken, SyncRun, SyncState, Track, TrackRanking # Artist, Track 모델 임포트
+from .scheduler import ScheduledSpotify, get_scheduler
 
 # main/spotify.py
 
-from django.db import transaction
-from django.contrib.auth.models import User 
-import spotipy
-# ... (다른 임포트)
+logger = logging.getLogger(__name__)
 
-@transaction.atomic
-def save_top_tracks_data(sp: spotipy.Spotify, django_user: User):
-    
-    # 1. 기존 데이터 삭제
-    Track.objects.filter(user=django_user).delete()
-    
-    # ⭐⭐ 2. 페이지네이션 로직 (all_tracks 정의 및 채우기) ⭐⭐
-    all_tracks = [] # ⭐ all_tracks 리스트 초기화 ⭐
-    limit = 50           
-    offset = 0           
-    max_collect = 500    # 현재 설정된 최대 수집량 (최대 500개)
-    
-    while offset < max_collect:
-        print(offset)
-        results = sp.current_user_top_tracks(
-            limit=limit, 
-            offset=offset, 
-            time_range='long_term'
-        )
+TOP_TRACKS_PAGE_LIMIT = 50   # current_user_top_tracks 한 페이지 크기 (API 최대 50)
+TOP_TRACKS_MAX_COLLECT = 500 # 현재 설정된 최대 수집량 (최대 500개)
+CHUNK_SIZE = 50              # sp.artists / sp.albums 안전한 Batch 크기 (최대 50)
+DB_BATCH_SIZE = 500          # bulk_create 한 번에 보내는 최대 행 수
+TRACK_CATALOG_FIELDS = ('name', 'popularity', 'duration_ms', 'release_year', 'genre', 'artist_id', 'album_image_url') # 카탈로그 갱신 시 비교하는 필드
+
+
+# ----------------------------------------------------
+# Spotify 인증 / 클라이언트 헬퍼 (views.py와 백그라운드 Worker가 함께 사용)
+# ----------------------------------------------------
+
+# 헬퍼 함수: SpotifyOAuth 객체 생성
+def get_spotify_oauth():
+    return SpotifyOAuth(
+        client_id=settings.SPOTIFY_CLIENT_ID,
+        client_secret=settings.SPOTIFY_CLIENT_SECRET,
+        redirect_uri=settings.SPOTIFY_REDIRECT_URI,
+        scope=settings.SPOTIFY_SCOPE,
+        cache_path=None, # Django 서버에서는 파일 캐시 대신 DB를 사용
+        requests_session=http_session.get_http_session(),
+        requests_timeout=http_session.get_timeout(),
+    )
+
+# 헬퍼 함수: 프로세스 공용 요청 스케줄러를 거치는 Spotify 클라이언트 생성
+def make_spotify_client(access_token):
+    # 프로세스 공용 연결 풀(Session)을 넘겨 요청마다 연결을 새로 맺지 않습니다. (사용자별로는 토큰만 다름)
+    # spotipy 내장 재시도(urllib3 Retry)는 쓰지 않고, 429 / 5xx 재시도와 요청 수 제한은 scheduler.py의 스케줄러가 담당합니다.
+    client = spotipy.Spotify(
+        auth=access_token,
+        requests_session=http_session.get_http_session(),
+        requests_timeout=http_session.get_timeout(),
+    )
+    return ScheduledSpotify(client, get_scheduler())
+
+# 헬퍼 함수: Access Token을 갱신하고 DB를 업데이트
+def refresh_spotify_token(token_obj):
+    # 1. SpotifyOAuth 객체 생성
+    auth_manager = get_spotify_oauth()
+
+    try:
+        # 2. Refresh Token을 사용하여 새 Access Token 요청
+        # spotipy 라이브러리가 API 호출을 통해 토큰을 갱신합니다.
+        new_token_info = auth_manager.refresh_access_token(token_obj.refresh_token)
         
-        items = results.get('items', [])
+        # 3. 모델 필드 업데이트 및 저장
+        token_obj.access_token = new_token_info['access_token']
         
-        if not items:
-            break
-            
-        all_tracks.extend(items) # all_tracks 리스트에 데이터 추가
+        # 새 만료 시각 계산: 현재 시각 + 새로 받은 유효 시간(초)
+        expires_in = new_token_info.get('expires_in', 3600)
+        token_obj.expires_at = timezone.now() + timedelta(seconds=expires_in)
+        token_obj.expires_in = expires_in # expires_in 필드도 업데이트 (선택 사항)
+        token_obj.save()
         
-        offset += limit
+        return token_obj
         
-        if results.get('total') and offset >= results['total']:
-            break
-            
-    # ----------------------------------------------------
-    # 3. ID 추출 (트랙, 아티스트, 앨범)
-    # ----------------------------------------------------
-    track_artist_map = {} 
-    artist_ids = []
-    album_ids = [] 
-    
-    for track_data in all_tracks:
-        if not track_data or not track_data.get('artists'): continue
-        main_artist_id = track_data['artists'][0]['id']
-        artist_ids.append(main_artist_id)
-        
-        album_ids.append(track_data['album']['id'])
-        track_artist_map[track_data['id']] = main_artist_id 
+    except Exception as e:
+        logger.warning("Token refresh failed for user %s: %s", token_obj.user_id, e)
+        # 갱신 실패 (Refresh Token 만료, 권한 해지 등) 시 예외 발생
+        # 사용자에게 재로그인을 유도해야 함.
+        raise Exception("Spotify 인증 만료 또는 오류. 재로그인이 필요합니다.")
 
-    # ----------------------------------------------------
-    # 4. 아티스트 상세 정보 Bulk 획득 및 DB 저장 (Batching 유지)
-    # ----------------------------------------------------
-    unique_artist_ids = list(set(artist_ids))
-    CHUNK_SIZE = 50 # 안전한 Batch 크기 유지 최대 50
-    all_artist_details = []
-    
-    for i in range(0, len(unique_artist_ids), CHUNK_SIZE):
-        chunk_ids = unique_artist_ids[i:i + CHUNK_SIZE] 
-        
+# ----------------------------------------------------
+# 프로세스 내 Access Token 캐시 (spotify_id → (access_token, expires_at))
+# 만료 SPOTIFY_TOKEN_REFRESH_WINDOW_SECONDS초 전부터 미리 갱신하며,
+# 같은 사용자의 갱신은 프로세스 안에서는 사용자별 Lock, 프로세스 사이에서는 DB 행 잠금으로 한 번만 수행합니다.
+# (SQLite는 select_for_update를 지원하지 않으므로 프로세스 사이의 중복 갱신은 막지 못합니다.)
+# ----------------------------------------------------
+_token_cache = {}
+_token_locks = {}
+_token_locks_guard = threading.Lock()
+
+
+def _token_lock(spotify_id):
+    with _token_locks_guard:
+        return _token_locks.setdefault(spotify_id, threading.Lock())
+
+
+def _token_needs_refresh(expires_at):
+    window_seconds = getattr(settings, 'SPOTIFY_TOKEN_REFRESH_WINDOW_SECONDS', 300)
+    return expires_at is None or expires_at <= timezone.now() + timedelta(seconds=window_seconds)
+
+
+def cache_token(token_obj):
+    """로그인 / 갱신으로 받은 토큰을 캐시에 기록합니다."""
+    _token_cache[token_obj.spotify_id] = (token_obj.access_token, token_obj.expires_at)
+
+
+def clear_token_cache():
+    _token_cache.clear()
+
+
+def _refresh_token_single_flight(spotify_id):
+    """
+    토큰 행을 잠근 뒤 다시 확인하여, 아직 아무도 갱신하지 않았을 때만 갱신합니다.
+    미리 갱신(만료 전)이 실패하면 기존 토큰을 계속 사용합니다.
+    """
+    with transaction.atomic():
         try:
-            # API 호출 및 결과 획득
-            artists_detail_data = sp.artists(chunk_ids) 
-            
-            if artists_detail_data and artists_detail_data.get('artists'):
-                all_artist_details.extend([a for a in artists_detail_data['artists'] if a is not None])
+            token_obj = SpotifyToken.objects.select_for_update().get(spotify_id=spotify_id)
+        except SpotifyToken.DoesNotExist:
+            raise Exception(f"User {spotify_id} does not have a Spotify token.")
 
-        except Exception as e:
-            # API 호출 중 오류 발생 시 (네트워크 등) 해당 Batch만 건너뛰고 계속 진행
-            print(f"API Batch 호출 중 오류 발생 ({len(chunk_ids)}개 ID): {e}")
-            continue # 오류가 나더라도 다음 Batch로 넘어가서 롤백 방지
+        # 잠금을 기다리는 동안 다른 프로세스가 이미 갱신한 경우
+        if not _token_needs_refresh(token_obj.expires_at):
+            return token_obj
 
-    artist_details_dict = {artist['id']: artist for artist in all_artist_details}
-    
-    for artist_id in unique_artist_ids:
-        detail = artist_details_dict.get(artist_id)
-        if detail:
-            Artist.objects.update_or_create(
-                spotify_id=artist_id,
-                defaults={
-                    'name': detail['name'],
-                    'popularity': detail['popularity'],
-                    'followers_total': detail['followers']['total'],
-                    'genres': ", ".join(detail['genres']),
-                }
-            )
+        try:
+            return refresh_spotify_token(token_obj)
+        except Exception:
+            if token_obj.expires_at and token_obj.expires_at > timezone.now():
+                logger.warning("Proactive token refresh failed for %s; using current token", spotify_id)
+                return token_obj
+            raise
 
-    # ----------------------------------------------------
-    # 5. Album 상세 정보 Bulk 획득 (Batching 유지)
-    # ----------------------------------------------------
-    unique_album_ids = list(set(album_ids))
-    all_album_details = []
-    
-    for i in range(0, len(unique_album_ids), CHUNK_SIZE):
-        chunk_ids = unique_album_ids[i:i + CHUNK_SIZE]
-        
+
+def get_access_token(spotify_id, token_obj=None):
+    """
+    유효한 Access Token을 반환합니다. 캐시에 유효한 토큰이 있으면 DB를 읽지 않습니다.
+    호출한 쪽이 이미 읽은 token_obj를 넘기면 DB를 다시 읽지 않고 사용합니다.
+    """
+    cached = _token_cache.get(spotify_id)
+    if cached and not _token_needs_refresh(cached[1]):
+        return cached[0]
+
+    with _token_lock(spotify_id):
+        # 같은 프로세스의 다른 요청이 Lock을 기다리는 동안 갱신했을 수 있으므로 다시 확인
+        cached = _token_cache.get(spotify_id)
+        if cached and not _token_needs_refresh(cached[1]):
+            return cached[0]
+
+        if token_obj is None or _token_needs_refresh(token_obj.expires_at):
+            token_obj = _refresh_token_single_flight(spotify_id)
+
+        cache_token(token_obj)
+        return token_obj.access_token
+
+
+# Access Token 상태를 확인하고 유효한 Spotify 클라이언트를 반환하는 메인 함수
+def get_user_spotify_client(spotify_id, token_obj=None):
+    # 캐시된(또는 필요하면 미리 갱신한) 토큰으로 Spotify 클라이언트 객체 반환
+    return make_spotify_client(get_access_token(spotify_id, token_obj))
+
+
+def _fetch_concurrently(fetch_func, args_list, on_progress=None):
+    """
+    args_list의 각 인자로 fetch_func를 호출하고, 결과를 입력 순서 그대로 반환합니다.
+    동시 요청 수는 settings.SPOTIFY_FETCH_CONCURRENCY 로 제한되며, 1이면 순차 호출합니다.
+    on_progress(done, total)는 호출한 스레드에서 결과를 하나 받을 때마다 호출됩니다.
+    """
+    max_workers = min(getattr(settings, 'SPOTIFY_FETCH_CONCURRENCY', 8), len(args_list))
+    total = len(args_list)
+
+    def collect(results):
+        collected = []
+        for result in results:
+            collected.append(result)
+            if on_progress:
+                on_progress(len(collected), total)
+        return collected
+
+    if max_workers <= 1:
+        return collect(fetch_func(args) for args in args_list)
+
+    # executor.map은 완료 순서와 무관하게 입력 순서대로 결과를 돌려줍니다. (순위 보존)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return collect(executor.map(fetch_func, args_list))
+
+
+def fetch_top_tracks(sp: spotipy.Spotify, time_ranges=('long_term',), on_progress=None):
+    """
+    기간(time_range)별 Top Track을 수집하여 {time_range: [track, ...]} 형태(순위 순서)로 반환합니다.
+    먼저 기간별 첫 페이지만 병렬로 요청해 total을 확인한 뒤, 실제로 필요한 나머지 페이지(50개 단위,
+    최대 TOP_TRACKS_MAX_COLLECT개)만 한 번에 병렬로 요청합니다. (기록이 짧은 사용자는 빈 페이지를 요청하지 않음)
+    빈 페이지를 만나거나 total을 넘어서면 그 뒤의 페이지는 버립니다.
+    """
+    def fetch_page(page):
+        time_range, offset = page
+        return sp.current_user_top_tracks(
+            limit=TOP_TRACKS_PAGE_LIMIT,
+            offset=offset,
+            time_range=time_range
+        )
+
+    def report(done_before, page_count):
+        if on_progress is None:
+            return None
+        return lambda done, total: on_progress(done_before + done, page_count)
+
+    # 1. 기간별 첫 페이지 (total 확인)
+    first_pages = [(time_range, 0) for time_range in time_ranges]
+    first_results = _fetch_concurrently(fetch_page, first_pages, report(0, len(first_pages)))
+
+    # 2. total까지 남은 페이지만 병렬 요청
+    rest_pages = [
+        (time_range, offset)
+        for time_range, results in zip(time_ranges, first_results)
+        for offset in range(
+            TOP_TRACKS_PAGE_LIMIT,
+            min((results or {}).get('total') or 0, TOP_TRACKS_MAX_COLLECT),
+            TOP_TRACKS_PAGE_LIMIT,
+        )
+    ]
+    rest_results = _fetch_concurrently(
+        fetch_page, rest_pages, report(len(first_pages), len(first_pages) + len(rest_pages)))
+
+    tracks_by_range = {time_range: [] for time_range in time_ranges}
+    finished_ranges = set()
+    # 기간마다 offset 순서대로 이어 붙입니다. (첫 페이지가 나머지 페이지보다 먼저 옴)
+    for (time_range, offset), results in zip(first_pages + rest_pages, first_results + rest_results):
+        if time_range in finished_ranges:
+            continue
+
+        items = (results or {}).get('items', [])
+
+        if not items:
+            finished_ranges.add(time_range)
+            continue
+
+        tracks_by_range[time_range].extend(items)
+
+        total = results.get('total')
+        if total and offset + TOP_TRACKS_PAGE_LIMIT >= total:
+            finished_ranges.add(time_range)
+
+    return tracks_by_range
+
+
+def _fetch_details_in_chunks(fetch_func, ids, result_key, label, on_progress=None):
+    """
+    ID 목록을 CHUNK_SIZE 단위로 나누어 병렬로 상세 정보를 요청합니다.
+    오류가 난 Batch는 건너뛰고 나머지 결과만 모아서 반환합니다.
+    """
+    chunks = [ids[i:i + CHUNK_SIZE] for i in range(0, len(ids), CHUNK_SIZE)]
+
+    def fetch_chunk(chunk_ids):
         try:
-            # API 호출
-            albums_detail_data = sp.albums(chunk_ids)
-            
-            if albums_detail_data and albums_detail_data.get('albums'):
-                all_album_details.extend([a for a in albums_detail_data['albums'] if a is not None])
-        
+            return fetch_func(chunk_ids)
         except Exception as e:
-            # 앨범 정보 획득 실패 시 해당 청크는 건너뛰고 나머지 데이터는 저장되도록 합니다.
-            print(f"앨범 Batch 호출 중 오류 발생 ({len(chunk_ids)}개 ID): {e}")
+            # API 호출 중 오류 발생 시 (재시도 후에도 실패) 해당 Batch만 건너뛰고 계속 진행
+            logger.warning("%s Batch 호출 중 오류 발생 (%d개 ID): %s", label, len(chunk_ids), e)
+            return None
+
+    details = []
+    for data in _fetch_concurrently(fetch_chunk, chunks, on_progress):
+        if data and data.get(result_key):
+            details.extend([item for item in data[result_key] if item is not None])
+
+    return details
+
+
+def load_fresh_artist_details(artist_ids):
+    """
+    TTL(settings.SPOTIFY_ARTIST_TTL_SECONDS) 안에 받아온 아티스트를 DB에서 읽어
+    sp.artists() 응답과 같은 형태의 Dictionary로 반환합니다. (다른 사용자가 받아둔 정보도 공유)
+    """
+    ttl_seconds = getattr(settings, 'SPOTIFY_ARTIST_TTL_SECONDS', 7 * 24 * 60 * 60)
+    fresh_after = timezone.now() - timedelta(seconds=ttl_seconds)
+
+    fresh_artists = Artist.objects.filter(
+        spotify_id__in=artist_ids,
+        fetched_at__gte=fresh_after,
+    ).values_list('spotify_id', 'name', 'popularity', 'followers_total')
+
+    details = {
+        spotify_id: {
+            'id': spotify_id,
+            'name': name,
+            'popularity': popularity,
+            'followers': {'total': followers_total},
+            'genres': [],
+        }
+        for spotify_id, name, popularity, followers_total in fresh_artists
+    }
+
+    # 장르는 ArtistGenre에서 position 순서대로 한 번에 읽어 붙입니다.
+    artist_genres = (
+        ArtistGenre.objects
+        .filter(artist_id__in=details)
+        .order_by('artist_id', 'position')
+        .values_list('artist_id', 'genre__name')
+    )
+    for artist_id, genre_name in artist_genres:
+        details[artist_id]['genres'].append(genre_name)
+
+    return details
+
+
+def upsert_artists(artist_details):
+    """
+    Spotify 아티스트 상세 정보 목록을 Artist 테이블에 Bulk Upsert 합니다.
+    spotify_id 충돌 시 name / popularity / followers_total / fetched_at 을 갱신하며,
+    DB_BATCH_SIZE 개마다 INSERT ... ON CONFLICT DO UPDATE 한 번으로 처리합니다.
+    장르 연결(ArtistGenre)은 upsert_artist_genres()로 함께 갱신합니다.
+    """
+    fetched_at = timezone.now()
+    artists = [
+        Artist(
+            spotify_id=detail['id'],
+            name=detail['name'],
+            popularity=detail['popularity'],
+            followers_total=detail['followers']['total'],
+            fetched_at=fetched_at,
+        )
+        for detail in artist_details
+    ]
+
+    Artist.objects.bulk_create(
+        artists,
+        batch_size=DB_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['spotify_id'],
+        update_fields=['name', 'popularity', 'followers_total', 'fetched_at'],
+    )
+    upsert_artist_genres(artist_details)
+    return len(artists)
+
+
+def _artist_genre_names(artist_detail):
+    """아티스트 상세 정보의 장르 목록에서 빈 값과 중복을 뺀 목록 (순서 유지, ArtistGenre에 저장되는 형태)."""
+    return list(dict.fromkeys(genre for genre in artist_detail['genres'] if genre))
+
+
+def upsert_artist_genres(artist_details):
+    """
+    아티스트들의 장르 연결을 Spotify 응답 기준으로 다시 만듭니다.
+    1. 처음 보는 장르 이름을 Genre에 Bulk INSERT (이미 있으면 무시)
+    2. 이름 → id 매핑을 한 번에 조회
+    3. 해당 아티스트들의 기존 연결을 지우고 새 연결을 Bulk INSERT
+    """
+    artist_genres = {detail['id']: _artist_genre_names(detail) for detail in artist_details}
+    if not artist_genres:
+        return 0
+
+    names = {name for genres in artist_genres.values() for name in genres}
+    Genre.objects.bulk_create(
+        [Genre(name=name) for name in names],
+        batch_size=DB_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    genre_ids = dict(Genre.objects.filter(name__in=names).values_list('name', 'id'))
+
+    links = [
+        ArtistGenre(artist_id=artist_id, genre_id=genre_ids[name], position=position)
+        for artist_id, genres in artist_genres.items()
+        for position, name in enumerate(genres)
+    ]
+
+    ArtistGenre.objects.filter(artist_id__in=artist_genres).delete()
+    ArtistGenre.objects.bulk_create(links, batch_size=DB_BATCH_SIZE)
+    return len(links)
+
+
+def _batch_count(count):
+    """ID count개를 CHUNK_SIZE 단위로 요청할 때 필요한 API 호출 수."""
+    return (count + CHUNK_SIZE - 1) // CHUNK_SIZE
+
+
+def plan_album_lookups(track_items):
+    """
+    트랙 저장에 필요한 앨범 필드(release_date)를 어디서 얻을지 결정합니다.
+    Top Track 응답에 포함된 simplified album에 release_date가 있으면 그대로 사용하고,
+    없는 앨범 ID만 sp.albums 상세 조회 대상으로 반환합니다.
+    반환값: (embedded_album_details, album_ids_to_fetch)
+    """
+    embedded_album_details = {}
+    album_ids_to_fetch = []
+
+    for track_data in track_items:
+        album = track_data.get('album') or {}
+        album_id = album.get('id')
+        if not album_id or album_id in embedded_album_details:
             continue
 
-    album_details_dict = {album['id']: album for album in all_album_details}
+        if album.get('release_date'):
+            embedded_album_details[album_id] = album
+        elif album_id not in album_ids_to_fetch:
+            album_ids_to_fetch.append(album_id)
 
+    # 같은 앨범이 앞에서 release_date 없이, 뒤에서 release_date와 함께 나온 경우 정리
+    album_ids_to_fetch = [album_id for album_id in album_ids_to_fetch if album_id not in embedded_album_details]
+    return embedded_album_details, album_ids_to_fetch
 
-    # ----------------------------------------------------
-    # 6. Track 데이터 저장 (최종 로직)
-    # ----------------------------------------------------
-    for index, track_data in enumerate(all_tracks): # ⭐ 이 all_tracks는 이제 위에서 정의된 리스트입니다.
+
+def _build_track_rows(all_tracks, track_artist_map, artist_details_dict, album_details_dict, django_user, time_range):
+    """
+    수집한 Top Track 목록을 (아직 저장하지 않은) TrackRanking 인스턴스 목록으로 변환합니다.
+    각 순위의 .track에는 카탈로그에 기록할 Track 인스턴스가 연결됩니다.
+    순위는 기간(time_range)별 수집 순서(index + 1)이며, 대표 아티스트가 없는 트랙은 제외합니다.
+    """
+    rankings = []
+    for index, track_data in enumerate(all_tracks):
         ranking = index + 1
         artist_id = track_artist_map.get(track_data['id'])
-        
+
         if not artist_id: continue
 
         # 앨범 정보 획득 및 연도 추출
         album_id = track_data['album']['id']
         album_detail = album_details_dict.get(album_id, {})
         release_date_str = album_detail.get('release_date', '0000') 
-        
+
         try:
             release_year = int(release_date_str.split('-')[0])
         except:
             release_year = None
-            
-        try:
-            artist_obj = Artist.objects.get(spotify_id=artist_id) 
-        except Artist.DoesNotExist:
-            continue 
-            
+
         # 장르 추출 (Artist의 첫 번째 장르)
         artist_detail = artist_details_dict.get(artist_id, {})
         genres_list = artist_detail.get('genres', [])
         track_genre_value = genres_list[0] if genres_list else "" 
-        
-        Track.objects.create(
+
+        # 대시보드 표시용 앨범 이미지 (첫 번째 = 가장 큰 이미지)
+        album_images = track_data['album'].get('images') or []
+
+        track = Track(
             spotify_id=track_data['id'],
             name=track_data['name'],
             popularity=track_data['popularity'],
             duration_ms=track_data['duration_ms'],
-            
+            album_image_url=album_images[0]['url'] if album_images else '',
+
             release_year=release_year, 
             genre=track_genre_value, 
-            
-            artist=artist_obj, 
+
+            # Artist 객체를 조회하지 않고 FK 값만 지정
+            artist_id=artist_id, 
+        )
+        rankings.append(TrackRanking(
             user=django_user,
-            ranking=ranking
+            track=track,
+            time_range=time_range,
+            ranking=ranking,
+            popularity=track.popularity, # 동기화 시점 인기도 (카탈로그 값이 나중에 바뀌어도 유지)
+        ))
+
+    return rankings
+
+
+def _payload_hash(artist_details, rankings):
+    """
+    DB에 기록될 아티스트/트랙/순위 값만으로 계산한 SHA-256 해시 (변경 여부 판단용).
+    장르는 저장되는 형태로 정리해 비교합니다. (API 응답과 TTL 캐시 중 어디서 읽었는지에 따라 해시가 달라지지 않도록)
+    """
+    payload = {
+        'artists': sorted(
+            [a['id'], a['name'], a['popularity'], a['followers']['total'], _artist_genre_names(a)]
+            for a in artist_details
+        ),
+        'tracks': [
+            [r.time_range, r.track.spotify_id, r.ranking, *(getattr(r.track, field) for field in TRACK_CATALOG_FIELDS)]
+            for r in rankings
+        ],
+    }
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def upsert_track_catalog(tracks):
+    """
+    공용 트랙 카탈로그에 새 트랙과 정보가 바뀐 트랙만 Bulk Upsert 합니다.
+    (다른 사용자가 이미 저장한 트랙은 값이 같으면 다시 쓰지 않습니다.)
+    """
+    stored = {
+        spotify_id: values
+        for spotify_id, *values in Track.objects.filter(spotify_id__in=[track.spotify_id for track in tracks])
+                                                .values_list('spotify_id', *TRACK_CATALOG_FIELDS)
+    }
+
+    rows = [
+        track for track in tracks
+        if stored.get(track.spotify_id) != [getattr(track, field) for field in TRACK_CATALOG_FIELDS]
+    ]
+    Track.objects.bulk_create(
+        rows,
+        batch_size=DB_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['spotify_id'],
+        update_fields=list(TRACK_CATALOG_FIELDS),
+    )
+    return len(rows)
+
+
+def _apply_ranking_diff(django_user, time_ranges, rankings):
+    """
+    저장된 순위와 새로 수집한 순위를 기간(time_range)별로 비교하여 변경분만 반영합니다.
+    빠진 트랙의 순위는 삭제하고, 새 트랙과 순위 / 인기도가 바뀐 트랙만 기록합니다.
+    """
+    stored = {
+        (time_range, track_id): (pk, ranking, popularity)
+        for pk, time_range, track_id, ranking, popularity in
+        TrackRanking.objects.filter(user=django_user, time_range__in=time_ranges)
+                            .values_list('pk', 'time_range', 'track_id', 'ranking', 'popularity')
+    }
+    new_keys = {(ranking.time_range, ranking.track_id) for ranking in rankings}
+
+    # 1. 목록에서 빠진 트랙의 순위 삭제
+    dropped_pks = [pk for key, (pk, _, _) in stored.items() if key not in new_keys]
+    if dropped_pks:
+        TrackRanking.objects.filter(pk__in=dropped_pks).delete()
+
+    # 2. 순위가 바뀐 기존 트랙 / 인기도만 바뀐 기존 트랙 / 새로 들어온 트랙 분류
+    moved = []
+    repopularized = []
+    created = []
+    for ranking in rankings:
+        old = stored.get((ranking.time_range, ranking.track_id))
+        if old is None:
+            created.append(ranking)
+        elif old[1] != ranking.ranking:
+            moved.append(ranking)
+        elif old[2] != ranking.popularity:
+            repopularized.append(ranking)
+
+    # (user, time_range, track) 기준 INSERT ... ON CONFLICT DO UPDATE 로 한 번에 기록합니다.
+    # (bulk_update의 CASE WHEN 식보다 훨씬 가볍습니다.)
+    def upsert(rows):
+        TrackRanking.objects.bulk_create(
+            rows,
+            batch_size=DB_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['user', 'time_range', 'track'],
+            update_fields=['ranking', 'popularity'],
         )
-    
-    return True
 
-def calculate_popularity_distribution(django_user, ranking_limit):
+    # (user, time_range, ranking) unique 제약 때문에 순위가 서로 바뀌는 경우 한 번에 기록하면 충돌합니다.
+    # 순위가 바뀐 행을 먼저 음수(임시) 순위로 옮긴 뒤 최종 순위를 기록합니다.
+    if moved:
+        for ranking in moved:
+            ranking.ranking = -ranking.ranking
+        upsert(moved)
+        for ranking in moved:
+            ranking.ranking = -ranking.ranking
+
+    # 3. 순위 / 인기도가 바뀐 트랙 UPDATE + 새로 들어온 트랙 INSERT
+    upsert(moved + repopularized + created)
+
+    return {'created': len(created), 'updated': len(moved) + len(repopularized), 'deleted': len(dropped_pks)}
+
+
+def save_top_tracks_data(sp: spotipy.Spotify, django_user: User, full_refresh=False, progress=None, time_ranges=None):
     """
-    사용자의 상위 N개 트랙에 대한 인기도(Popularity) 분포를 10점 단위 버킷으로 계산합니다.
-    (AJAX 동적 갱신용)
+    Spotify Top Track을 기간(short_term / medium_term / long_term)별로 한 번에 수집하여 DB에 반영합니다.
+    아티스트/앨범 상세 정보는 모든 기간을 합쳐 중복 없이 한 번만 요청합니다.
+    기본은 변경분만 반영하는 증분 동기화이며, 수집 결과의 해시가 지난 동기화와 같으면 쓰기를 생략합니다.
+    full_refresh=True 이면 기존처럼 전체 삭제 후 다시 저장합니다.
+    progress(phase, done, total)가 주어지면 단계(pages/artists/albums/tracks)별 진행 상황을 알립니다.
+    time_ranges를 생략하면 settings.SPOTIFY_SYNC_TIME_RANGES 의 기간을 모두 수집합니다.
+    단계별 계측 결과는 로그와 SyncRun 테이블에 기록됩니다.
+    반환값: 캐시 사용 / 생략한 상세 조회 호출 수 등의 수집 통계 Dictionary
     """
+    if time_ranges is None:
+        time_ranges = getattr(settings, 'SPOTIFY_SYNC_TIME_RANGES', TrackRanking.TIME_RANGES)
+    time_ranges = list(time_ranges)
+
+    recorder = IngestRecorder()
+    try:
+        stats = _sync_top_tracks(recorder.instrument(sp), django_user, full_refresh, progress, time_ranges, recorder)
+    except Exception as e:
+        recorder.finish(django_user, SyncRun.STATUS_FAILED, error=str(e))
+        raise
+
+    status = SyncRun.STATUS_SKIPPED if stats.get('unchanged') else SyncRun.STATUS_OK
+    recorder.finish(django_user, status, stats)
+    return stats
+
+
+def _sync_top_tracks(sp, django_user, full_refresh, progress, time_ranges, recorder):
+    """save_top_tracks_data의 실제 수집/저장 단계. 각 단계는 recorder.phase()로 계측합니다."""
+
+    def phase_progress(phase):
+        if progress is None:
+            return None
+        return lambda done, total: progress(phase, done, total)
+
+    # ----------------------------------------------------
+    # 1~2. 모든 기간의 Top Track 페이지 병렬 수집 (API 호출은 트랜잭션 밖에서 수행)
+    # ----------------------------------------------------
+    with recorder.phase('page_fetch'):
+        tracks_by_range = fetch_top_tracks(sp, time_ranges, on_progress=phase_progress('pages'))
+
+    # ----------------------------------------------------
+    # 3. ID 추출 (트랙, 아티스트, 앨범) - 모든 기간을 합쳐서 추출
+    # ----------------------------------------------------
+    track_artist_map = {} 
+    artist_ids = []
+    track_items = []
     
-    # 1. 인기도 버킷 (1-10, 11-20, ...) 정의
-    popularity_buckets = [
-        (f'{i+1}-{i+10}', (i+1, i+10)) 
-        for i in range(0, 100, 10)
+    for track_data in (t for range_tracks in tracks_by_range.values() for t in range_tracks):
+        if not track_data or not track_data.get('artists'): continue
+        main_artist_id = track_data['artists'][0]['id']
+        artist_ids.append(main_artist_id)
+        
+        track_items.append(track_data)
+        track_artist_map[track_data['id']] = main_artist_id 
+
+    # ----------------------------------------------------
+    # 4~5. 아티스트 / 앨범 상세 정보 Bulk 획득 (Batch 단위 병렬 요청)
+    # ----------------------------------------------------
+    unique_artist_ids = list(set(artist_ids))
+
+    with recorder.phase('artist_fetch'):
+        # TTL 안의 아티스트는 DB에서 재사용하고, 오래되었거나 없는 아티스트만 API로 요청
+        cached_artist_details = load_fresh_artist_details(unique_artist_ids)
+        stale_artist_ids = [artist_id for artist_id in unique_artist_ids if artist_id not in cached_artist_details]
+        fetched_artist_details = _fetch_details_in_chunks(
+            sp.artists, stale_artist_ids, 'artists', '아티스트', phase_progress('artists'))
+
+    artist_details_dict = dict(cached_artist_details)
+    artist_details_dict.update({artist['id']: artist for artist in fetched_artist_details})
+
+    with recorder.phase('album_fetch'):
+        # 앨범은 Top Track 응답에 포함된 release_date를 우선 사용하고, 없는 앨범만 상세 조회
+        album_details_dict, album_ids_to_fetch = plan_album_lookups(track_items)
+        embedded_album_count = len(album_details_dict)
+        all_album_details = _fetch_details_in_chunks(
+            sp.albums, album_ids_to_fetch, 'albums', '앨범', phase_progress('albums'))
+        album_details_dict.update({album['id']: album for album in all_album_details})
+
+    unique_album_count = embedded_album_count + len(album_ids_to_fetch)
+    stats = {
+        'artist_ids': len(unique_artist_ids),
+        'artist_cache_hits': len(cached_artist_details),
+        'artist_calls_avoided': _batch_count(len(unique_artist_ids)) - _batch_count(len(stale_artist_ids)),
+        'album_ids': unique_album_count,
+        'album_ids_embedded': embedded_album_count,
+        'album_calls_avoided': _batch_count(unique_album_count) - _batch_count(len(album_ids_to_fetch)),
+    }
+    logger.info("Top track sync for user %s: %s", django_user.pk, stats)
+
+    artist_details = [artist_details_dict[artist_id] for artist_id in unique_artist_ids
+                      if artist_id in artist_details_dict]
+    rankings = []
+    for time_range, range_tracks in tracks_by_range.items():
+        rankings.extend(_build_track_rows(
+            range_tracks, track_artist_map, artist_details_dict, album_details_dict, django_user, time_range))
+    payload_hash = _payload_hash(artist_details, rankings)
+
+    if progress:
+        progress('tracks', 0, len(rankings))
+
+    with transaction.atomic():
+        # 같은 사용자의 동기화가 겹치면 한쪽이 끝날 때까지 대기 (기여분을 두 번 반영하지 않도록)
+        sync_state, _ = SyncState.objects.select_for_update().get_or_create(user=django_user)
+
+        # 새로 받아온 아티스트만 DB 저장 (Batch 단위 Bulk Upsert)
+        # 수집 결과가 같아도 저장해야 fetched_at이 갱신되어 다음 동기화에서 TTL 캐시를 사용합니다.
+        with recorder.phase('artist_upsert') as metrics:
+            metrics.rows_written = upsert_artists(fetched_artist_details)
+
+        # 지난 동기화와 수집 결과가 같으면 트랙 쓰기를 모두 생략하고 동기화 시각만 기록
+        if not full_refresh and sync_state.payload_hash == payload_hash:
+            SyncState.objects.filter(pk=sync_state.pk).update(synced_at=timezone.now())
+            if progress:
+                progress('tracks', len(rankings), len(rankings))
+            stats['unchanged'] = True
+            return stats
+
+        # ----------------------------------------------------
+        # 6. Track 카탈로그 저장 (모든 기간을 합쳐 트랙당 한 번, 아티스트 존재 여부는 한 번에 조회)
+        # ----------------------------------------------------
+        with recorder.phase('track_catalog') as metrics:
+            existing_artist_ids = set(
+                Artist.objects.filter(spotify_id__in=unique_artist_ids).values_list('spotify_id', flat=True)
+            )
+            # 아티스트 정보가 없는 트랙은 기존과 동일하게 건너뜁니다.
+            rankings = [ranking for ranking in rankings if ranking.track.artist_id in existing_artist_ids]
+
+            catalog = {ranking.track.spotify_id: ranking.track for ranking in rankings}
+            metrics.rows_written = upsert_track_catalog(list(catalog.values()))
+            stats.update(catalog_written=metrics.rows_written)
+
+        # ----------------------------------------------------
+        # 7. 사용자 순위 저장 (user, track, time_range, ranking 만 기록)
+        # ----------------------------------------------------
+        with recorder.phase('track_write') as metrics:
+            if full_refresh:
+                TrackRanking.objects.filter(user=django_user, time_range__in=time_ranges).delete()
+                TrackRanking.objects.bulk_create(rankings, batch_size=DB_BATCH_SIZE)
+                metrics.rows_written = len(rankings)
+            else:
+                changes = _apply_ranking_diff(django_user, time_ranges, rankings)
+                metrics.rows_written = changes['created'] + changes['updated'] + changes['deleted']
+            stats.update(tracks_written=metrics.rows_written)
+
+        # 슬라이더용 순위 구간별 누적 인기도 분포 재계산
+        with recorder.phase('prefix_histogram') as metrics:
+            metrics.rows_written = rebuild_popularity_prefix_histograms(django_user, time_ranges, rankings)
+
+        # 전체 사용자 통계에서 이 사용자의 이전 기여분을 빼고 새 기여분을 더합니다.
+        with recorder.phase('global_rollup') as metrics:
+            contribution = rollups.build_contribution(rankings, time_ranges)
+            metrics.rows_written = rollups.apply_contribution(sync_state.rollup_contribution, contribution)
+
+        # 순위 변화 조회용 스냅샷 기록 (직전 스냅샷과의 차이만 저장)
+        with recorder.phase('ranking_history') as metrics:
+            metrics.rows_written = history.record_snapshots(django_user, time_ranges, rankings)
+
+        # 데이터 버전을 올려 이전 버전으로 캐시된 시각화 데이터를 무효화합니다.
+        sync_state.payload_hash = payload_hash
+        sync_state.synced_at = timezone.now()
+        sync_state.data_version = F('data_version') + 1
+        sync_state.rollup_contribution = {**sync_state.rollup_contribution, **contribution}
+        sync_state.save(update_fields=['payload_hash', 'synced_at', 'data_version', 'rollup_contribution'])
+
+    if progress:
+        progress('tracks', len(rankings), len(rankings))
+
+    return stats
+
+
+def rebuild_popularity_prefix_histograms(django_user, time_ranges, rankings):
+    """
+    방금 저장한 순위 목록(TrackRanking, .track 포함)으로 순위 구간(상위 N개)별 누적 인기도 분포 테이블을 다시 만듭니다.
+    트랙 하나가 추가될 때마다 해당 버킷만 1 증가하므로, 순위 순서대로 한 번 훑으며 누적합니다.
+    """
+    PopularityPrefixHistogram.objects.filter(user=django_user, time_range__in=time_ranges).delete()
+
+    bucket_count = len(histograms.bucket_labels('popularity'))
+    rows = []
+    for time_range in time_ranges:
+        counts = [0] * bucket_count
+        for ranking in sorted((r for r in rankings if r.time_range == time_range), key=lambda r: r.ranking):
+            index = histograms.bucket_index('popularity', ranking.popularity)
+            if index is not None:
+                counts[index] += 1
+            rows.append(PopularityPrefixHistogram(
+                user=django_user, time_range=time_range, ranking=ranking.ranking, counts=list(counts)))
+
+    PopularityPrefixHistogram.objects.bulk_create(rows, batch_size=DB_BATCH_SIZE)
+    return len(rows)
+
+
+def calculate_popularity_distribution(django_user, ranking_limit, time_range='long_term'):
+    """
+    사용자의 상위 N개 트랙(time_range 기간 기준)에 대한 인기도(Popularity) 분포를 10점 단위 버킷으로 계산합니다.
+    (AJAX 동적 갱신용) 미리 계산한 누적 분포 테이블에서 ranking <= N 인 마지막 행 하나만 읽고,
+    아직 테이블이 없으면 GROUP BY 쿼리 한 번으로 직접 집계합니다.
+    반환값: [{'bucket': '1-10', 'count': 3}, ..., {'bucket': '91-100', 'count': 0}]
+    """
+    counts = (
+        PopularityPrefixHistogram.objects
+        .filter(user=django_user, time_range=time_range, ranking__lte=ranking_limit)
+        .order_by('-ranking')
+        .values_list('counts', flat=True)
+        .first()
+    )
+    if counts is None:
+        return histograms.track_histogram(django_user, 'popularity', time_range, ranking_limit=ranking_limit)
+
+    return [
+        {'bucket': label, 'count': count}
+        for label, count in zip(histograms.bucket_labels('popularity'), counts)
     ]
-    
-    popularity_data = []
 
-    # ⭐ N 값(ranking_limit)에 따라 필터링된 쿼리셋 사용 ⭐
-    popularity_queryset = Track.objects.filter(
-        user=django_user,
-        ranking__lte=ranking_limit # 동적으로 N 값 사용
+
+def popularity_prefix_payload(django_user, time_range='long_term'):
+    """
+    모든 순위 구간(상위 N개)의 인기도 분포를 클라이언트가 직접 계산할 수 있도록 압축한 데이터.
+    상위 N-1개 → N개로 넓힐 때 추가되는 트랙은 하나뿐이므로, 순위 순서대로 변화량만 정수 배열로 보냅니다.
+      ranking_deltas: 이전 순위와의 차이 (첫 값은 첫 순위 자체, 보통 1의 연속)
+      buckets:        그 순위의 트랙이 더해지는 버킷 번호 (인기도가 없거나 범위 밖이면 -1)
+    클라이언트는 buckets를 누적하여 임의의 N에 대한 분포를 서버 호출 없이 구합니다.
+    """
+    rows = (
+        TrackRanking.objects
+        .filter(user=django_user, time_range=time_range)
+        .order_by('ranking')
+        .values_list('ranking', 'popularity')
     )
 
-    for label, (min_pop, max_pop) in popularity_buckets:
-        
-        # 해당 popularity 범위에 속하는 트랙의 개수를 계산
-        count = popularity_queryset.filter(
-            popularity__gte=min_pop,
-            popularity__lte=max_pop
-        ).count()
-        
-        popularity_data.append({
-            'bucket': label,
-            'count': count
-        })
-        
-    return popularity_data
+    ranking_deltas = []
+    buckets = []
+    previous_ranking = 0
+    for ranking, popularity in rows:
+        ranking_deltas.append(ranking - previous_ranking)
+        previous_ranking = ranking
 
+        index = histograms.bucket_index('popularity', popularity)
+        buckets.append(-1 if index is None else index)
 
-def get_all_visual_data(django_user):
+    return {
+        'labels': histograms.bucket_labels('popularity'),
+        'ranking_deltas': ranking_deltas,
+        'buckets': buckets,
+    }
+
+
+def has_synced(django_user):
+    """
+    사용자의 Top Track 동기화가 한 번이라도 완료되었는지 여부 (수집 결과가 0개인 경우 포함).
+    SyncState 도입 이전에 저장된 Track이 있는 사용자도 동기화된 것으로 봅니다.
+    """
+    return (
+        SyncState.objects.filter(user=django_user, synced_at__isnull=False).exists()
+        or TrackRanking.objects.filter(user=django_user).exists()
+    )
+
+
+def calculate_genre_counts(django_user, time_range='long_term', limit=None):
+    """
+    사용자의 Top Track(time_range 기간)에 등장하는 장르별 트랙 수를 GROUP BY 쿼리 한 번으로 계산합니다.
+    트랙마다 대표 장르 하나가 아니라 아티스트의 모든 장르를 각각 셉니다.
+    반환값: [{'genre': 'k-pop', 'count': 12}, ...] (많은 순)
+    """
+    genre_counts = (
+        ArtistGenre.objects
+        .filter(artist__tracks__rankings__user=django_user, artist__tracks__rankings__time_range=time_range)
+        .values('genre__name')
+        .annotate(count=Count('pk'))
+        .order_by('-count', 'genre__name')
+    )
+    if limit is not None:
+        genre_counts = genre_counts[:limit]
+
+    return [{'genre': item['genre__name'], 'count': item['count']} for item in genre_counts]
+
+
+def get_dashboard_data(django_user, time_range='medium_term', limit=5):
+    """
+    대시보드용 Top N 트랙 / Top N 장르를 수집된 DB 데이터에서 읽습니다. (Spotify API 호출 없음, 쿼리 2번)
+    반환값: {'top_tracks': [{'ranking', 'name', 'artist_name', 'album_image_url'}, ...],
+             'top_genres': [{'genre': 'k-pop', 'count': 12}, ...]}
+    """
+    top_tracks = (
+        TrackRanking.objects
+        .filter(user=django_user, time_range=time_range, ranking__lte=limit)
+        .order_by('ranking')
+        .values_list('ranking', 'track__name', 'track__artist__name', 'track__album_image_url')
+    )
+    return {
+        'top_tracks': [
+            {'ranking': ranking, 'name': name, 'artist_name': artist_name, 'album_image_url': album_image_url}
+            for ranking, name, artist_name, album_image_url in top_tracks
+        ],
+        'top_genres': calculate_genre_counts(django_user, time_range, limit=limit),
+    }
+
+
+def get_all_visual_data(django_user, time_range='long_term'):
     """
-    DB에서 필요한 모든 시각화 및 목록 데이터를 추출하여 Dictionary 형태로 반환합니다.
+    DB에서 필요한 모든 시각화 및 목록 데이터(time_range 기간 기준)를 추출하여 Dictionary 형태로 반환합니다.
     (visuals_view가 호출하는 최종 분석 함수)
+    모델 인스턴스 대신 필요한 컬럼만 튜플로 읽고, 한 번 훑으면서 트랙 목록과 아티스트 / 인기도 집계를 함께 만듭니다.
     """
-    
-    # 1. ⭐ 전체 Track 목록 획득 (왼쪽 목록용) ⭐
-    # Artist 객체 이름 접근을 위해 select_related('artist') 사용
-    all_tracks_qs = Track.objects.filter(user=django_user).select_related('artist').order_by('ranking')
-    
+    INITIAL_RANKING_LIMIT = 50 # 슬라이더 초기값 N
 
-    # ⭐⭐ 여기에 인스턴스 개수 출력 코드를 추가합니다. ⭐⭐
-    track_count = all_tracks_qs.count()
-    print(f"--- DEBUG INFO ---")
-    print(f"DB에서 조회된 총 Track 인스턴스 개수: {track_count}개")
-    print(f"------------------")
+    # 1. ⭐ 전체 Track 목록 + 집계 (왼쪽 목록 / 아티스트 차트 / 초기 인기도 분포) ⭐
+    track_rows = (
+        TrackRanking.objects
+        .filter(user=django_user, time_range=time_range)
+        .order_by('ranking')
+        .values_list('ranking', 'track__name', 'track__genre', 'popularity', 'track__release_year',
+                     'track__artist_id', 'track__artist__name')
+    )
 
-    # 템플릿 렌더링에 적합한 형태로 List of Dicts로 변환
     all_tracks_list = []
-    for track in all_tracks_qs:
+    artist_track_counts = Counter()   # artist_id → 트랙 수 (장르 집계용)
+    artist_name_counts = Counter()    # 아티스트 이름 → 트랙 수 (Top Artist 차트용)
+    popularity_labels = histograms.bucket_labels('popularity')
+    popularity_counts = [0] * len(popularity_labels)
+
+    for ranking, name, genre, popularity, release_year, artist_id, artist_name in track_rows.iterator(chunk_size=2000):
         all_tracks_list.append({
-            'ranking': track.ranking,
-            'name': track.name,
-            'genre': track.genre,
-            'popularity': track.popularity,
-            'release_year': track.release_year,
-            # ForeignKey 필드를 통해 아티스트 이름 접근
-            'artist_name': track.artist.name, 
+            'ranking': ranking,
+            'name': name,
+            'genre': genre,
+            'popularity': popularity,
+            'release_year': release_year,
+            'artist_name': artist_name,
         })
+        artist_track_counts[artist_id] += 1
+        artist_name_counts[artist_name] += 1
 
+        if ranking <= INITIAL_RANKING_LIMIT:
+            bucket = histograms.bucket_index('popularity', popularity)
+            if bucket is not None:
+                popularity_counts[bucket] += 1
 
-    # 2. ⭐ 장르 분석 데이터 획득 (오른쪽 차트용) ⭐
-    # Track 모델에서 장르별 빈도수를 집계합니다.
-    # Count('genre')를 사용하여 DB에서 효율적으로 계산
-    genre_analysis = Track.objects.filter(user=django_user).values('genre').annotate(count=Count('genre')).order_by('-count')[:10]
-    
-    top_genres = [{'genre': item['genre'], 'count': item['count']} for item in genre_analysis]
+    # 2. ⭐ 장르 분석 데이터 (오른쪽 차트용) ⭐
+    # 아티스트별 장르 목록만 한 번 읽고, 아티스트의 트랙 수만큼 각 장르에 더합니다.
+    # (calculate_genre_counts와 같은 결과: 트랙마다 아티스트의 모든 장르를 셈)
+    artist_genres = (
+        ArtistGenre.objects
+        .filter(artist__tracks__rankings__user=django_user, artist__tracks__rankings__time_range=time_range)
+        .values_list('artist_id', 'genre__name')
+        .distinct()
+    )
+    genre_counts = Counter()
+    for artist_id, genre_name in artist_genres:
+        genre_counts[genre_name] += artist_track_counts[artist_id]
 
-    # 3. ⭐ 초기 인기도 분포 데이터 획득 (슬라이더 초기값 N=50 기준) ⭐
-    INITIAL_RANKING_LIMIT = 50 
-    initial_popularity_data = calculate_popularity_distribution(django_user, INITIAL_RANKING_LIMIT)
+    top_genres = [
+        {'genre': genre, 'count': count}
+        for genre, count in sorted(genre_counts.items(), key=lambda item: (-item[1], item[0]))[:10]
+    ]
 
-    # Artist의 이름(ForeignKey 필드)을 기준으로 Track 개수를 세어 Top 10을 추출
-    top_artists_analysis = Track.objects.filter(user=django_user) \
-        .values('artist__name') \
-        .annotate(count=Count('artist__name')) \
-        .order_by('-count')[:10]
-        
-    # 시각화를 위한 리스트 형태로 변환
+    # 3. ⭐ 초기 인기도 분포 (슬라이더 초기값 N=50 기준) ⭐
+    initial_popularity_data = [
+        {'bucket': label, 'count': count}
+        for label, count in zip(popularity_labels, popularity_counts)
+    ]
+
+    # 아티스트 이름별 트랙 수 Top 10
     top_artists_focus = [
-        {'artist_name': item['artist__name'], 'count': item['count']} 
-        for item in top_artists_analysis
+        {'artist_name': artist_name, 'count': count}
+        for artist_name, count in sorted(artist_name_counts.items(), key=lambda item: (-item[1], item[0]))[:10]
     ]
-    print("--- DEBUG: TOP ARTISTS FOCUS ---")
-    print(f"Top Artist 데이터 개수: {len(top_artists_focus)}개")
-    if len(top_artists_focus) == 0:
-        # 데이터가 없을 때, 왜 없는지 확인
-        print("경고: Top Artist 데이터가 비어 있습니다. DB에 트랙과 연결된 아티스트 정보가 없는지 확인하세요.")
-    else:
-        print(f"첫 번째 아티스트: {top_artists_focus[0]}")
-    print("--------------------------------")
-    
+    if not top_artists_focus:
+        logger.debug("Top artist data is empty for user %s (%s)", django_user.pk, time_range)
+
     # 4. Context에 전달할 최종 Dictionary 반환
     return {
         'all_tracks': all_tracks_list,
         'top_genres': top_genres,
         'initial_popularity_data': initial_popularity_data, # 초기 인기도 데이터
-        'max_ranking': all_tracks_qs.count(), # 슬라이더 최대값 설정
+        'max_ranking': len(all_tracks_list), # 슬라이더 최대값 설정 (목록 길이와 동일하므로 COUNT 쿼리 생략)
         'top_artists_focus': top_artists_focus,
-    }
\ No newline at end of file
+    }
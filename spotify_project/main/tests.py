@@ -1,3 +1,833 @@
+import gc
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import caches
+from spotipy.exceptions import SpotifyException
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import histograms, history, http_session, jobs, playlists, rollups, scheduler, spotify, visual_cache
+from .management.commands._bench import (
+    FakeSpotifyClient,
+    explain_select_queries,
+    full_table_scans,
+    seed_synthetic_user,
+)
+from .models import (
+    Artist,
+    IngestJob,
+    Playlist,
+    PlaylistItem,
+    PlaylistOverlap,
+    RankingSnapshot,
+    SpotifyProfile,
+    SpotifyToken,
+    SyncRun,
+    SyncState,
+    TrackRanking,
+    UserPlaylist,
+)
+
+# main/tests.py
+# 분석 화면 / 동기화 단계별 쿼리 수 상한(Query Budget)과 실행 계획 회귀 테스트.
+# 사용자의 트랙 수(100 ~ 10,000개)와 관계없이 쿼리 수가 일정해야 하며,
+# 분석 쿼리가 트랙 테이블 등을 처음부터 끝까지 읽으면(Full Table Scan) 실패합니다.
+
+# 합성 사용자의 트랙 수 (세 기간에 나누어 배정)
+SYNTHETIC_TRACK_COUNTS = (100, 1000, 10000)
+
+# 화면별 최대 쿼리 수 (세션 / 사용자 조회 2개 포함)
+VIEW_QUERY_BUDGETS = {
+    'visuals': 7,             # 캐시 미스 기준: 세션, 사용자, 프로필, 동기화 여부, 데이터 버전, 트랙 목록(+집계), 장르
+    'visuals_cached': 5,
+    'dashboard': 6,           # 세션, 사용자, 프로필, 동기화 시각, Top 5 트랙, Top 5 장르
+    'popularity': 3,
+    'popularity_prefixes': 4,
+    'histogram': 3,
+    'sync_status': 3,
+    'global_insights': 5,
+    'ranking_history': 7,     # 키프레임 위치, 스냅샷 구간, 트랙 이름 + 트랙 순위 추이(키프레임, 구간)
+    'playlists': 6,           # 세션, 사용자, 프로필, 라이브러리 상태, 페이지 재생 목록, 겹침 상위 목록
+}
+
+# 동기화 단계별 최대 쿼리 수 (500개 x 3기간 기준, 수집량 상한이 고정이므로 쿼리 수도 고정)
+# SQLite는 쿼리당 파라미터가 999개로 제한되어 bulk_create가 여러 INSERT로 나뉩니다.
+INGEST_PHASE_QUERY_BUDGETS = {
+    'page_fetch': 0,
+    'artist_fetch': 2,
+    'album_fetch': 0,
+    'artist_upsert': 6,
+    'track_catalog': 7,       # 아티스트 확인 1 + 기존 카탈로그 조회 1 + 새 / 바뀐 트랙 upsert
+    'track_write': 36,        # diff 최악의 경우: 모든 행 이동 (임시 순위 upsert + 최종 upsert)
+    'prefix_histogram': 8,
+    'global_rollup': 7,
+    'ranking_history': 5,
+}
+
+
+class QueryBudgetMixin:
+
+    def assertQueryBudget(self, captured, budget, label):
+        queries = [query['sql'] for query in captured.captured_queries]
+        self.assertLessEqual(
+            len(queries), budget,
+            f"{label}: {len(queries)} queries (budget {budget})\n" + "\n".join(queries),
+        )
+
+
+class AnalyticsViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """분석 화면의 쿼리 수가 상한을 넘지 않고, 사용자의 트랙 수에 따라 늘어나지 않는지 확인합니다."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            seed_synthetic_user(f'synthetic_{count}', count, seed=count)
+            for count in SYNTHETIC_TRACK_COUNTS
+        ]
+
+    def setUp(self):
+        caches[visual_cache.VISUALS_CACHE_ALIAS].clear()
+
+        # 뷰가 만드는 Spotify 클라이언트를 네트워크 없는 가짜 클라이언트로 교체 (토큰 조회 쿼리는 그대로 실행)
+        patcher = mock.patch.object(spotify, 'make_spotify_client', return_value=FakeSpotifyClient())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_within_budget(self, django_user, url, budget_name, **headers):
+        self.client.force_login(django_user)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, **headers)
+        self.assertQueryBudget(captured, VIEW_QUERY_BUDGETS[budget_name], f'{budget_name} ({django_user.username})')
+        return response
+
+    def test_visuals_view(self):
+        for django_user in self.users:
+            for time_range in TrackRanking.TIME_RANGES:
+                with self.subTest(user=django_user.username, time_range=time_range):
+                    url = f"{reverse('visuals')}?time_range={time_range}"
+                    response = self.get_within_budget(django_user, url, 'visuals')
+                    self.assertEqual(response.status_code, 200)
+                    self.assertFalse(response.context.get('syncing'))
+
+                    response = self.get_within_budget(django_user, url, 'visuals_cached')
+                    self.assertEqual(response.status_code, 200)
+
+    def test_header_profile_served_from_db(self):
+        django_user = self.users[0]
+        self.client.force_login(django_user)
+        fake_client = spotify.make_spotify_client.return_value
+
+        # 저장된 프로필이 있으면 sp.me()를 호출하지 않습니다.
+        with mock.patch.object(fake_client, 'me', wraps=fake_client.me) as me:
+            response = self.client.get(reverse('visuals'))
+            self.assertEqual(response.context['user_profile']['display_name'], django_user.username)
+            self.assertFalse(me.called)
+
+            # TTL이 지난 프로필도 그대로 보여 주고, 갱신은 백그라운드 작업으로만 등록합니다.
+            SpotifyProfile.objects.filter(user=django_user).update(fetched_at=timezone.now() - timedelta(days=30))
+            response = self.client.get(reverse('visuals'))
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(me.called)
+            self.assertTrue(jobs.get_active_job(django_user, IngestJob.KIND_PROFILE))
+
+            # 저장된 프로필이 없는 사용자는 한 번만 Spotify API로 가져옵니다.
+            SpotifyProfile.objects.filter(user=django_user).delete()
+            self.client.get(reverse('visuals'))
+            self.client.get(reverse('visuals'))
+            self.assertEqual(me.call_count, 1)
+
+    def test_dashboard_view(self):
+        for django_user in self.users:
+            with self.subTest(user=django_user.username):
+                response = self.get_within_budget(django_user, reverse('dashboard'), 'dashboard')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([track['ranking'] for track in response.context['top_tracks']], [1, 2, 3, 4, 5])
+                self.assertFalse(response.context['refreshing'])
+
+        # 대시보드는 Spotify API를 호출하지 않습니다.
+        self.assertFalse(spotify.make_spotify_client.called)
+
+    def test_dashboard_refreshes_stale_data_in_background(self):
+        django_user = self.users[0]
+        SyncState.objects.filter(user=django_user).update(synced_at=timezone.now() - timedelta(days=2))
+
+        self.client.force_login(django_user)
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['refreshing'])
+        self.assertEqual(len(response.context['top_tracks']), 5)
+        self.assertTrue(jobs.get_active_job(django_user))
+        self.assertFalse(spotify.make_spotify_client.called)
+
+    def test_popularity_data(self):
+        for django_user in self.users:
+            for ranking_limit in (1, 50, 333, 10000):
+                with self.subTest(user=django_user.username, n=ranking_limit):
+                    url = f"{reverse('get_popularity_data')}?n={ranking_limit}&time_range=short_term"
+                    response = self.get_within_budget(django_user, url, 'popularity')
+                    self.assertEqual(
+                        response.json()['popularity_data'],
+                        histograms.track_histogram(django_user, 'popularity', 'short_term', ranking_limit=ranking_limit),
+                    )
+
+    def test_popularity_prefixes_and_not_modified(self):
+        for django_user in self.users:
+            with self.subTest(user=django_user.username):
+                url = f"{reverse('get_popularity_prefixes')}?time_range=medium_term"
+                response = self.get_within_budget(django_user, url, 'popularity_prefixes')
+                self.assertEqual(response.status_code, 200)
+
+                response = self.get_within_budget(
+                    django_user, url, 'popularity_prefixes', HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_histogram_data(self):
+        for django_user in self.users:
+            for query in ('field=release_year', 'field=popularity&genre=genre 3', 'field=duration_ms&n=100'):
+                with self.subTest(user=django_user.username, query=query):
+                    response = self.get_within_budget(django_user, f"{reverse('get_histogram_data')}?{query}", 'histogram')
+                    self.assertEqual(response.status_code, 200)
+
+    def test_global_insights(self):
+        for django_user in self.users:
+            with self.subTest(user=django_user.username):
+                response = self.get_within_budget(django_user, f"{reverse('global_insights')}?limit=20", 'global_insights')
+                self.assertEqual(response.status_code, 200)
+
+    def test_ranking_history(self):
+        for django_user in self.users:
+            with self.subTest(user=django_user.username):
+                url = f"{reverse('ranking_history')}?time_range=short_term&track=bench_track_000003"
+                response = self.get_within_budget(django_user, url, 'ranking_history')
+                self.assertEqual(response.status_code, 200)
+
+    def test_sync_status(self):
+        for django_user in self.users:
+            with self.subTest(user=django_user.username):
+                response = self.get_within_budget(django_user, reverse('sync_status'), 'sync_status')
+                self.assertEqual(response.status_code, 200)
+
+
+class IngestPhaseQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """동기화 단계별 쿼리 수가 상한을 넘지 않는지 SyncRun 계측 값으로 확인합니다."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.django_user = seed_synthetic_user('ingest_user', 0)
+
+    def assertPhaseBudgets(self, sync_run):
+        for phase in sync_run.phases:
+            with self.subTest(status=sync_run.status, phase=phase['name']):
+                self.assertLessEqual(
+                    phase['db_queries'], INGEST_PHASE_QUERY_BUDGETS[phase['name']],
+                    f"{phase['name']}: {phase['db_queries']} queries",
+                )
+
+    def test_initial_and_incremental_sync(self):
+        # 1. 최초 수집 (모든 행 INSERT)
+        stats = spotify.save_top_tracks_data(FakeSpotifyClient(track_count=500), self.django_user)
+        self.assertEqual(stats['tracks_written'], 1500)
+        self.assertPhaseBudgets(self.django_user.sync_runs.latest('started_at'))
+
+        # 2. 순위가 바뀐 재동기화 (이동 / 추가 / 삭제가 섞인 diff)
+        stats = spotify.save_top_tracks_data(FakeSpotifyClient(track_count=480, seed=7), self.django_user)
+        self.assertEqual(TrackRanking.objects.filter(user=self.django_user).count(), 1440)
+        self.assertPhaseBudgets(self.django_user.sync_runs.latest('started_at'))
+
+        # 3. 변경 없는 재동기화는 쓰기 단계 없이 끝납니다.
+        stats = spotify.save_top_tracks_data(FakeSpotifyClient(track_count=480, seed=7), self.django_user)
+        self.assertTrue(stats['unchanged'])
+        sync_run = self.django_user.sync_runs.latest('started_at')
+        self.assertEqual(sync_run.status, SyncRun.STATUS_SKIPPED)
+        self.assertPhaseBudgets(sync_run)
+
+    def test_page_fetch_requests_only_needed_pages(self):
+        # 기간마다 120곡: 첫 페이지로 total을 확인한 뒤 나머지 2페이지만 요청 (기간당 10페이지가 아님)
+        stats = spotify.save_top_tracks_data(FakeSpotifyClient(track_count=120), self.django_user)
+        self.assertEqual(stats['tracks_written'], 360)
+
+        page_fetch = next(phase for phase in self.django_user.sync_runs.latest('started_at').phases
+                          if phase['name'] == 'page_fetch')
+        self.assertEqual(page_fetch['api_calls'], 3 * 3)
+
+    def test_full_refresh(self):
+        spotify.save_top_tracks_data(FakeSpotifyClient(track_count=500), self.django_user)
+        spotify.save_top_tracks_data(FakeSpotifyClient(track_count=500), self.django_user, full_refresh=True)
+        self.assertPhaseBudgets(self.django_user.sync_runs.latest('started_at'))
+
+
+class IncrementalResyncTests(TestCase):
+    """증분 재동기화(_apply_ranking_diff)가 순위 교환 / 추가 / 삭제를 unique 제약 위반 없이 반영하는지 확인합니다."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.django_user = seed_synthetic_user('resync_user', 0)
+
+    def stored_rankings(self):
+        return {
+            (time_range, track_id): (pk, ranking)
+            for pk, time_range, track_id, ranking in
+            TrackRanking.objects.filter(user=self.django_user).values_list('pk', 'time_range', 'track_id', 'ranking')
+        }
+
+    def test_reorder_add_and_remove_preserve_rows(self):
+        fake = FakeSpotifyClient(track_count=120)
+        tracks = fake.tracks
+
+        fake.tracks = tracks[:100]
+        spotify.save_top_tracks_data(fake, self.django_user)
+        before = self.stored_rankings()
+
+        # 이웃한 순위끼리 교환, 구간 뒤집기, 0~9 / 60~69 삭제, 100~119 추가
+        swapped = [track for pair in zip(tracks[21:60:2], tracks[20:60:2]) for track in pair]
+        fake.tracks = tracks[100:110] + tracks[10:20] + swapped + tracks[99:69:-1] + tracks[110:120]
+        spotify.save_top_tracks_data(fake, self.django_user)
+        after = self.stored_rankings()
+
+        expected = {
+            (time_range, track['id']): ranking
+            for time_range in TrackRanking.TIME_RANGES
+            for ranking, track in enumerate(fake.tracks, start=1)
+        }
+        self.assertEqual({key: ranking for key, (_, ranking) in after.items()}, expected)
+
+        # 두 번 모두 있던 트랙은 같은 행(PK)을 유지하고, 빠진 트랙의 행은 삭제됩니다.
+        kept_keys = before.keys() & after.keys()
+        self.assertEqual(len(kept_keys), 3 * 80)
+        for key in kept_keys:
+            self.assertEqual(after[key][0], before[key][0], key)
+        self.assertFalse(any(key in after for key in before.keys() - kept_keys))
+
+    def test_other_users_sync_keeps_popularity_snapshot(self):
+        fake = FakeSpotifyClient(track_count=100)
+        spotify.save_top_tracks_data(fake, self.django_user)
+        version = visual_cache.get_data_version(self.django_user)
+        payload = spotify.popularity_prefix_payload(self.django_user, 'medium_term')
+
+        # 다른 사용자가 같은 트랙을 다른 인기도로 동기화하면 공유 카탈로그(Track.popularity)만 바뀝니다.
+        for track in fake.tracks:
+            track['popularity'] = (track['popularity'] + 50) % 101
+        other_user = seed_synthetic_user('resync_other_user', 0)
+        spotify.save_top_tracks_data(fake, other_user)
+
+        # 이 사용자의 데이터 버전(ETag / 캐시 키)과 분포 결과는 그대로이며, 저장된 분포와 실시간 계산이 일치합니다.
+        self.assertEqual(visual_cache.get_data_version(self.django_user), version)
+        self.assertEqual(spotify.popularity_prefix_payload(self.django_user, 'medium_term'), payload)
+        for ranking_limit in (10, 100):
+            self.assertEqual(
+                spotify.calculate_popularity_distribution(self.django_user, ranking_limit, 'medium_term'),
+                histograms.track_histogram(self.django_user, 'popularity', 'medium_term', ranking_limit=ranking_limit),
+            )
+
+        # 이 사용자가 다시 동기화하면 인기도만 바뀐 행도 갱신되고 데이터 버전이 올라갑니다.
+        spotify.save_top_tracks_data(fake, self.django_user)
+        self.assertGreater(visual_cache.get_data_version(self.django_user), version)
+        self.assertEqual(
+            dict(TrackRanking.objects.filter(user=self.django_user, time_range='medium_term')
+                 .values_list('track_id', 'popularity')),
+            {track['id']: track['popularity'] for track in fake.tracks},
+        )
+        self.assertNotEqual(spotify.popularity_prefix_payload(self.django_user, 'medium_term'), payload)
+
+
+class IngestJobQueueTests(TestCase):
+    """작업 큐(IngestJob)의 중복 작업 병합과 작업 선점을 확인합니다."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.django_user = seed_synthetic_user('queue_user', 0)
+
+    def test_enqueue_joins_active_job_per_kind(self):
+        job, created = jobs.enqueue_ingest(self.django_user)
+        self.assertTrue(created)
+
+        again, created = jobs.enqueue_ingest(self.django_user)
+        self.assertFalse(created)
+        self.assertEqual(again.pk, job.pk)
+
+        # 종류가 다른 작업은 따로 등록됩니다.
+        profile_job, created = jobs.enqueue_ingest(self.django_user, IngestJob.KIND_PROFILE)
+        self.assertTrue(created)
+        self.assertNotEqual(profile_job.pk, job.pk)
+
+        # 활성 작업 조회와 등록 사이에 다른 요청이 먼저 등록한 경우: unique 제약으로 기존 작업에 합류
+        with mock.patch.object(jobs, 'get_active_job', side_effect=[None, job]):
+            raced, created = jobs.enqueue_ingest(self.django_user)
+        self.assertFalse(created)
+        self.assertEqual(raced.pk, job.pk)
+        self.assertEqual(IngestJob.objects.filter(user=self.django_user, kind=IngestJob.KIND_TOP_TRACKS).count(), 1)
+
+    def test_failed_job_can_be_enqueued_again(self):
+        job, _ = jobs.enqueue_ingest(self.django_user)
+        IngestJob.objects.filter(pk=job.pk).update(status=IngestJob.STATUS_FAILED)
+
+        retry, created = jobs.enqueue_ingest(self.django_user)
+        self.assertTrue(created)
+        self.assertNotEqual(retry.pk, job.pk)
+
+    def test_claim_moves_queued_job_to_running_once(self):
+        job, _ = jobs.enqueue_ingest(self.django_user)
+
+        claimed = jobs.claim_next_job()
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual((claimed.status, claimed.attempts), (IngestJob.STATUS_RUNNING, 1))
+        self.assertIsNone(jobs.claim_next_job())
+
+        # Heartbeat가 끊긴 running 작업만 다시 선점됩니다.
+        IngestJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        reclaimed = jobs.claim_next_job()
+        self.assertEqual((reclaimed.pk, reclaimed.attempts), (job.pk, 2))
+        self.assertIsNone(jobs.claim_next_job())
+
+
+class DetailLookupTests(TestCase):
+    """아티스트 TTL 캐시 / 앨범 release_date 재사용으로 상세 조회 API 호출을 줄이는지 확인합니다."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # 가짜 클라이언트와 같은 ID의 아티스트를 방금 받아온 상태로 저장합니다.
+        cls.django_user = seed_synthetic_user('lookup_user', 0)
+
+    def test_fresh_artists_skip_api_and_stale_ones_are_refetched(self):
+        fake = FakeSpotifyClient(track_count=100, artist_count=20)
+        fake.artists = mock.Mock(wraps=fake.artists)
+
+        stats = spotify.save_top_tracks_data(fake, self.django_user)
+        self.assertFalse(fake.artists.called)
+        self.assertEqual(stats['artist_cache_hits'], 20)
+
+        stale_id = 'bench_artist_000007'
+        Artist.objects.filter(spotify_id=stale_id).update(fetched_at=timezone.now() - timedelta(days=30))
+        spotify.save_top_tracks_data(fake, self.django_user)
+        fake.artists.assert_called_once_with([stale_id])
+        self.assertGreater(Artist.objects.get(spotify_id=stale_id).fetched_at, timezone.now() - timedelta(minutes=1))
+
+    def test_unchanged_resync_still_refreshes_stale_artists(self):
+        fake = FakeSpotifyClient(track_count=100, artist_count=20)
+        fake.artists = mock.Mock(wraps=fake.artists)
+
+        # 저장된 아티스트 정보를 가짜 클라이언트 응답과 같게 맞춘 뒤 동기화 (이후 수집 결과는 변하지 않음)
+        Artist.objects.update(fetched_at=timezone.now() - timedelta(days=30))
+        spotify.save_top_tracks_data(fake, self.django_user)
+
+        stale_id = 'bench_artist_000007'
+        Artist.objects.filter(spotify_id=stale_id).update(fetched_at=timezone.now() - timedelta(days=30))
+        fake.artists.reset_mock()
+        stats = spotify.save_top_tracks_data(fake, self.django_user)
+        self.assertTrue(stats.get('unchanged'))
+        fake.artists.assert_called_once_with([stale_id])
+        self.assertGreater(Artist.objects.get(spotify_id=stale_id).fetched_at, timezone.now() - timedelta(minutes=1))
+
+        # 다시 받아온 아티스트는 TTL 안에 있으므로 다음 동기화에서는 API를 호출하지 않습니다.
+        fake.artists.reset_mock()
+        spotify.save_top_tracks_data(fake, self.django_user)
+        self.assertFalse(fake.artists.called)
+
+    def test_embedded_release_dates_skip_album_lookup(self):
+        fake = FakeSpotifyClient(track_count=100, album_count=40)
+        # 짝수 번째 앨범만 응답에 release_date가 빠져 있다고 가정
+        for track in fake.tracks:
+            if int(track['album']['id'][-6:]) % 2 == 0:
+                track['album'] = {key: value for key, value in track['album'].items() if key != 'release_date'}
+        missing_ids = {f'bench_album_{i:06d}' for i in range(0, 40, 2)}
+        fake.albums = mock.Mock(wraps=fake.albums)
+
+        stats = spotify.save_top_tracks_data(fake, self.django_user)
+        requested_ids = {album_id for call in fake.albums.call_args_list for album_id in call.args[0]}
+        self.assertEqual(requested_ids, missing_ids)
+        self.assertEqual(stats['album_ids_embedded'], 20)
+
+
+class AnalyticsQueryPlanTests(TestCase):
+    """분석 쿼리의 EXPLAIN QUERY PLAN에 주요 테이블의 Full Table Scan이 없는지 확인합니다."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.django_user = seed_synthetic_user('plan_user', max(SYNTHETIC_TRACK_COUNTS))
+        jobs.enqueue_ingest(cls.django_user)
+
+    def analytics_queries(self):
+        django_user = self.django_user
+        return {
+            'visual_data': lambda: spotify.get_all_visual_data(django_user, 'medium_term'),
+            'genre_counts': lambda: spotify.calculate_genre_counts(django_user, 'long_term'),
+            'popularity_distribution': lambda: spotify.calculate_popularity_distribution(django_user, 50),
+            'popularity_fallback': lambda: histograms.track_histogram(django_user, 'popularity', ranking_limit=50),
+            'popularity_prefixes': lambda: spotify.popularity_prefix_payload(django_user, 'short_term'),
+            'histogram_popularity': lambda: histograms.track_histogram(django_user, 'popularity'),
+            'histogram_genre': lambda: histograms.track_histogram(django_user, 'release_year', genre='genre 3'),
+            'histogram_artist': lambda: histograms.track_histogram(
+                django_user, 'duration_ms', artist_id='bench_artist_000003'),
+            'histogram_genre_top_n': lambda: histograms.track_histogram(
+                django_user, 'popularity', 'short_term', ranking_limit=50, genre='genre 3'),
+            'histogram_artist_top_n': lambda: histograms.track_histogram(
+                django_user, 'release_year', 'medium_term', ranking_limit=50, artist_id='bench_artist_000003'),
+            'dashboard_data': lambda: spotify.get_dashboard_data(django_user),
+            'has_synced': lambda: spotify.has_synced(django_user),
+            'data_version': lambda: visual_cache.get_data_version(django_user),
+            'latest_job': lambda: jobs.get_latest_job(django_user),
+            'global_insights': lambda: rollups.global_insights('long_term'),
+            'rank_changes': lambda: history.rank_changes(django_user, 'long_term', start=timezone.now()),
+            'track_rank_history': lambda: history.track_rank_history(django_user, 'bench_track_000003', 'short_term'),
+        }
+
+    def test_no_full_table_scans(self):
+        for name, query in self.analytics_queries().items():
+            with self.subTest(query=name):
+                _, plans = explain_select_queries(query)
+                self.assertTrue(plans)
+
+                scans = full_table_scans(plans)
+                self.assertFalse(
+                    scans,
+                    f"{name}: full table scan\n" + "\n".join(f"{step}\n    {sql}" for step, sql in scans),
+                )
+
+    def test_catalog_filters_use_primary_key(self):
+        # 장르 / 아티스트로 좁힌 히스토그램은 사용자의 순위에서 출발해 카탈로그(main_track)를 기본 키로만 찾아야 합니다.
+        for name in ('histogram_genre', 'histogram_artist', 'histogram_genre_top_n', 'histogram_artist_top_n'):
+            with self.subTest(query=name):
+                _, plans = explain_select_queries(self.analytics_queries()[name])
+                steps = [step for entry in plans for step in entry['plan'] if 'main_track ' in f'{step} ']
+                self.assertTrue(steps)
+                self.assertTrue(all(step.startswith('SEARCH') and '(spotify_id=?)' in step for step in steps), steps)
+
+
+class RankingHistoryTests(TestCase):
+    """순위 스냅샷의 delta 복원과 보관 정책(스냅샷 수 상한)을 확인합니다."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.django_user = seed_synthetic_user('history_user', 0)
+
+    def rankings(self, track_ids):
+        return [
+            TrackRanking(user=self.django_user, track_id=track_id, time_range='short_term', ranking=index + 1)
+            for index, track_id in enumerate(track_ids)
+        ]
+
+    def test_daily_snapshots_stay_bounded_and_decode(self):
+        started_at = timezone.now() - timedelta(days=400)
+        track_ids = [f'track_{i}' for i in range(100)]
+        expected = {}
+        for day in range(400):
+            # 매일 순위 두 개를 맞바꾸고, 트랙 하나를 새 트랙으로 교체
+            a, b = day * 7 % 100, day * 13 % 100
+            track_ids[a], track_ids[b] = track_ids[b], track_ids[a]
+            track_ids[day * 31 % 100] = f'new_{day}'
+
+            taken_at = started_at + timedelta(days=day)
+            history.record_snapshots(self.django_user, ['short_term'], self.rankings(track_ids), taken_at=taken_at)
+            expected[taken_at] = list(track_ids)
+
+        snapshots = RankingSnapshot.objects.filter(user=self.django_user, time_range='short_term').order_by('taken_at')
+        self.assertLess(snapshots.count(), 30 + 53 + 2)
+        for snapshot, decoded in history._decode_chain(snapshots):
+            self.assertEqual(decoded, expected[snapshot.taken_at])
+
+    def test_rank_changes(self):
+        now = timezone.now()
+        history.record_snapshots(self.django_user, ['short_term'], self.rankings(['a', 'b', 'c', 'd']),
+                                 taken_at=now - timedelta(days=2))
+        history.record_snapshots(self.django_user, ['short_term'], self.rankings(['d', 'a', 'e', 'b']),
+                                 taken_at=now - timedelta(days=1))
+
+        changes = history.rank_changes(self.django_user, 'short_term', start=now - timedelta(days=2), end=now)
+        self.assertEqual([entry['track_id'] for entry in changes['new_entries']], ['e'])
+        self.assertEqual(
+            [(entry['track_id'], entry['change']) for entry in changes['biggest_movers']],
+            [('d', 3), ('b', -2), ('a', -1)],
+        )
+        self.assertEqual(
+            [entry['ranking'] for entry in history.track_rank_history(self.django_user, 'c', 'short_term')],
+            [3, None],
+        )
+
+
+class FakeClock:
+    """scheduler.py의 time.monotonic / time.sleep 대체: sleep은 실제로 기다리지 않고 시각만 앞당깁니다."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 3))
+        self.now += seconds
+
+
+class RequestSchedulerTests(TestCase):
+    """요청 스케줄러의 429 Retry-After 대기 / 재시도 / 포기와 SyncRun 기록을 확인합니다."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(scheduler, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.scheduler = scheduler.SpotifyRequestScheduler(
+            rate_per_second=100, burst=100, max_in_flight=2, max_retries=2, backoff_seconds=0.1)
+
+    def rate_limited(self):
+        return SpotifyException(429, -1, 'rate limited', headers={'Retry-After': '1'})
+
+    def test_rate_limited_call_waits_then_retries(self):
+        func = mock.Mock(side_effect=[self.rate_limited(), {'id': 'ok'}])
+        sp = scheduler.ScheduledSpotify(mock.Mock(me=func), self.scheduler)
+
+        self.assertEqual(sp.me(), {'id': 'ok'})
+        self.assertEqual(func.call_count, 2)
+        # Retry-After(1초)가 백오프(0.1초)보다 길므로 1초 기다린 뒤 재시도합니다.
+        self.assertEqual(self.clock.sleeps, [1.0])
+        self.assertEqual(self.scheduler.snapshot(), {'calls': 2, 'rate_limited': 1, 'retries': 1})
+
+    def test_pause_applies_to_other_requests(self):
+        self.scheduler._retry_delay(self.rate_limited(), attempt=0)
+        self.scheduler.call(mock.Mock(return_value='ok'))
+        self.assertEqual(self.clock.sleeps, [1.0])
+
+    def test_gives_up_after_max_retries(self):
+        func = mock.Mock(side_effect=self.rate_limited())
+
+        with self.assertRaises(SpotifyException):
+            self.scheduler.call(func)
+        self.assertEqual(func.call_count, 3)
+        self.assertEqual(self.scheduler.snapshot(), {'calls': 3, 'rate_limited': 3, 'retries': 2, 'dropped': 1})
+
+    def test_server_errors_back_off_and_client_errors_fail_fast(self):
+        func = mock.Mock(side_effect=[SpotifyException(503, -1, 'unavailable')] * 2 + ['ok'])
+        self.assertEqual(self.scheduler.call(func), 'ok')
+        self.assertEqual(self.clock.sleeps, [0.1, 0.2])
+
+        func = mock.Mock(side_effect=SpotifyException(404, -1, 'not found'))
+        with self.assertRaises(SpotifyException):
+            self.scheduler.call(func)
+        self.assertEqual(func.call_count, 1)
+        self.assertEqual(self.clock.sleeps, [0.1, 0.2])
+
+    def test_sync_run_records_scheduler_counters(self):
+        django_user = seed_synthetic_user('scheduler_user', 0)
+        fake = FakeSpotifyClient(track_count=120)
+        top_tracks = fake.current_user_top_tracks
+        responses = iter([self.rate_limited()])
+
+        def flaky_top_tracks(*args, **kwargs):
+            # 첫 요청만 429 응답, 이후 요청은 정상
+            error = next(responses, None)
+            if error:
+                raise error
+            return top_tracks(*args, **kwargs)
+        fake.current_user_top_tracks = flaky_top_tracks
+
+        with mock.patch('main.instrumentation.get_scheduler', return_value=self.scheduler):
+            spotify.save_top_tracks_data(scheduler.ScheduledSpotify(fake, self.scheduler), django_user)
+
+        # 기간별 첫 페이지 3 + 나머지 6 + 재시도 1
+        sync_run = django_user.sync_runs.latest('started_at')
+        self.assertEqual(sync_run.stats['scheduler'], {'calls': 10, 'rate_limited': 1, 'retries': 1})
+
+
+class TokenCacheTests(QueryBudgetMixin, TestCase):
+    """프로세스 내 토큰 캐시와 만료 전 미리 갱신 / 동시 요청의 단일 갱신을 확인합니다."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.django_user = seed_synthetic_user('token_user', 0)
+
+    def setUp(self):
+        spotify.clear_token_cache()
+        self.addCleanup(spotify.clear_token_cache)
+        self.token_obj = SpotifyToken.objects.get(user=self.django_user)
+
+        oauth = mock.Mock()
+        oauth.refresh_access_token.return_value = {'access_token': 'refreshed-token', 'expires_in': 3600}
+        patcher = mock.patch.object(spotify, 'get_spotify_oauth', return_value=oauth)
+        self.oauth = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def test_cached_token_skips_database(self):
+        self.assertEqual(spotify.get_access_token(self.token_obj.spotify_id), 'bench-access-token')
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(spotify.get_access_token(self.token_obj.spotify_id), 'bench-access-token')
+        self.assertQueryBudget(captured, 0, 'cached token')
+
+        # 호출한 쪽이 읽은 토큰 객체를 넘기면 캐시가 비어 있어도 DB를 읽지 않습니다.
+        spotify.clear_token_cache()
+        with CaptureQueriesContext(connection) as captured:
+            spotify.get_access_token(self.token_obj.spotify_id, self.token_obj)
+        self.assertQueryBudget(captured, 0, 'passed token')
+        self.assertFalse(self.oauth.refresh_access_token.called)
+
+    def test_refreshes_before_expiry(self):
+        SpotifyToken.objects.filter(pk=self.token_obj.pk).update(expires_at=timezone.now() + timedelta(seconds=30))
+
+        self.assertEqual(spotify.get_access_token(self.token_obj.spotify_id), 'refreshed-token')
+        self.assertEqual(SpotifyToken.objects.get(pk=self.token_obj.pk).access_token, 'refreshed-token')
+
+        # 미리 갱신이 실패해도 아직 만료 전이면 기존 토큰을 사용합니다.
+        spotify.clear_token_cache()
+        SpotifyToken.objects.filter(pk=self.token_obj.pk).update(
+            access_token='current-token', expires_at=timezone.now() + timedelta(seconds=30))
+        self.oauth.refresh_access_token.side_effect = Exception('rate limited')
+        self.assertEqual(spotify.get_access_token(self.token_obj.spotify_id), 'current-token')
+
+    def test_concurrent_requests_share_one_refresh(self):
+        self.token_obj.expires_at = timezone.now() - timedelta(seconds=1)
+        refreshed = SpotifyToken(spotify_id=self.token_obj.spotify_id, access_token='refreshed-token',
+                                 expires_at=timezone.now() + timedelta(hours=1))
+
+        def slow_refresh(spotify_id):
+            time.sleep(0.05)
+            return refreshed
+
+        results = []
+        with mock.patch.object(spotify, '_refresh_token_single_flight', side_effect=slow_refresh) as refresh:
+            threads = [
+                threading.Thread(target=lambda: results.append(
+                    spotify.get_access_token(self.token_obj.spotify_id, self.token_obj)))
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(refresh.call_count, 1)
+        self.assertEqual(results, ['refreshed-token'] * 8)
+
+
+class HttpSessionTests(TestCase):
+    """모든 Spotify 클라이언트 / OAuth 객체가 프로세스 공용 연결 풀을 사용하는지 확인합니다."""
+
+    def test_clients_share_pooled_session(self):
+        session = http_session.get_http_session()
+        first = spotify.make_spotify_client('token-a')
+        second = spotify.make_spotify_client('token-b')
+
+        self.assertIs(first._client._session, session)
+        self.assertIs(second._client._session, session)
+        self.assertIs(spotify.get_spotify_oauth()._session, session)
+
+        # spotipy 클라이언트가 소멸되며 Session을 닫아도 공용 연결 풀은 유지됩니다.
+        adapter = session.get_adapter('https://api.spotify.com/v1/')
+        adapter.poolmanager.connection_from_url('https://api.spotify.com/v1/')
+        del first
+        gc.collect()
+        self.assertEqual(len(adapter.poolmanager.pools), 1)
+        self.assertIs(http_session.get_http_session(), session)
+
+
+class PlaylistLibraryTests(QueryBudgetMixin, TestCase):
+    """재생 목록 라이브러리 수집(페이지 병렬 요청 / 변경분만 재수집)과 DB 기반 재생 목록 화면을 확인합니다."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.django_user = seed_synthetic_user('playlist_user', 0)
+
+    def setUp(self):
+        patcher = mock.patch.object(spotify, 'make_spotify_client', return_value=FakeSpotifyClient())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def expected_track_sets(self, fake):
+        return {
+            playlist_id: {item['track']['id'] for item in items if item['track']['id']}
+            for playlist_id, items in fake.playlist_items_by_id.items()
+        }
+
+    def test_sync_and_incremental_resync(self):
+        fake = FakeSpotifyClient(track_count=500, playlist_count=120)
+        stats = playlists.sync_playlists(fake, self.django_user)
+        self.assertEqual((stats['playlists'], stats['playlists_refetched']), (120, 120))
+
+        # 라이브러리 순서 / 재생 목록별 중복 없는 트랙 ID (중복 트랙, 로컬 파일 제외)
+        self.assertEqual(
+            list(UserPlaylist.objects.filter(user=self.django_user).values_list('playlist_id', flat=True)),
+            [playlist['id'] for playlist in fake.playlists],
+        )
+        expected = self.expected_track_sets(fake)
+        self.assertEqual(playlists.load_library_track_ids(self.django_user), expected)
+        self.assertEqual(PlaylistItem.objects.count(), sum(len(track_ids) for track_ids in expected.values()))
+
+        # 재생 목록마다 저장된 겹침 1위가 집합 교집합으로 직접 구한 최댓값과 같아야 합니다.
+        for playlist_id, track_ids in expected.items():
+            best = max(len(track_ids & other) for other_id, other in expected.items() if other_id != playlist_id)
+            top = PlaylistOverlap.objects.filter(user=self.django_user, playlist_id=playlist_id).order_by('-shared_count').first()
+            self.assertEqual(top.shared_count if top else 0, best)
+
+        # snapshot_id가 그대로인 재수집은 트랙 페이지를 다시 요청하지 않고, 저장된 트랙 ID로 같은 겹침 목록을 만듭니다.
+        stored_overlaps = set(PlaylistOverlap.objects.filter(user=self.django_user)
+                              .values_list('playlist_id', 'other_id', 'shared_count', 'jaccard'))
+        fake.playlist_items = mock.Mock(wraps=fake.playlist_items)
+        stats = playlists.sync_playlists(fake, self.django_user)
+        self.assertEqual(stats['playlists_unchanged'], 120)
+        self.assertFalse(fake.playlist_items.called)
+        self.assertEqual(set(PlaylistOverlap.objects.filter(user=self.django_user)
+                             .values_list('playlist_id', 'other_id', 'shared_count', 'jaccard')), stored_overlaps)
+
+        # 라이브러리에서 빠진 재생 목록은 (다른 사용자가 없으면) 트랙 목록과 함께 삭제됩니다.
+        smaller = FakeSpotifyClient(track_count=500, playlist_count=100, seed=1)
+        playlists.sync_playlists(smaller, self.django_user)
+        self.assertEqual(Playlist.objects.count(), 100)
+        self.assertEqual(playlists.load_library_track_ids(self.django_user), self.expected_track_sets(smaller))
+
+    def test_overlap_matrix_matches_set_intersection(self):
+        track_sets = {f'p{i}': {f't{(i * j) % 17}' for j in range(i + 1)} for i in range(12)}
+        track_sets['empty'] = set()
+        playlist_ids = list(track_sets)
+
+        matrix = playlists.overlap_matrix(playlist_ids, track_sets)
+        for i, a in enumerate(playlist_ids):
+            for j, b in enumerate(playlist_ids):
+                self.assertEqual(matrix[i][j], len(track_sets[a] & track_sets[b]))
+
+    def test_top_overlaps_match_full_sort(self):
+        track_sets = {f'p{i}': {f't{(i * j) % 23}' for j in range(i % 9 + 1)} for i in range(40)}
+
+        top = playlists.top_overlaps(playlists.overlap_pairs(track_sets), 3)
+        for a, tracks in track_sets.items():
+            rows = sorted(
+                ((len(tracks & other), len(tracks & other) / len(tracks | other), b)
+                 for b, other in track_sets.items() if b != a and tracks & other),
+                reverse=True,
+            )[:3]
+            self.assertEqual(top.get(a, []), [(b, shared_count, round(jaccard, 4)) for shared_count, jaccard, b in rows])
+
+    def test_playlists_view_pages_from_db(self):
+        playlists.sync_playlists(FakeSpotifyClient(track_count=500, playlist_count=120), self.django_user)
+        self.client.force_login(self.django_user)
+
+        for page_number, expected_count in ((1, 50), (3, 20)):
+            with self.subTest(page=page_number):
+                with CaptureQueriesContext(connection) as captured:
+                    response = self.client.get(f"{reverse('get_playlists')}?page={page_number}")
+                self.assertQueryBudget(captured, VIEW_QUERY_BUDGETS['playlists'], f'playlists (page {page_number})')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['playlists']), expected_count)
+                self.assertEqual(response.context['page'].paginator.num_pages, 3)
+                self.assertFalse(response.context['refreshing'])
+
+        response = self.client.get(f"{reverse('playlist_overlap')}?page=3")
+        data = response.json()
+        self.assertEqual([playlist['id'] for playlist in data['playlists']], [f'bench_playlist_{i:06d}' for i in range(100, 120)])
+        self.assertEqual(data['matrix'], [list(row) for row in zip(*data['matrix'])])
+
+        # 재생 목록 화면은 Spotify API를 호출하지 않습니다.
+        self.assertFalse(spotify.make_spotify_client.called)
 
-# Create your tests here.
+    def test_playlists_view_enqueues_first_sync(self):
+        self.client.force_login(self.django_user)
+        response = self.client.get(reverse('get_playlists'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['refreshing'])
+        self.assertEqual(response.context['playlists'], [])
+        self.assertTrue(jobs.get_active_job(self.django_user, IngestJob.KIND_PLAYLISTS))
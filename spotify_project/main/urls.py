@@ -6,7 +6,14 @@ urlpatterns = [
     path('spotify/login', views.spotify_login, name='spotify_login'),
     path('spotify/callback', views.spotify_callback, name='spotify_callback'),
     path('playlists', views.get_playlists, name='get_playlists'),
+    path('playlists/overlap/', views.playlist_overlap_view, name='playlist_overlap'),
     path('dashboard', views.dashboard_view, name='dashboard'),
     path('visuals', views.visuals_view, name='visuals'),
     path('visuals/popularity/', views.get_popularity_data, name='get_popularity_data'),
+    path('visuals/popularity/all/', views.get_popularity_prefixes, name='get_popularity_prefixes'),
+    path('visuals/histogram/', views.get_histogram_data, name='get_histogram_data'),
+    path('visuals/sync-status/', views.sync_status_view, name='sync_status'),
+    path('history/', views.ranking_history_view, name='ranking_history'),
+    path('insights/global/', views.global_insights_view, name='global_insights'),
+    path('visuals/cache-stats/', views.visual_cache_stats_view, name='visual_cache_stats'),
 ]
@@ -2,20 +2,28 @@ from django.shortcuts import render, redirect
 from django.http import HttpResponse, JsonResponse
 from django.conf import settings
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.contrib.auth import login 
 from django.contrib.auth.models import User # Django 기본 User 모델
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
 from . import forms
+from . import histograms
+from . import history
+from . import jobs
 from . import models
+from . import playlists
+from . import profiles
+from . import rollups
 from . import spotify 
-from .models import SpotifyToken, Track
+from . import visual_cache
+from .models import IngestJob, SpotifyToken, TrackRanking
+from .spotify import get_spotify_oauth
 
-from datetime import timedelta
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
-
-from collections import Counter
+from datetime import datetime, time, timedelta
 
 # Create your views here.
 
@@ -32,89 +40,84 @@ def home_view(request):
     else:
         return HttpResponse("Invalid request method.", status=400)
 
+def get_header_profile(django_user):
+    """
+    헤더에 표시할 프로필 (DB에 저장된 값, sp.me() 호출 없음).
+    TTL이 지났으면 저장된 값을 그대로 쓰고 백그라운드 갱신 작업만 등록합니다.
+    """
+    profile = profiles.get_profile(django_user)
+    if profiles.is_stale(profile):
+        jobs.enqueue_ingest(django_user, IngestJob.KIND_PROFILE)
+    return profiles.as_context(profile)
+
 @login_required
 def dashboard_view(request):
+    """
+    Top 5 트랙 / Top 5 장르를 수집된 DB 데이터로 바로 보여 줍니다. (Spotify API 호출 없음)
+    마지막 동기화가 DASHBOARD_MAX_AGE_SECONDS보다 오래되었으면 화면은 그대로 보여 주고
+    백그라운드 수집 작업만 등록합니다. (stale-while-revalidate)
+    """
     django_user = request.user
 
     try:
-        # 1. 유효한 Spotify 클라이언트 획득 (토큰 갱신 포함)
-        token_obj = SpotifyToken.objects.get(user=django_user)
-        spotify_user_id = token_obj.spotify_id
-        sp = get_user_spotify_client(spotify_user_id)
-        
-        # 2. API 호출: 사용자 프로필 정보 및 Top 5 트랙 가져오기
-        user_profile = sp.me() # 사용자 이름, 이미지 등에 필요
+        # 1. 사용자 프로필 (DB 저장본)
+        user_profile = get_header_profile(django_user) # 사용자 이름, 이미지 등에 필요
 
-        top_tracks_data = sp.current_user_top_tracks(limit=50, time_range='medium_term')
-        
-        artist_ids = []
-        for track in top_tracks_data['items']:
-            # 각 트랙의 첫 번째 아티스트 ID만 추출
-            artist_ids.append(track['artists'][0]['id'])
+        # 2. 데이터가 오래되었거나 아직 없으면 백그라운드 갱신 등록 (같은 사용자의 중복 요청은 병합)
+        synced_at, refresh_job = jobs.enqueue_if_stale(
+            django_user, getattr(settings, 'DASHBOARD_MAX_AGE_SECONDS', 6 * 60 * 60))
 
-        # 아티스트 ID 리스트에서 중복을 제거합니다 (성능 최적화)
-        unique_artist_ids = list(set(artist_ids))
-        
-        # 2. API 호출: 모든 아티스트의 상세 정보를 한 번에 요청
-        # (API는 최대 50개의 ID를 한 번에 처리 가능)
-        artists_data = sp.artists(unique_artist_ids)
-        
-        all_genres = []
-        for artist in artists_data['artists']:
-            # 각 아티스트의 장르 리스트를 모두 하나의 리스트에 추가
-            all_genres.extend(artist['genres'])
-            
-        # 3. 장르 집계: Counter를 사용하여 각 장르의 빈도를 계산
-        genre_counts = Counter(all_genres)
-        
-        # 4. 템플릿에 전달하기 쉽게 리스트 형식으로 변환
-        top_genres = [{'genre': g, 'count': c} for g, c in genre_counts.most_common(5)] # Top 5 장르
-        # --------------------------------------------------------
+        # 3. Top 5 트랙 / 장르 (기존 대시보드와 같은 medium_term 기준)
+        dashboard_data = spotify.get_dashboard_data(django_user, TrackRanking.TIME_RANGE_MEDIUM, limit=5)
 
-        # 5. 최종 Context 구성
+        # 4. 최종 Context 구성
         context = {
             'user_profile': user_profile,
-            'top_tracks': top_tracks_data['items'][:5], # HTML에는 다시 Top 5만 표시
-            'top_genres': top_genres, # ⭐ 추가된 장르 데이터 ⭐
+            'top_tracks': dashboard_data['top_tracks'],
+            'top_genres': dashboard_data['top_genres'], # ⭐ 장르 데이터 ⭐
+            'synced_at': synced_at,
+            'refreshing': refresh_job is not None,
         }
         
         return render(request, 'dashboard.html', context)
 
+    except SpotifyToken.DoesNotExist:
+        return redirect('spotify_login')
+
     except Exception as e:
         print(f"대시보드 로딩 중 오류: {e}") 
-        render(request, 'home.html', {'error': f'데이터 로딩 오류: {e}'})
+        return render(request, 'home.html', {'error': f'데이터 로딩 오류: {e}'})
+
+def get_time_range_param(request):
+    """?time_range= 쿼리 파라미터를 검증하여 반환합니다. (잘못된 값이면 long_term)"""
+    time_range = request.GET.get('time_range', TrackRanking.TIME_RANGE_LONG)
+    return time_range if time_range in TrackRanking.TIME_RANGES else TrackRanking.TIME_RANGE_LONG
 
 @login_required
 def visuals_view(request):
     django_user = request.user
     
     try:
-        # 1. 토큰 획득 (인증 상태이므로 토큰은 존재한다고 가정)
-        token_obj = SpotifyToken.objects.get(user=django_user)
-        spotify_user_id = token_obj.spotify_id
-
-        # 2. Spotify 클라이언트 획득 (토큰 갱신 포함)
-        # 모든 API 호출에 사용할 sp 객체를 한 번만 획득합니다.
-        sp = get_user_spotify_client(spotify_user_id) 
+        # 1~2. 프로필 정보 획득 (Header 표시용)
+        # Spotify API를 호출하지 않고 DB에 저장된 프로필을 사용합니다. (오래되면 백그라운드에서 갱신)
+        user_profile = get_header_profile(django_user)
         
-        # 3. 데이터 수집/갱신 및 분석 로직 통합 호출
-        # (save_top_tracks_data는 DB에 데이터가 없거나 오래되면 갱신합니다.)
-        # get_visual_data 함수 내에서 데이터의 유무를 판단하고 필요시 수집합니다.
-        print(f"DEBUG: 2. Spotify ID 획득 성공: {spotify_user_id}")
-        # ⭐ 핵심 수정: 데이터 수집 여부를 확인하는 로직을 spotify.py로 위임하거나,
-        #             여기서 명시적으로 DB에 데이터가 없으면 수집합니다.
-        if not Track.objects.filter(user=django_user).exists():
-            print("DEBUG: 3. DB에 데이터 없음, 수집 시작...")
-            spotify.save_top_tracks_data(sp, django_user)
-        
-        print("DEBUG: 4. 데이터 수집/확인 완료, 시각화 준비.")
-        # 4. API 호출: 프로필 정보 획득 (Header 표시용)
-        # sp 객체는 2단계에서 갱신되었거나 유효하므로 바로 사용합니다.
-        user_profile = sp.me() 
+        # 3. 데이터 수집은 백그라운드 Worker(manage.py ingest_worker)에 맡깁니다.
+        #    아직 한 번도 동기화되지 않았다면 작업만 등록하고 "동기화 중" 화면을 바로 반환합니다.
+        #    (같은 사용자의 중복 요청은 하나의 작업으로 병합됩니다.)
+        if not spotify.has_synced(django_user):
+            job, _ = jobs.enqueue_ingest(django_user)
+            return render(request, 'visuals.html', {
+                'user_profile': user_profile,
+                'syncing': True,
+                'sync_status': jobs.job_status(job),
+            })
+
         
         # 5. 분석 데이터 로드 (DB에서 읽어옴, 분석 및 포맷 변환)
-        # spotify.py의 함수는 이제 DB만 조회하여 데이터를 가져와 포맷합니다.
-        analysis_data = spotify.get_all_visual_data(django_user)
+        # 같은 데이터 버전의 결과는 캐시에서 바로 가져옵니다. (동기화로 데이터가 바뀌면 자동 무효화)
+        time_range = get_time_range_param(request)
+        analysis_data = visual_cache.get_visual_data(django_user, time_range)
         
         # 6. Context 구성 및 렌더링
         context = {
@@ -128,6 +131,10 @@ def visuals_view(request):
             
             'max_ranking': analysis_data['max_ranking'], 
             'total_tracks': len(analysis_data['all_tracks']), # 필요한 경우 추가
+
+            # 기간 선택 (short_term / medium_term / long_term)
+            'time_range': time_range,
+            'time_range_choices': TrackRanking.TIME_RANGE_CHOICES,
         }
         
         return render(request, 'visuals.html', context)
@@ -145,6 +152,62 @@ def visuals_view(request):
         # 오류 발생 시 사용자에게 친절한 화면을 보여주거나 로그인 페이지로 리다이렉트
         return render(request, 'home.html', {'error': f'시각화 데이터 로딩 중 오류 발생: {e}'})
 
+@login_required
+def sync_status_view(request):
+    """
+    백그라운드 수집 작업의 진행 상황(단계별 pages / artists / albums / tracks)을 JSON으로 반환합니다.
+    visuals.html의 "동기화 중" 화면이 주기적으로 호출합니다.
+    """
+    job = jobs.get_latest_job(request.user)
+    return JsonResponse(jobs.job_status(job))
+
+@login_required
+def global_insights_view(request):
+    """
+    전체 사용자의 장르 / 아티스트 통계와 장르별 평균 인기도를 JSON으로 반환합니다.
+    동기화 때 증분 갱신되는 Rollup 테이블만 읽습니다. 예: /insights/global/?time_range=short_term&limit=20
+    """
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        return JsonResponse({'error': 'limit은 정수여야 합니다.'}, status=400)
+    limit = min(max(limit, 1), 100)
+
+    return JsonResponse(rollups.global_insights(get_time_range_param(request), limit=limit))
+
+@login_required
+def ranking_history_view(request):
+    """
+    두 날짜 사이의 순위 변화(새로 들어온 트랙 / 순위가 크게 바뀐 트랙)를 JSON으로 반환합니다.
+    track을 주면 해당 트랙의 스냅샷별 순위 추이도 함께 반환합니다.
+    예: /history/?time_range=short_term&start=2024-01-01&end=2024-03-01&limit=10&track=<spotify_id>
+    start / end 는 그날이 끝나는 시점 기준이며, 기본값은 최근 30일입니다.
+    """
+    try:
+        end_date = parse_date(request.GET['end']) if request.GET.get('end') else timezone.localdate()
+        start_date = parse_date(request.GET['start']) if request.GET.get('start') else end_date - timedelta(days=30)
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        return JsonResponse({'error': 'start / end는 YYYY-MM-DD, limit은 정수여야 합니다.'}, status=400)
+    if start_date is None or end_date is None:
+        return JsonResponse({'error': 'start / end는 YYYY-MM-DD 형식이어야 합니다.'}, status=400)
+    limit = min(max(limit, 1), 100)
+
+    start = timezone.make_aware(datetime.combine(start_date, time.max))
+    end = timezone.make_aware(datetime.combine(end_date, time.max))
+    time_range = get_time_range_param(request)
+
+    data = history.rank_changes(request.user, time_range, start, end, limit=limit)
+    data['time_range'] = time_range
+    if request.GET.get('track'):
+        data['track_history'] = history.track_rank_history(request.user, request.GET['track'], time_range, end=end)
+    return JsonResponse(data)
+
+@staff_member_required
+def visual_cache_stats_view(request):
+    """시각화 데이터 캐시의 적중 / 미스 횟수를 JSON으로 반환합니다. (관리자 전용)"""
+    return JsonResponse(visual_cache.cache_stats())
+
 @login_required
 def get_popularity_data(request):
     """
@@ -163,22 +226,57 @@ def get_popularity_data(request):
     # 2. Spotify 로직 함수 호출 (이 함수는 이전에 main/spotify.py에 추가되었습니다)
     popularity_data = spotify.calculate_popularity_distribution(
         request.user, 
-        ranking_limit
+        ranking_limit,
+        get_time_range_param(request)
     )
     
     # 3. JSON 응답 반환 (프론트엔드가 기대하는 JSON 형식)
     return JsonResponse({'popularity_data': popularity_data})
 
-# 헬퍼 함수: SpotifyOAuth 객체 생성
-def get_spotify_oauth():
-    print(f"Views.py에서 확인한 Client ID: {settings.SPOTIFY_CLIENT_ID}")
-    return SpotifyOAuth(
-        client_id=settings.SPOTIFY_CLIENT_ID,
-        client_secret=settings.SPOTIFY_CLIENT_SECRET,
-        redirect_uri=settings.SPOTIFY_REDIRECT_URI,
-        scope=settings.SPOTIFY_SCOPE,
-        cache_path=None # Django 서버에서는 파일 캐시 대신 DB를 사용
+def popularity_prefixes_etag(request):
+    """사용자 / 기간 / 데이터 버전이 같으면 같은 ETag (동기화로 데이터가 바뀌면 버전이 올라갑니다)."""
+    version = visual_cache.get_data_version(request.user)
+    return f'popularity-prefixes:{request.user.pk}:{get_time_range_param(request)}:v{version}'
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=popularity_prefixes_etag)
+def get_popularity_prefixes(request):
+    """
+    모든 순위 구간(N)의 인기도 분포를 한 번에 반환합니다. (슬라이더는 이 데이터로 클라이언트에서 계산)
+    브라우저는 매번 If-None-Match로 재검증하고, 데이터가 그대로면 304 응답을 받습니다.
+    """
+    return JsonResponse(spotify.popularity_prefix_payload(request.user, get_time_range_param(request)))
+
+@login_required
+def get_histogram_data(request):
+    """
+    AJAX 요청을 처리하여 임의 필드(popularity / release_year / duration_ms / ranking)의 분포를 JSON으로 반환합니다.
+    예: /visuals/histogram/?field=release_year&width=5&genre=k-pop&n=100
+    """
+    field = request.GET.get('field', 'popularity')
+    if field not in histograms.HISTOGRAM_FIELDS:
+        return JsonResponse({'error': f'지원하지 않는 필드입니다: {field}'}, status=400)
+
+    try:
+        width = int(request.GET['width']) if request.GET.get('width') else None
+        ranking_limit = int(request.GET['n']) if request.GET.get('n') else None
+    except ValueError:
+        return JsonResponse({'error': 'width와 n은 정수여야 합니다.'}, status=400)
+
+    if width is not None and width <= 0:
+        return JsonResponse({'error': 'width는 1 이상이어야 합니다.'}, status=400)
+
+    histogram_data = histograms.track_histogram(
+        request.user,
+        field,
+        get_time_range_param(request),
+        ranking_limit=ranking_limit,
+        genre=request.GET.get('genre'),
+        artist_id=request.GET.get('artist'),
+        width=width,
     )
+    return JsonResponse({'field': field, 'histogram_data': histogram_data})
 
 # 1. 로그인 시작 엔드포인트
 def spotify_login(request):
@@ -211,7 +309,7 @@ def spotify_callback(request):
         return render(request, 'home.html', {'error': f'토큰 교환 실패: {e}'})
 
     # Access Token으로 사용자 정보 획득 및 Spotify 클라이언트 생성
-    sp = spotipy.Spotify(auth=token_info['access_token'])
+    sp = spotify.make_spotify_client(token_info['access_token'])
     user_data = sp.me()
     user_id = user_data['id']
     
@@ -233,7 +331,7 @@ def spotify_callback(request):
         }
     )
     
-    SpotifyToken.objects.update_or_create(
+    token_obj, _ = SpotifyToken.objects.update_or_create(
         spotify_id=user_id,
         defaults={
             'user': user,
@@ -245,6 +343,12 @@ def spotify_callback(request):
         }
     )
 
+    # 새로 받은 토큰으로 프로세스 토큰 캐시 갱신
+    spotify.cache_token(token_obj)
+
+    # 헤더용 프로필 저장 (이후 페이지에서는 sp.me()를 다시 호출하지 않음)
+    profiles.save_profile(user, user_data)
+
     # ----------------------------------------------------
     # ⭐ 5. Django 세션에 로그인 처리 (동일) ⭐
     # ----------------------------------------------------
@@ -259,94 +363,54 @@ def spotify_callback(request):
     # 6. 최종적으로 /dashboard 경로로 리다이렉트 (주소창 변경 목적)
     return redirect('/dashboard')
 
-# 헬퍼 함수: Access Token을 갱신하고 DB를 업데이트
-def refresh_spotify_token(token_obj):
-    # 1. SpotifyOAuth 객체 생성
-    auth_manager = get_spotify_oauth()
+@login_required
+def get_playlists(request):
+    """
+    재생 목록 라이브러리를 수집된 DB 데이터로 페이지(PLAYLISTS_PAGE_SIZE개) 단위로 보여 줍니다. (Spotify API 호출 없음)
+    재생 목록마다 트랙이 가장 많이 겹치는 다른 재생 목록도 함께 보여 줍니다. 예: /playlists?page=3
+    아직 수집하지 않았거나 PLAYLISTS_MAX_AGE_SECONDS가 지났으면 화면은 그대로 보여 주고 백그라운드 수집 작업을 등록합니다.
+    """
+    django_user = request.user
 
     try:
-        # 2. Refresh Token을 사용하여 새 Access Token 요청
-        # spotipy 라이브러리가 API 호출을 통해 토큰을 갱신합니다.
-        new_token_info = auth_manager.refresh_access_token(token_obj.refresh_token)
-        
-        # 3. 모델 필드 업데이트 및 저장
-        token_obj.access_token = new_token_info['access_token']
-        
-        # 새 만료 시각 계산: 현재 시각 + 새로 받은 유효 시간(초)
-        expires_in = new_token_info.get('expires_in', 3600)
-        token_obj.expires_at = timezone.now() + timedelta(seconds=expires_in)
-        token_obj.expires_in = expires_in # expires_in 필드도 업데이트 (선택 사항)
-        token_obj.save()
-        
-        return token_obj
-        
-    except Exception as e:
-        print(f"Token refresh failed for user {token_obj.user_id}: {e}")
-        # 갱신 실패 (Refresh Token 만료, 권한 해지 등) 시 예외 발생
-        # 사용자에게 재로그인을 유도해야 함.
-        raise Exception("Spotify 인증 만료 또는 오류. 재로그인이 필요합니다.")
-
-# Access Token 상태를 확인하고 유효한 Spotify 클라이언트를 반환하는 메인 함수
-def get_user_spotify_client(spotify_id):
-    # 1. DB에서 토큰 로드
-    try:
-        token_obj = SpotifyToken.objects.get(spotify_id=spotify_id)
-    except SpotifyToken.DoesNotExist:
-        raise Exception(f"User {spotify_id} does not have a Spotify token.")
+        user_profile = get_header_profile(django_user)
 
-    # 2. 만료 시각 확인
-    # DB에 저장된 만료 시각이 현재 시각(timezone.now())보다 작거나 같으면 만료됨
-    is_expired = token_obj.expires_at <= timezone.now()
-    
-    if is_expired:
-        print(f"Token expired for user {spotify_id}. Attempting refresh.")
-        # 3. 만료된 경우, 갱신 함수 호출
-        token_obj = refresh_spotify_token(token_obj)
-    
-    # 4. 유효한 토큰(갱신되었거나 원래 유효했던)으로 Spotify 클라이언트 객체 반환
-    return spotipy.Spotify(auth=token_obj.access_token)
-
-# 사용자의 재생 목록을 보여주는 뷰 함수 (간단한 예시)
-def get_playlists(request):
-    django_user = request.user 
-    
-    try:
-        # 2. Django User 객체에 연결된 SpotifyToken 객체를 가져옵니다.
-        token_obj = SpotifyToken.objects.get(user=django_user)
-        
-        # 3. 토큰 객체에서 Spotify ID를 추출하여 클라이언트 함수에 전달
-        # Spotify ID가 'spotify_id' 필드에 저장되어 있다고 가정
-        spotify_user_id = token_obj.spotify_id 
+        library = playlists.get_library(django_user)
+        refresh_job = None
+        if playlists.is_stale(library):
+            refresh_job, _ = jobs.enqueue_ingest(django_user, IngestJob.KIND_PLAYLISTS)
 
-        # get_user_spotify_client 함수는 이제 토큰 객체를 직접 전달받도록 수정될 수 있습니다.
-        # 또는 기존처럼 spotify_user_id를 사용하여 토큰을 DB에서 다시 로드할 수 있습니다.
-        
-        sp = get_user_spotify_client(spotify_user_id)
-        
-        # ... (나머지 API 호출 로직은 동일)
-        playlists = sp.current_user_playlists(limit=50)
+        page, rows = playlists.library_page(django_user, library, request.GET.get('page'))
 
         context = {
-            'user_id': spotify_user_id, # HTML에 표시할 Spotify ID
-            'playlists_count': playlists['total'],
-            'playlists': playlists['items']
+            'user_profile': user_profile,
+            'user_id': user_profile['id'], # HTML에 표시할 Spotify ID
+            'playlists_count': library.playlist_count if library else 0,
+            'unique_track_count': library.unique_track_count if library else 0,
+            'page': page,
+            'playlists': rows,
+            'synced_at': library.synced_at if library else None,
+            'refreshing': refresh_job is not None,
         }
         return render(request, 'playlists.html', context)
     except SpotifyToken.DoesNotExist:
         return render(request, 'error.html', {'error': '토큰 없음. 로그인 필요.'})
     except Exception as e:
-        return render(request, 'error.html', {'error': f'API 호출 중 오류 발생: {e}'})
-
-
-
-
-
-
-
-
-
-
-
-
-
+        return render(request, 'error.html', {'error': f'재생 목록 로딩 중 오류 발생: {e}'})
 
+@login_required
+def playlist_overlap_view(request):
+    """
+    재생 목록 화면 한 페이지의 재생 목록 × 재생 목록 겹침 행렬(공통 트랙 수)을 JSON으로 반환합니다.
+    예: /playlists/overlap/?page=2 (대각선은 재생 목록의 트랙 수)
+    """
+    page, rows = playlists.library_page(request.user, playlists.get_library(request.user), request.GET.get('page'))
+    playlist_ids = [row['playlist'].spotify_id for row in rows]
+    track_ids_by_playlist = playlists.load_library_track_ids(request.user, playlist_ids)
+
+    return JsonResponse({
+        'page': page.number,
+        'num_pages': page.paginator.num_pages,
+        'playlists': [{'id': row['playlist'].spotify_id, 'name': row['playlist'].name} for row in rows],
+        'matrix': playlists.overlap_matrix(playlist_ids, track_ids_by_playlist),
+    })
@@ -0,0 +1,81 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import spotify
+from .models import SyncState
+
+# main/visual_cache.py
+# get_all_visual_data 결과를 (사용자, 데이터 버전, 기간) 단위로 캐시합니다.
+# 동기화로 데이터가 바뀌면 SyncState.data_version이 올라가므로 이전 버전의 캐시는 더 이상 조회되지 않습니다.
+# (명시적으로 지우지 않고 timeout으로 자연 만료)
+
+logger = logging.getLogger(__name__)
+
+VISUALS_CACHE_ALIAS = 'visuals'
+
+HITS_KEY = 'visuals:stats:hits'
+MISSES_KEY = 'visuals:stats:misses'
+
+
+def _get_cache():
+    return caches[VISUALS_CACHE_ALIAS]
+
+
+def get_data_version(django_user):
+    """사용자의 현재 데이터 버전 (동기화 기록이 없으면 0)."""
+    version = SyncState.objects.filter(user=django_user).values_list('data_version', flat=True).first()
+    return version or 0
+
+
+def _cache_key(django_user, version, time_range):
+    return f'visuals:{django_user.pk}:v{version}:{time_range}'
+
+
+def _count(key):
+    # incr은 키가 없으면 ValueError를 내므로 먼저 0으로 만들어 둡니다.
+    # (파일 / DB 캐시를 쓰면 여러 프로세스가 같은 카운터를 공유합니다.)
+    cache = _get_cache()
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def get_visual_data(django_user, time_range='long_term'):
+    """
+    시각화 페이지 데이터를 캐시에서 가져오고, 없으면 get_all_visual_data로 계산해 저장합니다.
+    같은 데이터 버전으로 다시 방문하면 버전 조회 1번 + 캐시 조회 1번으로 끝납니다.
+    """
+    cache = _get_cache()
+    key = _cache_key(django_user, get_data_version(django_user), time_range)
+
+    data = cache.get(key)
+    if data is not None:
+        _count(HITS_KEY)
+        return data
+
+    _count(MISSES_KEY)
+    data = spotify.get_all_visual_data(django_user, time_range)
+    cache.set(key, data, timeout=getattr(settings, 'VISUALS_CACHE_TIMEOUT', 60 * 60))
+    return data
+
+
+def cache_stats():
+    """캐시 적중 / 미스 횟수와 적중률."""
+    cache = _get_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'backend': settings.CACHES[VISUALS_CACHE_ALIAS]['BACKEND'],
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 3) if total else None,
+    }
+
+
+def reset_cache_stats():
+    _get_cache().delete_many([HITS_KEY, MISSES_KEY])
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -142,4 +143,83 @@ LOGIN_REDIRECT_URL = '/dashboard'
 # 로그인이 필요한 페이지 접근 시 이동할 URL (현재는 spotify/login이 이 역할을 수행)
 LOGIN_URL = '/spotify/login'
 # 사용할 권한 목록 (예시: 사용자 프로필 읽기, 재생 목록 수정)
-SPOTIFY_SCOPE = 'user-read-private user-read-email playlist-modify-public playlist-modify-private user-top-read'
\ No newline at end of file
+SPOTIFY_SCOPE = 'user-read-private user-read-email playlist-read-private playlist-read-collaborative playlist-modify-public playlist-modify-private user-top-read'
+
+# Spotify API 동시 요청 수 제한 (Top Track 페이지 / 아티스트·앨범 Batch 병렬 수집용, 1이면 순차 요청)
+SPOTIFY_FETCH_CONCURRENCY = int(os.environ.get('SPOTIFY_FETCH_CONCURRENCY', 8))
+
+# 아티스트 메타데이터 재사용 기간 (초). 이 기간 안에 받아온 아티스트는 sp.artists 호출 없이 DB에서 사용합니다.
+SPOTIFY_ARTIST_TTL_SECONDS = int(os.environ.get('SPOTIFY_ARTIST_TTL_SECONDS', 7 * 24 * 60 * 60))
+
+# 백그라운드 수집 작업(IngestJob): heartbeat가 이 시간(초) 이상 끊긴 running 작업은 다른 Worker가 다시 가져갑니다.
+INGEST_JOB_STALE_SECONDS = int(os.environ.get('INGEST_JOB_STALE_SECONDS', 300))
+
+# 한 번의 동기화에서 수집할 Top Track 기간 (콤마 구분: short_term, medium_term, long_term)
+SPOTIFY_SYNC_TIME_RANGES = os.environ.get('SPOTIFY_SYNC_TIME_RANGES', 'short_term,medium_term,long_term').split(',')
+
+# Spotify API 요청 스케줄러 (프로세스 전체 공유): 초당 요청 수 / 순간 최대 요청 수 / 동시 진행 요청 수 / 재시도
+SPOTIFY_RATE_LIMIT_PER_SECOND = float(os.environ.get('SPOTIFY_RATE_LIMIT_PER_SECOND', 10))
+SPOTIFY_RATE_LIMIT_BURST = int(os.environ.get('SPOTIFY_RATE_LIMIT_BURST', 20))
+SPOTIFY_MAX_IN_FLIGHT = int(os.environ.get('SPOTIFY_MAX_IN_FLIGHT', 8))
+SPOTIFY_MAX_RETRIES = int(os.environ.get('SPOTIFY_MAX_RETRIES', 5))
+SPOTIFY_RETRY_BACKOFF_SECONDS = float(os.environ.get('SPOTIFY_RETRY_BACKOFF_SECONDS', 0.5))
+
+# 시각화 데이터 캐시 설정
+#   VISUALS_CACHE_BACKEND: locmem(프로세스 메모리) / file(파일) / db(DB 테이블, manage.py createcachetable 필요)
+VISUALS_CACHE_BACKEND = os.environ.get('VISUALS_CACHE_BACKEND', 'locmem')
+VISUALS_CACHE_TIMEOUT = int(os.environ.get('VISUALS_CACHE_TIMEOUT', 60 * 60))
+
+VISUALS_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'visuals',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('VISUALS_CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'spotify_visuals_cache')),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': os.environ.get('VISUALS_CACHE_LOCATION', 'visuals_cache'),
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'visuals': {
+        **VISUALS_CACHE_BACKENDS[VISUALS_CACHE_BACKEND],
+        'TIMEOUT': VISUALS_CACHE_TIMEOUT,
+    },
+}
+
+# 순위 변화 스냅샷 설정 (main/history.py)
+#   키프레임 간격, 모두 보관하는 기간(일), 주 단위로 보관하는 기간(일), 사용자 / 기간당 최대 스냅샷 수
+RANKING_HISTORY_KEYFRAME_INTERVAL = int(os.environ.get('RANKING_HISTORY_KEYFRAME_INTERVAL', 20))
+RANKING_HISTORY_DAILY_DAYS = int(os.environ.get('RANKING_HISTORY_DAILY_DAYS', 30))
+RANKING_HISTORY_WEEKLY_DAYS = int(os.environ.get('RANKING_HISTORY_WEEKLY_DAYS', 365))
+RANKING_HISTORY_MAX_SNAPSHOTS = int(os.environ.get('RANKING_HISTORY_MAX_SNAPSHOTS', 150))
+
+# 헤더용 Spotify 프로필(sp.me()) 보관 시간(초), 지나면 백그라운드 작업으로 갱신
+SPOTIFY_PROFILE_TTL_SECONDS = int(os.environ.get('SPOTIFY_PROFILE_TTL_SECONDS', 24 * 60 * 60))
+
+# 대시보드 데이터가 이 시간(초)보다 오래되면 화면은 그대로 보여 주고 백그라운드 수집 작업을 등록
+DASHBOARD_MAX_AGE_SECONDS = int(os.environ.get('DASHBOARD_MAX_AGE_SECONDS', 6 * 60 * 60))
+
+# Access Token 만료 이 시간(초) 전부터 미리 갱신 (프로세스 내 토큰 캐시, main/spotify.py)
+SPOTIFY_TOKEN_REFRESH_WINDOW_SECONDS = int(os.environ.get('SPOTIFY_TOKEN_REFRESH_WINDOW_SECONDS', 300))
+
+# Spotify API 공용 HTTP 연결 풀 (main/http_session.py)
+#   POOL_CONNECTIONS: 연결 풀을 유지할 호스트 수 / POOL_SIZE: 호스트당 유지할 Keep-Alive 연결 수
+SPOTIFY_HTTP_POOL_CONNECTIONS = int(os.environ.get('SPOTIFY_HTTP_POOL_CONNECTIONS', 4))
+SPOTIFY_HTTP_POOL_SIZE = int(os.environ.get('SPOTIFY_HTTP_POOL_SIZE', 16))
+SPOTIFY_HTTP_CONNECT_TIMEOUT = float(os.environ.get('SPOTIFY_HTTP_CONNECT_TIMEOUT', 3.05))
+SPOTIFY_HTTP_READ_TIMEOUT = float(os.environ.get('SPOTIFY_HTTP_READ_TIMEOUT', 10))
+
+# 재생 목록 라이브러리 (main/playlists.py)
+#   MAX_AGE_SECONDS: 마지막 수집이 이 시간(초)보다 오래되면 화면은 그대로 보여 주고 백그라운드 수집 작업을 등록
+#   PAGE_SIZE: 재생 목록 화면 한 페이지의 재생 목록 수 / OVERLAP_TOP_N: 재생 목록마다 보관하는 겹침 상위 재생 목록 수
+PLAYLISTS_MAX_AGE_SECONDS = int(os.environ.get('PLAYLISTS_MAX_AGE_SECONDS', 6 * 60 * 60))
+PLAYLISTS_PAGE_SIZE = int(os.environ.get('PLAYLISTS_PAGE_SIZE', 50))
+PLAYLIST_OVERLAP_TOP_N = int(os.environ.get('PLAYLIST_OVERLAP_TOP_N', 5))